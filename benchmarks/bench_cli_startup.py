@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+# cold start time of the status subcommands of cdc_camper.py (status, history, last-notified) against a history
+# database filled with generated cycles, compared with the bare interpreter and with importing the browser code
+# (what every start cost before the subcommands imported selenium lazily); also checks that no subcommand imports
+# selenium
+#
+# usage: python3 -m benchmarks.bench_cli_startup [--runs 10] [--cycles 500]
+
+import argparse
+import datetime
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import SESSION_TIMES
+from cdc_history import HistoryStore
+from cdc_snapshot import AvailabilitySnapshot, Slot
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+TYPES = ('practical', 'btt', 'rtt', 'pt')
+
+
+# cycles of all types, every cycle one slot more/less is visible
+def fill_history(db_path: str, cycles: int):
+    start_date = datetime.date.today() + datetime.timedelta(days=1)
+    slots = [(start_date + datetime.timedelta(days=day)).strftime('%d/%b/%Y') for day in range(14)]
+    with HistoryStore(db_path) as history:
+        taken_at = datetime.datetime.now() - datetime.timedelta(minutes=cycles)
+        for cycle in range(cycles):
+            taken_at += datetime.timedelta(minutes=1)
+            for type in TYPES:
+                snapshot = AvailabilitySnapshot(type, [
+                    Slot.from_portal(type, date_str, SESSION_TIMES[(index + cycle) % len(SESSION_TIMES)])
+                    for index, date_str in enumerate(slots[:cycle % len(slots)])], taken_at=taken_at)
+                history.record_snapshot('benchmark', snapshot)
+                if cycle % 50 == 0 and len(snapshot) > 0:
+                    history.record_notification('benchmark', type, snapshot.earliest.start, 'benchmark@localhost',
+                                                taken_at)
+            history.commit_cycle()
+
+
+# wall time in milliseconds of every run of the command
+def measure(command: list, runs: int) -> list:
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL, check=True)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def imports_selenium(command: list) -> bool:
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:], cwd=PROJECT_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    return 'selenium' in result.stderr
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--runs', type=int, default=10, help='Runs per command')
+    PARSER.add_argument('--cycles', type=int, default=500, help='Cycles in the generated history')
+    ARGS = PARSER.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'history.db')
+        fill_history(db_path, ARGS.cycles)
+
+        commands = [('python (no imports)', [sys.executable, '-c', 'pass'])]
+        commands += [(command, [sys.executable, 'cdc_camper.py', command, '--history_db', db_path])
+                     for command in ('status', 'history', 'last-notified')]
+        commands.append(('import cdc_website', [sys.executable, '-c', 'import cdc_website']))
+
+        print(f"{ARGS.runs} runs per command, history of {ARGS.cycles} cycles")
+        for name, command in commands:
+            durations = measure(command, ARGS.runs)
+            selenium = f" selenium imported: {'yes' if imports_selenium(command) else 'no'}" \
+                if 'cdc_camper.py' in command else ''
+            print(f"{name:<20} {statistics.mean(durations):>7.1f}ms mean {min(durations):>7.1f}ms min{selenium}")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+# compares the conversion of the portal date & time strings of a grid by strptime (as it was done for every slot of
+# every cycle) with the cached epoch minute conversion (utils.util.to_epoch_minutes), cold (first cycle) & warm
+#
+# usage: python3 -m benchmarks.bench_date_parsing [--days 30] [--cycles 100]
+
+import argparse
+import datetime
+import time
+
+from benchmarks.fixtures import SESSION_TIMES
+from cdc_snapshot import Slot
+from utils.util import to_epoch_minutes
+
+
+def parse_with_strptime(date_str: str, time_str: str) -> tuple:
+    start = datetime.datetime.strptime(f"{date_str} | {time_str.split(' ')[0]}", '%d/%b/%Y | %H:%M')
+    end_hour, end_minute = time_str.split(' - ')[1].split(':')
+    end = start.replace(hour=int(end_hour), minute=int(end_minute))
+    if end < start:
+        end += datetime.timedelta(days=1)
+    return start, end
+
+
+def parse_with_slots(date_str: str, time_str: str) -> tuple:
+    slot = Slot.from_portal('practical', date_str, time_str)
+    return slot.start, slot.end
+
+
+# microseconds per conversion over all cycles
+def run(parse, strings: list, cycles: int) -> float:
+    start = time.perf_counter()
+    for _ in range(cycles):
+        for date_str, time_str in strings:
+            parse(date_str, time_str)
+    return (time.perf_counter() - start) / (cycles * len(strings)) * 1e6
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--days', type=int, default=30, help='Number of grid rows')
+    PARSER.add_argument('--cycles', type=int, default=100, help='Number of cycles converting the whole grid')
+    ARGS = PARSER.parse_args()
+
+    start_date = datetime.date(2021, 1, 16)
+    strings = [((start_date + datetime.timedelta(days=day)).strftime('%d/%b/%Y'), session_time)
+               for day in range(ARGS.days) for session_time in SESSION_TIMES]
+
+    assert all(parse_with_strptime(*string) == parse_with_slots(*string) for string in strings)
+    to_epoch_minutes.cache_clear()
+    print(f"{len(strings)} date/time strings per cycle, {ARGS.cycles} cycles")
+    print(f"strptime:             {run(parse_with_strptime, strings, ARGS.cycles):>6.2f}us per slot")
+    to_epoch_minutes.cache_clear()
+    print(f"epoch minutes (cold): {run(parse_with_slots, strings, 1):>6.2f}us per slot")
+    print(f"epoch minutes (warm): {run(parse_with_slots, strings, ARGS.cycles):>6.2f}us per slot")
+    print(f"cache lookup only:    {run(to_epoch_minutes, strings, ARGS.cycles):>6.2f}us per slot")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# compares the WebDriver round trips and wall time of the grid extraction modes
+# (per element vs. single execute_script vs. single page_source) on a synthetic availability grid, for a changed grid
+# (parsed) and for an unchanged one (recognized by its fingerprint)
+#
+# usage: python3 -m benchmarks.bench_grid_extraction [--days 30] [--fill_ratio 0.3] [--repeat 5]
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import build_availability_page
+from cdc_abstract import ExtractionModes, Types
+from cdc_website import CDCWebsite
+
+BOOKING_PAGE_PATH = "NewPortal/Booking/BookingTT.aspx"
+
+
+# wraps driver.execute (which every WebDriver and WebElement command goes through) to count round trips
+def count_round_trips(driver) -> dict:
+    counter = {'round_trips': 0}
+    execute = driver.execute
+
+    def counting_execute(driver_command, params=None):
+        counter['round_trips'] += 1
+        return execute(driver_command, params)
+
+    driver.execute = counting_execute
+    return counter
+
+
+# forgets the grids read so far, so they are parsed again (the static grid of the benchmark would be recognized as
+# unchanged by its fingerprint otherwise & only that shortcut would be measured)
+def forget_grids(cdc_website: CDCWebsite):
+    cdc_website._grid_fingerprints = {}
+    cdc_website.available_sessions = {}
+
+
+def read_grid(cdc_website: CDCWebsite, counter: dict) -> tuple:
+    counter['round_trips'] = 0
+    start = time.perf_counter()
+    cdc_website.get_all_session_date_times(type=Types.BTT)
+    cdc_website.get_all_available_sessions(type=Types.BTT)
+    return counter['round_trips'], time.perf_counter() - start
+
+
+# changed grid (parsed) & unchanged grid (fingerprint only) of every run
+def run(cdc_website: CDCWebsite, counter: dict, mode: str, repeat: int) -> dict:
+    cdc_website.extraction_mode = mode
+    wall_times = []
+    unchanged_wall_times = []
+    for _ in range(repeat):
+        forget_grids(cdc_website)
+        round_trips, wall_time = read_grid(cdc_website, counter)
+        wall_times.append(wall_time)
+        available_sessions = len(cdc_website.available_sessions[Types.BTT])
+        unchanged_round_trips, wall_time = read_grid(cdc_website, counter)
+        unchanged_wall_times.append(wall_time)
+    return {'mode': mode, 'round_trips': round_trips, 'wall_time_ms': min(wall_times) * 1000,
+            'unchanged_round_trips': unchanged_round_trips, 'unchanged_wall_time_ms': min(unchanged_wall_times) * 1000,
+            'available_sessions': available_sessions}
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--days', type=int, default=30, help='Number of grid rows')
+    PARSER.add_argument('--fill_ratio', type=float, default=0.3, help='Share of available slots')
+    PARSER.add_argument('--repeat', type=int, default=5, help='Runs per mode (best is reported)')
+    ARGS = PARSER.parse_args()
+
+    with tempfile.TemporaryDirectory() as site_dir:
+        page_path = os.path.join(site_dir, f'{BOOKING_PAGE_PATH}.html')
+        os.makedirs(os.path.dirname(page_path))
+        with open(page_path, 'w') as stream:
+            stream.write(build_availability_page(days=ARGS.days, fill_ratio=ARGS.fill_ratio))
+
+        with CDCWebsite('benchmark', 'benchmark', headless=True, booking_url=f'file://{site_dir}', is_test=True) as cdc_website:
+            cdc_website._open_website(BOOKING_PAGE_PATH)
+            counter = count_round_trips(cdc_website.driver)
+
+            results = [run(cdc_website, counter, mode, ARGS.repeat)
+                       for mode in (ExtractionModes.ELEMENT, ExtractionModes.SCRIPT, ExtractionModes.PAGE_SOURCE)]
+
+    print(f"{'':<12} {'changed grid':>28} {'unchanged grid':>28}")
+    print(f"{'mode':<12} {'round trips':>12} {'wall time (ms)':>15} {'round trips':>12} {'wall time (ms)':>15} "
+          f"{'sessions':>9}")
+    for result in results:
+        print(f"{result['mode']:<12} {result['round_trips']:>12} {result['wall_time_ms']:>15.1f} "
+              f"{result['unchanged_round_trips']:>12} {result['unchanged_wall_time_ms']:>15.1f} "
+              f"{result['available_sessions']:>9}")
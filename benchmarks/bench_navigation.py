@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# compares the wall time of the readiness driven navigation (one page load per page, waiting on conditions) with the
+# previous sleep based navigation, against the local stand-in portal:
+# - pages: every page was loaded twice before it was used
+# - login: 3s before clicking the login button, polling the captcha every 2s, 5s after it had been solved
+# - eligibility probe: 2s after reverting the probe reservation
+#
+# usage: python3 -m benchmarks.bench_navigation [--repeat 5] [--latency 0.2] [--captcha_delay 1]
+
+import argparse
+import time
+
+from selenium.common.exceptions import (NoSuchElementException,
+                                        TimeoutException)
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from benchmarks.fixture_server import (HOME_PATH, LOGIN_PATH, FixtureServer,
+                                       FixtureSite)
+from cdc_abstract import Types
+from cdc_website import CDCWebsite
+from utils.grid_parser import parse_grid
+
+PAGES = {
+    'overview': ("NewPortal/Booking/StatementBooking.aspx", lambda cdc_website: cdc_website.open_booking_overview()),
+    Types.PRACTICAL: ("NewPortal/Booking/BookingPL.aspx", lambda cdc_website: cdc_website.open_practical_lessons_booking()),
+    Types.BTT: ("NewPortal/Booking/BookingTT.aspx", lambda cdc_website: cdc_website.open_theory_test_booking_page(Types.BTT)),
+    Types.PT: ("NewPortal/Booking/BookingPT.aspx", lambda cdc_website: cdc_website.open_practical_test_booking_page()),
+}
+
+
+# best wall time of the operation in milliseconds
+def measure(operation, repeat: int) -> float:
+    wall_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        wall_times.append(time.perf_counter() - start)
+    return min(wall_times) * 1000
+
+
+def open_page_sleep_based(cdc_website: CDCWebsite, path: str, open_page):
+    # the previous navigation loaded every page once more before using it
+    cdc_website.driver.get(f"{cdc_website.booking_url}/{path}")
+    open_page(cdc_website)
+
+
+def login(cdc_website: CDCWebsite):
+    cdc_website.open_home_website()
+    cdc_website.login()
+
+
+# the login of the previous version
+def login_sleep_based(cdc_website: CDCWebsite):
+    cdc_website.open_home_website()
+    time.sleep(3)
+    cdc_website.driver.find_element_by_xpath('//*[@id="top-menu"]/ul/li[10]/a').click()
+    cdc_website.driver.find_element_by_name('userId').send_keys(cdc_website.username)
+    cdc_website.driver.find_element_by_name('password').send_keys(cdc_website.password)
+    try:
+        while cdc_website.driver.find_element_by_name('userId'):
+            time.sleep(2)
+    except NoSuchElementException:
+        time.sleep(5)
+
+
+# the reservation probe of the previous version (the session is reserved, so no alert is shown & it is reverted)
+def probe_sleep_based(cdc_website: CDCWebsite, element_id: str):
+    cdc_website.driver.find_element_by_id(element_id).click()
+    try:
+        WebDriverWait(cdc_website.driver, cdc_website.alert_timeout).until(EC.alert_is_present())
+    except TimeoutException:
+        cdc_website.driver.find_element_by_id(element_id).click()
+        time.sleep(2)
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--repeat', type=int, default=5, help='Runs per page (best is reported)')
+    PARSER.add_argument('--latency', type=float, default=0.0,
+                        help='Simulated server latency per request in seconds')
+    PARSER.add_argument('--captcha_delay', type=float, default=1.0,
+                        help='Seconds until the captcha of the login is "solved"')
+    ARGS = PARSER.parse_args()
+
+    site = FixtureSite(latency=ARGS.latency, captcha_delay=ARGS.captcha_delay)
+    with FixtureServer(site) as server:
+        with CDCWebsite('benchmark', 'benchmark', headless=True, home_url=f"{server.url}{HOME_PATH}",
+                        booking_url=server.url, alert_timeout=1) as cdc_website:
+            # sets the session cookie
+            cdc_website.driver.get(f"{server.url}{LOGIN_PATH}")
+
+            results = []
+            for name, (path, open_page) in PAGES.items():
+                results.append((name, measure(lambda: open_page_sleep_based(cdc_website, path, open_page), ARGS.repeat),
+                                measure(lambda: open_page(cdc_website), ARGS.repeat)))
+
+            results.append(('login', measure(lambda: login_sleep_based(cdc_website), ARGS.repeat),
+                            measure(lambda: login(cdc_website), ARGS.repeat)))
+
+            # probes the first available practical lesson (which is reserved & reverted, no alert)
+            cdc_website.open_practical_lessons_booking()
+            element_id = next(element_id for element_id, src in parse_grid(cdc_website.driver.page_source)['sessions']
+                              if "Images1.gif" in src)
+            results.append(('probe', measure(lambda: probe_sleep_based(cdc_website, element_id), ARGS.repeat),
+                            measure(lambda: cdc_website._probe_reservation(element_id), ARGS.repeat)))
+
+    print(f"{'step':<10} {'sleep based (ms)':>17} {'readiness (ms)':>15} {'saved (ms)':>11}")
+    for name, sleep_based, readiness in results:
+        print(f"{name:<10} {sleep_based:>17.0f} {readiness:>15.0f} {sleep_based - readiness:>11.0f}")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+# browserless checks of the http engine (cdc_http.CDCHttpClient) against the local stand-in portal: page parsing, the
+# __VIEWSTATE/__EVENTVALIDATION postback round trip, reserving a session, an expired session, portal errors &
+# unreachable servers, the fallback of the website to the browser, the watchdog retrying failed requests (but not the
+# operations which must not be repeated) and its deadline
+#
+# usage: python3 -m benchmarks.check_http_engine
+
+import socket
+import sys
+import time
+
+import requests
+
+from benchmarks.fixture_server import FixtureServer, FixtureSite
+from cdc_http import CDCHttpClient, HttpEngineError, SessionExpiredError
+from cdc_watchdog import (FATAL, RETRYABLE, DriverWatchdog, OperationFailedError,
+                          classify_error)
+from cdc_website import (COURSE_SELECT_ID, SESSION_NO_LABEL_ID, TERMS_CHECKBOX_ID,
+                         CDCWebsite)
+from utils.grid_parser import parse_booked_rows, parse_grid
+
+
+def expect_error(error_class, operation, *args, **kwargs) -> Exception:
+    try:
+        operation(*args, **kwargs)
+    except error_class as e:
+        return e
+    raise AssertionError(f"{operation.__name__} did not raise {error_class.__name__}")
+
+
+def check_pages(server: FixtureServer, site: FixtureSite):
+    client = CDCHttpClient(server.url, server.session_cookies)
+    client.get("NewPortal/Booking/StatementBooking.aspx")
+    assert len([row for row in parse_booked_rows(client.page_source) if row]) == len(site.bookings)
+
+    # course dropdown -> grid, the postback carries __VIEWSTATE & __EVENTVALIDATION of the page
+    client.get("NewPortal/Booking/BookingPL.aspx")
+    assert {'__VIEWSTATE', '__EVENTVALIDATION'} <= client.form.hidden_fields.keys()
+    options = client.form.options[COURSE_SELECT_ID]
+    client.postback(event_target_id=COURSE_SELECT_ID, fields={COURSE_SELECT_ID: options[1][0]})
+    assert client.has_element(SESSION_NO_LABEL_ID)
+    grid = parse_grid(client.page_source)
+    assert len(grid['days']) == site.grid_kwargs['days'] and len(grid['sessions']) > 0
+
+    # terms & conditions of the theory tests
+    client.get("NewPortal/Booking/BookingTT.aspx")
+    assert client.has_element(TERMS_CHECKBOX_ID)
+    client.postback(fields={TERMS_CHECKBOX_ID: 'on'})
+    assert len(parse_grid(client.page_source)['sessions']) > 0
+
+    # click on a session
+    element_id = grid['sessions'][0][0]
+    client.get("NewPortal/Booking/BookingPL.aspx")
+    client.postback(event_target_id=COURSE_SELECT_ID, fields={COURSE_SELECT_ID: options[1][0]})
+    sessions = dict(parse_grid(client.click_image(element_id))['sessions'])
+    assert "Images3.gif" in sessions[element_id] and element_id in site.reserved
+    site.reserved.clear()
+
+    # a postback with a stale __VIEWSTATE is refused by the portal (500)
+    client.get("NewPortal/Booking/BookingPL.aspx")
+    client.form.hidden_fields['__VIEWSTATE'] = 'stale'
+    expect_error(HttpEngineError, client.postback, event_target_id=COURSE_SELECT_ID,
+                 fields={COURSE_SELECT_ID: options[1][0]})
+    client.close()
+
+
+def free_port() -> int:
+    with socket.socket() as free_socket:
+        free_socket.bind(('127.0.0.1', 0))
+        return free_socket.getsockname()[1]
+
+
+def check_expired_session(server: FixtureServer, site: FixtureSite):
+    client = CDCHttpClient(server.url, [])
+    error = expect_error(SessionExpiredError, client.get, "NewPortal/Booking/BookingPL.aspx")
+    assert "Login.aspx" in str(error)
+    client.close()
+
+
+def check_errors(server: FixtureServer, site: FixtureSite):
+    client = CDCHttpClient(server.url, server.session_cookies)
+    client.get("NewPortal/Booking/BookingPL.aspx")
+    for status in (500, 503, 404):
+        site.error_status = status
+        error = expect_error(HttpEngineError, client.get, "NewPortal/Booking/BookingPL.aspx")
+        assert not isinstance(error, SessionExpiredError), error
+        expect_error(HttpEngineError, client.postback, event_target_id=COURSE_SELECT_ID,
+                     fields={COURSE_SELECT_ID: client.form.options[COURSE_SELECT_ID][1][0]})
+    site.error_status = None
+    client.close()
+
+    # nothing listens on the port (anymore)
+    client = CDCHttpClient(f"http://127.0.0.1:{free_port()}", [], timeout=2)
+    expect_error(HttpEngineError, client.get, "NewPortal/Booking/BookingPL.aspx")
+    client.close()
+
+
+# a failing http engine is dropped & the operation is run by the browser
+def check_fallback(server: FixtureServer, site: FixtureSite):
+    # only the engine state of the website is needed (no chrome)
+    cdc_website = CDCWebsite.__new__(CDCWebsite)
+    cdc_website.http_client = CDCHttpClient(server.url, server.session_cookies)
+    cdc_website._prefetched = {}
+
+    site.error_status = 500
+    result = cdc_website._run_engine(
+        lambda: cdc_website.http_client.get("NewPortal/Booking/BookingPL.aspx"), lambda: 'browser')
+    site.error_status = None
+    assert result == 'browser' and cdc_website.http_client is None
+
+
+# errors of the requests to the portal are retried by the watchdog (chrome is not restarted), an expired session is not
+def check_watchdog(server: FixtureServer, site: FixtureSite):
+    errors = [expect_error(requests.ConnectionError, requests.get, f"http://127.0.0.1:{free_port()}", timeout=2),
+              requests.Timeout("read timed out")]
+    site.error_status = 500
+    cookies = {cookie['name']: cookie['value'] for cookie in server.session_cookies}
+    response = requests.get(f"{server.url}/NewPortal/Booking/BookingPL.aspx", cookies=cookies)
+    site.error_status = None
+    errors.append(expect_error(requests.HTTPError, response.raise_for_status))
+    for error in errors:
+        assert classify_error(error) == RETRYABLE, f"{error!r} is {classify_error(error)}"
+    assert classify_error(SessionExpiredError("Login.aspx")) == FATAL
+
+    # fails once, succeeds on the second attempt
+    cdc_website = CDCWebsite.__new__(CDCWebsite)
+    cdc_website.shared_driver = None
+    attempts = []
+
+    def load_page():
+        attempts.append(len(attempts))
+        if len(attempts) == 1:
+            raise errors[-1]
+        return 'loaded'
+    watchdog = DriverWatchdog(None, operation_timeout=10, retry_delay=0)
+    assert watchdog.call(cdc_website, load_page) == 'loaded' and len(attempts) == 2
+    assert watchdog.restarts == 0 and watchdog.recoveries == 1
+
+    # an operation which must not be repeated (e.g. a reservation) is run once
+    attempts.clear()
+    expect_error(OperationFailedError, watchdog.call_once, cdc_website, load_page)
+    assert len(attempts) == 1
+
+
+# the deadline of an operation only kills chrome while the website uses it (the http engine has its own timeouts)
+def check_deadline(server: FixtureServer, site: FixtureSite):
+    class KilledDriver:
+        killed = 0
+
+        def kill(self):
+            self.killed += 1
+
+    cdc_website = CDCWebsite.__new__(CDCWebsite)
+    cdc_website.shared_driver = None
+    cdc_website.http_client = CDCHttpClient(server.url, server.session_cookies)
+    shared_driver = KilledDriver()
+    watchdog = DriverWatchdog(shared_driver, operation_timeout=0.2, retry_delay=0)
+
+    site.latency = 0.5
+    watchdog.call(cdc_website, cdc_website.http_client.get, "NewPortal/Booking/BookingPL.aspx")
+    site.latency = 0.0
+    assert shared_driver.killed == 0
+    cdc_website.http_client.close()
+
+    # browser engine
+    cdc_website.http_client = None
+    # (the pending WebDriver command would fail then)
+    watchdog.call_once(cdc_website, time.sleep, 0.5)
+    assert shared_driver.killed == 1
+
+
+if __name__ == "__main__":
+    site = FixtureSite(grid_kwargs={'days': 14, 'fill_ratio': 0.3})
+    failed = False
+    with FixtureServer(site) as server:
+        for check in (check_pages, check_expired_session, check_errors, check_fallback, check_watchdog,
+                      check_deadline):
+            try:
+                check(server, site)
+                print(f"ok     {check.__name__}")
+            except Exception as e:
+                failed = True
+                print(f"FAILED {check.__name__}: {e!r}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# checks the mail outbox (utils.mailer.MailOutbox) against the local SMTP stand-in: delivery of the per cycle digests,
+# one re-used connection, reconnecting after the server dropped it, retrying a refused mail and sending everything
+# still queued on close
+#
+# usage: python3 -m benchmarks.check_mailer
+
+import sys
+
+from benchmarks.smtp_server import SmtpServer
+from utils.mailer import MailOutbox
+
+
+def create_outbox(smtp_server: SmtpServer) -> MailOutbox:
+    return MailOutbox('127.0.0.1', smtp_server.port, from_email='camper@localhost', starttls=False, timeout=5,
+                      retry_delay=0.1)
+
+
+def check_delivery(smtp_server: SmtpServer):
+    outbox = create_outbox(smtp_server)
+    sent = []
+    outbox.add('first@localhost', 'Practical Lesson', 'practical body', on_sent=lambda: sent.append('practical'))
+    outbox.add('first@localhost', 'PT', 'pt body', on_sent=lambda: sent.append('pt'))
+    outbox.add('second@localhost', 'BTT', 'btt body')
+    outbox.flush_cycle()
+    assert smtp_server.wait_for_messages(2), f"{len(smtp_server.messages)} mails delivered"
+    outbox.close()
+
+    # one digest per recipient
+    messages = {message['To']: message for message in smtp_server.messages}
+    assert messages['first@localhost']['Subject'] == 'CDC Practical Lesson, PT Sessions'
+    body = messages['first@localhost'].get_payload()
+    assert 'practical body' in body and 'pt body' in body
+    assert messages['second@localhost']['X-Mail-From'] == 'camper@localhost'
+    assert sent == ['practical', 'pt'], sent
+
+
+def check_connection_reuse(smtp_server: SmtpServer):
+    outbox = create_outbox(smtp_server)
+    connections = smtp_server.connections
+    for cycle in range(3):
+        outbox.add('first@localhost', 'PT', f'cycle {cycle}')
+        outbox.flush_cycle()
+        assert smtp_server.wait_for_messages(cycle + 1)
+    assert smtp_server.connections - connections == 1, f"{smtp_server.connections - connections} connections"
+
+    # the server drops the idle connection, the next mail is sent over a new one
+    smtp_server.drop_connections()
+    outbox.add('first@localhost', 'PT', 'after the drop')
+    outbox.flush_cycle()
+    assert smtp_server.wait_for_messages(4), f"{len(smtp_server.messages)} mails delivered"
+    assert smtp_server.connections - connections == 2, f"{smtp_server.connections - connections} connections"
+    outbox.close()
+
+
+def check_retry(smtp_server: SmtpServer):
+    outbox = create_outbox(smtp_server)
+    smtp_server.refuse_next = 2
+    outbox.add('first@localhost', 'RTT', 'refused twice')
+    outbox.flush_cycle()
+    assert smtp_server.wait_for_messages(1), "refused mail has not been retried"
+    assert smtp_server.refuse_next == 0
+    outbox.close()
+
+
+# close() sends the notifications of the current cycle & everything still queued
+def check_drain_on_close(smtp_server: SmtpServer):
+    outbox = create_outbox(smtp_server)
+    for index in range(5):
+        outbox.add(f'user{index}@localhost', 'PT', f'mail {index}')
+    outbox.close()
+    assert len(smtp_server.messages) == 5, f"{len(smtp_server.messages)} mails delivered"
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (check_delivery, check_connection_reuse, check_retry, check_drain_on_close):
+        # a fresh server per check (mails & connections are counted)
+        with SmtpServer() as smtp_server:
+            try:
+                check(smtp_server)
+                print(f"ok     {check.__name__}")
+            except Exception as e:
+                failed = True
+                print(f"FAILED {check.__name__}: {e!r}")
+    sys.exit(1 if failed else 0)
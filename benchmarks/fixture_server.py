@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+# local stand-in for the CDC booking portal (booking_url), serving the same pages & postback flows
+# (course dropdown, terms & conditions, licence question) from benchmarks.fixtures
+#
+# usage: python3 -m benchmarks.fixture_server [--port 8080] [--scenario half] [--recorded_dir DIR]
+# then run the monitor with booking_url http://localhost:8080 (with or without is_test)
+
+import argparse
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks import fixtures
+
+SESSION_COOKIE = 'ASP.NET_SessionId'
+SESSION_ID = 'standin0session0id0000'
+LOGIN_PATH = '/NewPortal/Login.aspx'
+HOME_PATH = '/'
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # set by FixtureServer
+    site = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: str = '', headers: dict = None):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _redirect(self, location: str):
+        self._send(302, headers={'Location': location})
+
+    def _path(self) -> str:
+        # is_test mode of CDCWebsite appends .html to every page
+        path = urlparse(self.path).path
+        return path[:-len('.html')] if path.endswith('.html') else path
+
+    def _has_session(self) -> bool:
+        return f'{SESSION_COOKIE}={SESSION_ID}' in self.headers.get('Cookie', '')
+
+    def do_GET(self):
+        time.sleep(self.site.latency)
+        path = self._path()
+        if path == HOME_PATH:
+            self._send(200, fixtures.build_home_page(LOGIN_PATH))
+            return
+        if path == LOGIN_PATH:
+            self._send(200, fixtures.build_login_page(self.site.captcha_delay),
+                       headers={'Set-Cookie': f'{SESSION_COOKIE}={SESSION_ID}; path=/'})
+            return
+        if not self._has_session():
+            self._redirect(LOGIN_PATH)
+            return
+
+        if self.site.error_status is not None:
+            self._send(self.site.error_status, 'Server error')
+            return
+        page = self.site.get_page(path)
+        if page is None:
+            self._send(404, 'Not found')
+        elif page == 'alert':
+            self._redirect('/NewPortal/Alert.aspx')
+        else:
+            self._send(200, page)
+
+    def do_POST(self):
+        time.sleep(self.site.latency)
+        path = self._path()
+        if not self._has_session():
+            self._redirect(LOGIN_PATH)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        form = {name: values[0] for name, values in parse_qs(
+            self.rfile.read(length).decode('utf-8'), keep_blank_values=True).items()}
+        if path == LOGIN_PATH:
+            # the login form has been submitted (once the captcha is "solved")
+            self._redirect('/NewPortal/Booking/StatementBooking.aspx')
+            return
+        if self.site.error_status is not None:
+            self._send(self.site.error_status, 'Server error')
+            return
+        if form.get('__VIEWSTATE') != fixtures.VIEWSTATE or form.get('__EVENTVALIDATION') != fixtures.EVENTVALIDATION:
+            self._send(500, 'Invalid postback or callback argument')
+            return
+
+        page = self.site.post_page(path, form)
+        if page is None:
+            self._send(404, 'Not found')
+        else:
+            self._send(200, page)
+
+
+# the pages of the stand-in portal, can be changed while the server is running
+# pages found in recorded_dir (e.g. BookingPL.aspx.html for GET, BookingPL.aspx.post.html for postbacks) are served
+# as they are, all other pages are synthetic
+class FixtureSite:
+    def __init__(self, grid_kwargs: dict = None, bookings=None, course='Class 2B Lesson 5',
+                 theory_test_name='Basic Theory Test', theory_test_access=True, practical_test_access=True, latency=0.0,
+                 reserve_alert: str = None, recorded_dir: str = None, error_status: int = None,
+                 captcha_delay: float = None):
+        self.grid_kwargs = grid_kwargs or {}
+        self.bookings = bookings if bookings is not None else (
+            ('05/Feb/2021', '08:30', '10:10', 'Class 2B Lesson 2BL5'),)
+        self.course = course
+        self.theory_test_name = theory_test_name
+        self.theory_test_access = theory_test_access
+        self.practical_test_access = practical_test_access
+        # simulated server latency per request, in seconds
+        self.latency = latency
+        # alert shown when clicking a session (e.g. "You need a valid PDL to book Lesson 6"), None = session is reserved
+        self.reserve_alert = reserve_alert
+        self.recorded_dir = recorded_dir
+        # ids of the session inputs reserved by clicking them
+        self.reserved = set()
+        # status every booking page is answered with instead (e.g. 500 for a portal error), None = the pages are served
+        self.error_status = error_status
+        # seconds after which the login page submits itself (like a user solving the captcha), None = never
+        self.captcha_delay = captcha_delay
+
+    def _get_recorded_page(self, path: str, suffix: str):
+        if self.recorded_dir is None:
+            return None
+        page_path = os.path.join(self.recorded_dir, f"{path.split('/')[-1]}{suffix}")
+        if not os.path.isfile(page_path):
+            return None
+        with open(page_path, 'r') as stream:
+            return stream.read()
+
+    # availability grid page of the given booking page (after all questions have been answered)
+    def _get_grid_page(self, path: str, alert: str = None):
+        grid_kwargs = dict(self.grid_kwargs, reserved=frozenset(self.reserved))
+        if path.endswith('/BookingPL.aspx'):
+            return fixtures.build_practical_lessons_page(self.course, alert=alert, **grid_kwargs)
+        if path.endswith('/BookingTT.aspx'):
+            return fixtures.build_theory_test_page(self.theory_test_name, alert=alert, **grid_kwargs)
+        if path.endswith('/BookingPT.aspx'):
+            return fixtures.build_availability_page(alert=alert, **grid_kwargs)
+        return None
+
+    def get_page(self, path: str):
+        recorded_page = self._get_recorded_page(path, '.html')
+        if recorded_page is not None:
+            return recorded_page
+        if path.endswith('/StatementBooking.aspx'):
+            return fixtures.build_statement_page(self.bookings)
+        if path.endswith('/BookingPL.aspx'):
+            return fixtures.build_course_selection_page((self.course,))
+        if path.endswith('/BookingTT.aspx'):
+            return fixtures.build_terms_page() if self.theory_test_access else 'alert'
+        if path.endswith('/BookingPT.aspx'):
+            return fixtures.build_licence_question_page() if self.practical_test_access else 'alert'
+        if path.endswith('/Alert.aspx'):
+            return fixtures.build_alert_page()
+        if path.endswith('/logOut.aspx'):
+            return fixtures.build_page('', title='Logout')
+        return None
+
+    def post_page(self, path: str, form: dict):
+        recorded_page = self._get_recorded_page(path, '.post.html')
+        if recorded_page is not None:
+            return recorded_page
+
+        # click on a session (image input, e.g. ctl00$ContentPlaceHolder1$gvLatestav$ctl02$btnSession4.x)
+        clicked_sessions = [name[:-len('.x')] for name in form if name.endswith('.x') and 'btnSession' in name]
+        if clicked_sessions:
+            if self.reserve_alert is not None:
+                return self._get_grid_page(path, alert=self.reserve_alert)
+            self.reserved ^= {clicked_sessions[0].replace('$', '_')}
+            return self._get_grid_page(path)
+
+        if path.endswith('/BookingPL.aspx') and form.get('ctl00$ContentPlaceHolder1$ddlCourse'):
+            return self._get_grid_page(path)
+        if path.endswith('/BookingTT.aspx') and form.get('ctl00$ContentPlaceHolder1$chkTermsAndCond') == 'on':
+            return self._get_grid_page(path)
+        if path.endswith('/BookingPT.aspx'):
+            if 'ctl00$ContentPlaceHolder1$btnNo' in form:
+                return fixtures.build_terms_page()
+            if form.get('ctl00$ContentPlaceHolder1$chkTermsAndCond') == 'on':
+                return self._get_grid_page(path)
+        return None
+
+
+# runs the stand-in portal in a background thread (port 0 picks a free port)
+class FixtureServer:
+    def __init__(self, site: FixtureSite = None, host='127.0.0.1', port=0):
+        self.site = site or FixtureSite()
+        handler = type('BoundFixtureRequestHandler',
+                       (FixtureRequestHandler,), {'site': self.site})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    # cookies of an authenticated session (as returned by driver.get_cookies())
+    @property
+    def session_cookies(self) -> list:
+        return [{'name': SESSION_COOKIE, 'value': SESSION_ID, 'path': '/'}]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--port', type=int, default=8080, help='Port to listen on')
+    PARSER.add_argument('--scenario', choices=fixtures.GRID_SCENARIOS.keys(), default='sparse',
+                        help='How populated the availability grids are')
+    PARSER.add_argument('--latency', type=float, default=0.0,
+                        help='Simulated server latency per request in seconds')
+    PARSER.add_argument('--reserve_alert', default=None,
+                        help='Alert shown when clicking a session (e.g. "PDL required")')
+    PARSER.add_argument('--recorded_dir', default=None,
+                        help='Directory with recorded pages (served instead of the synthetic ones)')
+    ARGS = PARSER.parse_args()
+
+    site = FixtureSite(grid_kwargs={'fill_ratio': fixtures.GRID_SCENARIOS[ARGS.scenario]}, latency=ARGS.latency,
+                       reserve_alert=ARGS.reserve_alert, recorded_dir=ARGS.recorded_dir)
+    with FixtureServer(site, port=ARGS.port) as server:
+        print(f"Serving the stand-in CDC portal on {server.url} (login via {server.url}{LOGIN_PATH})")
+        server.thread.join()
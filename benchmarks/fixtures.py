@@ -0,0 +1,170 @@
+import datetime
+import random
+
+SESSION_TIMES = ['08:30 - 10:10', '10:20 - 12:00', '12:45 - 14:25', '14:35 - 16:15',
+                 '16:25 - 18:05', '18:50 - 20:30', '20:40 - 22:20', '22:30 - 00:10']
+
+# free slot / booked slot / not available images, as used by the CDC portal
+IMAGE_AVAILABLE = '../../Images/Images1.gif'
+IMAGE_BOOKED = '../../Images/Images3.gif'
+IMAGE_NOT_AVAILABLE = '../../Images/Images0.gif'
+
+VIEWSTATE = 'dDwtMTA4MTk2NzYwMzt0PDtsPGk8MT47PjtsPHQ8O2w8aTwxPjs+Oz4+Oz4+Oz4='
+EVENTVALIDATION = '/wEWBALxtaDUBwKV0/zGDQLwjNDoBQKNvNvGDg=='
+
+POSTBACK_SCRIPT = '''<script type="text/javascript">
+var theForm = document.forms['aspnetForm'];
+function __doPostBack(eventTarget, eventArgument) {
+    theForm.__EVENTTARGET.value = eventTarget;
+    theForm.__EVENTARGUMENT.value = eventArgument;
+    theForm.submit();
+}
+</script>'''
+
+
+# share of available slots of the synthetic grids, from empty to fully populated
+GRID_SCENARIOS = {
+    'empty': 0.0,
+    'sparse': 0.05,
+    'half': 0.5,
+    'full': 1.0,
+}
+
+
+# wraps the given body into an ASP.NET web form (incl. the hidden postback fields)
+def build_page(body: str, title='Booking') -> str:
+    return f'''<html>
+<head><title>{title}</title></head>
+<body>
+<form name="aspnetForm" method="post" id="aspnetForm">
+<input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value="" />
+<input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value="" />
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{VIEWSTATE}" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{EVENTVALIDATION}" />
+{POSTBACK_SCRIPT}
+{body}
+</form>
+</body>
+</html>
+'''
+
+
+# builds a gvLatestav availability grid like the one of BookingPL/BookingTT/BookingPT.aspx
+# fill_ratio defines the share of slots which are available (0.0 = empty, 1.0 = fully populated)
+# reserved is a set of input ids which are shown as booked (Images3.gif) instead of their random state
+def build_availability_grid(days=30, sessions=len(SESSION_TIMES), fill_ratio=0.3, booked=0,
+                            start_date=datetime.date(2021, 1, 16), seed=42, reserved=frozenset()) -> str:
+    rnd = random.Random(seed)
+    header = ''.join(
+        f'<th scope="col">Session {i + 1}<br />{SESSION_TIMES[i % len(SESSION_TIMES)]}</th>' for i in range(sessions))
+    rows = [f'<tr><th scope="col">Date</th><th scope="col">Day</th>{header}</tr>']
+
+    booked_slots = set(rnd.sample(range(days * sessions), booked))
+    for day in range(days):
+        date = start_date + datetime.timedelta(days=day)
+        cells = []
+        for session in range(sessions):
+            input_id = f'ctl00_ContentPlaceHolder1_gvLatestav_ctl{day + 2:02d}_btnSession{session + 1}'
+            if day * sessions + session in booked_slots or input_id in reserved:
+                src = IMAGE_BOOKED
+            elif rnd.random() < fill_ratio:
+                src = IMAGE_AVAILABLE
+            else:
+                src = IMAGE_NOT_AVAILABLE
+            cells.append(
+                f'<td><input type="image" name="ctl00$ContentPlaceHolder1$gvLatestav$ctl{day + 2:02d}$btnSession{session + 1}" '
+                f'id="{input_id}" src="{src}" /></td>')
+        rows.append(
+            f'<tr><td>{date.strftime("%d/%b/%Y")}</td><td>{date.strftime("%a").upper()}</td>{"".join(cells)}</tr>')
+
+    return f'''<span id="ctl00_ContentPlaceHolder1_lblSessionNo">Session</span>
+<table class="grid" cellspacing="0" rules="all" border="1" id="ctl00_ContentPlaceHolder1_gvLatestav">
+{"".join(rows)}
+</table>'''
+
+
+# alert is shown by the browser once the page has been loaded (e.g. after clicking a session which can't be booked)
+def build_availability_page(alert: str = None, **grid_kwargs) -> str:
+    return build_page(build_availability_grid(**grid_kwargs) + _build_alert_script(alert))
+
+
+def _build_alert_script(alert: str) -> str:
+    if alert is None:
+        return ''
+    return f'<script type="text/javascript">window.onload = function () {{ alert("{alert}"); }};</script>'
+
+
+# BookingPL.aspx before a course has been selected
+def build_course_selection_page(courses=('Class 2B Lesson 5',)) -> str:
+    options = ''.join(
+        f'<option value="{i + 1}">{course}</option>' for i, course in enumerate(courses))
+    return build_page(f'''<select name="ctl00$ContentPlaceHolder1$ddlCourse" id="ctl00_ContentPlaceHolder1_ddlCourse"
+ onchange="javascript:setTimeout('__doPostBack(\\'ctl00$ContentPlaceHolder1$ddlCourse\\',\\'\\')', 0)">
+<option selected="selected" value="">Select</option>
+{options}
+</select>''')
+
+
+# BookingPL.aspx after a course has been selected
+def build_practical_lessons_page(course='Class 2B Lesson 5', alert: str = None, **grid_kwargs) -> str:
+    return build_page(f'''<select name="ctl00$ContentPlaceHolder1$ddlCourse" id="ctl00_ContentPlaceHolder1_ddlCourse">
+<option value="">Select</option>
+<option selected="selected" value="1">{course}</option>
+</select>
+{build_availability_grid(**grid_kwargs)}{_build_alert_script(alert)}''')
+
+
+# terms & conditions step of BookingTT.aspx & BookingPT.aspx
+def build_terms_page() -> str:
+    return build_page('''<input id="ctl00_ContentPlaceHolder1_chkTermsAndCond" type="checkbox" name="ctl00$ContentPlaceHolder1$chkTermsAndCond" />
+<label for="ctl00_ContentPlaceHolder1_chkTermsAndCond">I agree to the terms and conditions</label>
+<input type="submit" name="ctl00$ContentPlaceHolder1$btnAgreeTerms" value="Agree" id="ctl00_ContentPlaceHolder1_btnAgreeTerms" />''')
+
+
+# "Do you currently hold other classes of Qualified Driving Licence?" step of BookingPT.aspx
+def build_licence_question_page() -> str:
+    return build_page('''<span id="ctl00_ContentPlaceHolder1_lblQuestion">Do you currently hold other classes of Qualified Driving Licence?</span>
+<input type="submit" name="ctl00$ContentPlaceHolder1$btnYes" value="Yes" id="ctl00_ContentPlaceHolder1_btnYes" />
+<input type="submit" name="ctl00$ContentPlaceHolder1$btnNo" value="No" id="ctl00_ContentPlaceHolder1_btnNo" />''')
+
+
+# BookingTT.aspx after the terms have been agreed to
+def build_theory_test_page(test_name='Basic Theory Test', alert: str = None, **grid_kwargs) -> str:
+    return build_page(f'''<span id="ctl00_ContentPlaceHolder1_lblResAsmBlyDesc">{test_name}</span>
+{build_availability_grid(**grid_kwargs)}{_build_alert_script(alert)}''')
+
+
+# StatementBooking.aspx with the given bookings as (date, start, end, lesson name) tuples
+def build_statement_page(bookings=(('05/Feb/2021', '08:30', '10:10', 'Class 2B Lesson 2BL5'),)) -> str:
+    rows = ''.join(
+        f'<tr><td>{date}</td><td>{datetime.datetime.strptime(date, "%d/%b/%Y").strftime("%a").upper()}</td>'
+        f'<td>{start}</td><td>{end}</td><td>{lesson}</td></tr>' for date, start, end, lesson in bookings)
+    return build_page(f'''<table cellspacing="0" rules="all" border="1" id="ctl00_ContentPlaceHolder1_gvBooked">
+<tr><th scope="col">Date</th><th scope="col">Day</th><th scope="col">Start</th><th scope="col">End</th><th scope="col">Lesson</th></tr>
+{rows}
+</table>''', title='Statement Booking')
+
+
+# home page (home_url) with the login link as 10th entry of the top menu
+def build_home_page(login_path: str) -> str:
+    menu = ''.join(f'<li><a href="#">Menu {index}</a></li>' for index in range(1, 10))
+    return f'''<html>
+<head><title>ComfortDelGro Driving Centre</title></head>
+<body>
+<div id="top-menu"><ul>{menu}<li><a href="{login_path}">Login</a></li></ul></div>
+</body>
+</html>
+'''
+
+
+# login form, submitted by itself after captcha_delay seconds (like a user solving the captcha), None = never
+def build_login_page(captcha_delay: float = None) -> str:
+    script = '' if captcha_delay is None else f'''<script type="text/javascript">
+setTimeout(function () {{ document.getElementById('aspnetForm').submit(); }}, {int(captcha_delay * 1000)});
+</script>'''
+    return build_page(f'<input name="userId" /><input name="password" type="password" />{script}', title='Login')
+
+
+# Alert.aspx ("You do not have access to this facility.")
+def build_alert_page(message='You do not have access to this facility.') -> str:
+    return build_page(f'<span id="ctl00_ContentPlaceHolder1_lblMessage">{message}</span>', title='Alert')
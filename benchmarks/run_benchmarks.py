@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+# end-to-end cycle benchmark suite: runs full monitor cycles (booking statement + all types) against the local
+# stand-in portal for every engine/extraction mode and grid scenario, headless and without network access
+#
+# measured per cycle: latency, WebDriver round trips, HTTP requests, python memory peak and chrome memory (if psutil
+# is installed), with all grids parsed (changed) and the latency with all grids unchanged (recognized by their
+# fingerprint); results are written as JSON, so they can be compared between versions
+#
+# usage: python3 -m benchmarks.run_benchmarks [--repeat 5] [--latency 0.05] [--output bench_results.json]
+
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from benchmarks.bench_grid_extraction import count_round_trips, forget_grids
+from benchmarks.fixture_server import LOGIN_PATH, FixtureServer, FixtureSite
+from benchmarks.fixtures import GRID_SCENARIOS
+from cdc_abstract import Engines, ExtractionModes, Types
+from cdc_website import CDCWebsite
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# (name, engine, extraction mode, parallel checks)
+VARIANTS = [
+    ('browser-element', Engines.BROWSER, ExtractionModes.ELEMENT, False),
+    ('browser-script', Engines.BROWSER, ExtractionModes.SCRIPT, False),
+    ('browser-page_source', Engines.BROWSER, ExtractionModes.PAGE_SOURCE, False),
+    ('http', Engines.HTTP, ExtractionModes.SCRIPT, False),
+    ('http-parallel', Engines.HTTP, ExtractionModes.SCRIPT, True),
+]
+
+
+def get_version() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+
+# resident memory of chromedriver & all browser processes (in MB), None if psutil is not installed
+def get_browser_memory_mb(cdc_website: CDCWebsite):
+    if psutil is None:
+        return None
+    try:
+        service_process = psutil.Process(cdc_website.driver.service.process.pid)
+        processes = [service_process] + service_process.children(recursive=True)
+        return sum(process.memory_info().rss for process in processes) / 1024 / 1024
+    except psutil.Error:
+        return None
+
+
+# one monitor cycle, same steps as the main loop of cdc_camper.py
+def run_cycle(cdc_website: CDCWebsite, parallel=False):
+    cdc_website.open_booking_overview()
+    cdc_website.get_booked_lesson_date_time()
+    if parallel:
+        cdc_website.prefetch([Types.PRACTICAL, Types.BTT, Types.RTT, Types.PT])
+
+    cdc_website.open_practical_lessons_booking(type=Types.PRACTICAL)
+    cdc_website.get_all_session_date_times(type=Types.PRACTICAL)
+    cdc_website.get_all_available_sessions(type=Types.PRACTICAL)
+    cdc_website.check_eligibility(type=Types.PRACTICAL)
+
+    for type in (Types.BTT, Types.RTT):
+        if cdc_website.open_theory_test_booking_page(type=type):
+            cdc_website.get_all_session_date_times(type=type)
+            cdc_website.get_all_available_sessions(type=type)
+
+    if cdc_website.open_practical_test_booking_page():
+        cdc_website.get_all_session_date_times(type=Types.PT)
+        cdc_website.get_all_available_sessions(type=Types.PT)
+        cdc_website.check_eligibility(type=Types.PT)
+
+
+def run_variant(cdc_website: CDCWebsite, counter: dict, engine: str, extraction_mode: str, parallel: bool,
+                repeat: int) -> dict:
+    cdc_website.extraction_mode = extraction_mode
+    if engine == Engines.HTTP:
+        cdc_website.use_http_engine()
+    http_requests = {'count': 0}
+    if cdc_website.http_client is not None:
+        cdc_website.http_client.session.hooks['response'].append(
+            lambda response, *args, **kwargs: http_requests.update(count=http_requests['count'] + 1))
+
+    latencies = []
+    unchanged_latencies = []
+    round_trips = []
+    requests = []
+    memory_peaks = []
+    try:
+        # warm up (connections, caches)
+        run_cycle(cdc_website, parallel)
+        for _ in range(repeat):
+            # the grids of the stand-in portal don't change between the cycles, they are parsed again only once they
+            # are forgotten
+            forget_grids(cdc_website)
+            counter['round_trips'] = 0
+            http_requests['count'] = 0
+            tracemalloc.start()
+            start = time.perf_counter()
+            run_cycle(cdc_website, parallel)
+            latencies.append((time.perf_counter() - start) * 1000)
+            memory_peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+            tracemalloc.stop()
+            round_trips.append(counter['round_trips'])
+            requests.append(http_requests['count'])
+            # the same cycle with all grids unchanged (recognized by their fingerprint, not parsed)
+            start = time.perf_counter()
+            run_cycle(cdc_website, parallel)
+            unchanged_latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        if cdc_website.http_client is not None:
+            cdc_website.http_client.close()
+            cdc_website.http_client = None
+
+    return {
+        'cycle_latency_ms': {'mean': statistics.mean(latencies), 'min': min(latencies), 'max': max(latencies)},
+        'unchanged_cycle_latency_ms': {'mean': statistics.mean(unchanged_latencies), 'min': min(unchanged_latencies),
+                                       'max': max(unchanged_latencies)},
+        'webdriver_round_trips': statistics.mean(round_trips),
+        'http_requests': statistics.mean(requests),
+        'python_memory_peak_kb': max(memory_peaks),
+        'browser_memory_mb': get_browser_memory_mb(cdc_website),
+        'available_sessions': {type: len(snapshot) for type, snapshot in cdc_website.available_sessions.items()},
+    }
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--repeat', type=int, default=5, help='Measured cycles per variant & scenario')
+    PARSER.add_argument('--latency', type=float, default=0.0,
+                        help='Simulated server latency per request in seconds')
+    PARSER.add_argument('--days', type=int, default=30, help='Number of grid rows')
+    PARSER.add_argument('--scenarios', nargs='+', choices=GRID_SCENARIOS.keys(), default=list(GRID_SCENARIOS.keys()),
+                        help='Grid scenarios to run')
+    PARSER.add_argument('--output', default='bench_results.json', help='JSON file to write the results to')
+    ARGS = PARSER.parse_args()
+
+    site = FixtureSite(latency=ARGS.latency)
+    results = []
+    with FixtureServer(site) as server:
+        with CDCWebsite('benchmark', 'benchmark', headless=True, booking_url=server.url) as cdc_website:
+            # sets the session cookie
+            cdc_website.driver.get(f"{server.url}{LOGIN_PATH}")
+            counter = count_round_trips(cdc_website.driver)
+
+            for scenario in ARGS.scenarios:
+                site.grid_kwargs = {'days': ARGS.days, 'fill_ratio': GRID_SCENARIOS[scenario]}
+                for name, engine, extraction_mode, parallel in VARIANTS:
+                    result = run_variant(cdc_website, counter, engine, extraction_mode, parallel, ARGS.repeat)
+                    result.update({'variant': name, 'scenario': scenario})
+                    results.append(result)
+                    print(f"{scenario:<7} {name:<20} {result['cycle_latency_ms']['mean']:>8.0f}ms "
+                          f"({result['unchanged_cycle_latency_ms']['mean']:>6.0f}ms unchanged) "
+                          f"{result['webdriver_round_trips']:>6.0f} round trips {result['http_requests']:>4.0f} requests "
+                          f"{result['python_memory_peak_kb']:>8.0f}KB")
+
+    with open(ARGS.output, 'w') as stream:
+        json.dump({
+            'version': get_version(),
+            'timestamp': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'repeat': ARGS.repeat,
+            'latency': ARGS.latency,
+            'days': ARGS.days,
+            'results': results,
+        }, stream, indent=2)
+    print(f"Results written to {ARGS.output}")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+# local stand-in for the SMTP server (smtp_server/smtp_port with smtp_starttls False & an empty smtp_user): accepts
+# every mail & keeps it in memory, counts the connections and can drop them (like a server closing idle connections)
+# or refuse mails temporarily
+#
+# usage: python3 -m benchmarks.smtp_server [--port 1025]
+
+import argparse
+import email
+import socket
+import socketserver
+import threading
+
+
+class SmtpRequestHandler(socketserver.StreamRequestHandler):
+    # set by SmtpServer
+    smtp_server = None
+
+    def _reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode('utf-8'))
+
+    def handle(self):
+        self.smtp_server.connection_opened(self)
+        try:
+            self._reply("220 localhost SMTP stand-in")
+            mail_from, rcpt_tos = None, []
+            for raw_line in self.rfile:
+                command = raw_line.decode('utf-8').rstrip('\r\n')
+                verb = command.split(' ')[0].upper()
+                if verb in ('EHLO', 'HELO'):
+                    self._reply("250 localhost")
+                elif verb == 'MAIL':
+                    mail_from, rcpt_tos = command.split(':', 1)[1].strip(' <>'), []
+                    self._reply("250 OK")
+                elif verb == 'RCPT':
+                    rcpt_tos.append(command.split(':', 1)[1].strip(' <>'))
+                    self._reply("250 OK")
+                elif verb == 'DATA':
+                    self._reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    for data_line in self.rfile:
+                        if data_line in (b'.\r\n', b'.\n'):
+                            break
+                        lines.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                    self._reply(self.smtp_server.deliver(mail_from, rcpt_tos, b''.join(lines)))
+                elif verb in ('NOOP', 'RSET'):
+                    self._reply("250 OK")
+                elif verb == 'QUIT':
+                    self._reply("221 Bye")
+                    break
+                else:
+                    self._reply("502 Command not implemented")
+        except OSError:
+            # dropped by drop_connections()
+            pass
+        finally:
+            self.smtp_server.connection_closed(self)
+
+
+# runs the stand-in in a background thread (port 0 picks a free port)
+class SmtpServer:
+    def __init__(self, host='127.0.0.1', port=0):
+        handler = type('BoundSmtpRequestHandler', (SmtpRequestHandler,), {'smtp_server': self})
+        self.server = socketserver.ThreadingTCPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+        self._lock = threading.Condition()
+        # delivered mails as email.message.Message (with the envelope in X-Mail-From & X-Rcpt-To)
+        self.messages = []
+        self.connections = 0
+        self._open_handlers = set()
+        # number of the next mails refused with a temporary error (451)
+        self.refuse_next = 0
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def connection_opened(self, handler: SmtpRequestHandler):
+        with self._lock:
+            self.connections += 1
+            self._open_handlers.add(handler)
+
+    def connection_closed(self, handler: SmtpRequestHandler):
+        with self._lock:
+            self._open_handlers.discard(handler)
+
+    def deliver(self, mail_from: str, rcpt_tos: list, data: bytes) -> str:
+        with self._lock:
+            if self.refuse_next > 0:
+                self.refuse_next -= 1
+                return "451 Try again later"
+            message = email.message_from_bytes(data)
+            message['X-Mail-From'] = mail_from
+            message['X-Rcpt-To'] = ', '.join(rcpt_tos)
+            self.messages.append(message)
+            self._lock.notify_all()
+        return "250 OK"
+
+    # closes all open connections without a reply (e.g. a server dropping idle connections)
+    def drop_connections(self):
+        with self._lock:
+            handlers = list(self._open_handlers)
+        for handler in handlers:
+            try:
+                handler.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    # waits until count mails have been delivered, returns whether they were
+    def wait_for_messages(self, count: int, timeout=10) -> bool:
+        with self._lock:
+            return self._lock.wait_for(lambda: len(self.messages) >= count, timeout)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--port', type=int, default=1025, help='Port to listen on')
+    ARGS = PARSER.parse_args()
+
+    with SmtpServer(port=ARGS.port) as smtp_server:
+        print(f"SMTP stand-in listening on localhost:{smtp_server.port} (smtp_starttls: False, no smtp_user)")
+        while True:
+            count = len(smtp_server.messages)
+            smtp_server.wait_for_messages(count + 1, timeout=None)
+            message = smtp_server.messages[count]
+            print(f"Mail to {message['X-Rcpt-To']}: {message['Subject']}")
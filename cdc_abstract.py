@@ -5,45 +5,22 @@ class CDCAbstract:
         self.password = pw
         self.headless = headless
 
+        # per type snapshots (AvailabilitySnapshot) of the latest cycle, each cycle replaces the previous snapshot
+        self.available_sessions = {}
+        self.booked_sessions = {}
+
         # vars (practical)
-        self.available_days_practical = []
-        self.available_days_in_view_practical = []
-        self.available_times_practical = []
-        self.available_sessions_practical = {}
-        self.booked_sessions_practical = {}
         self.lesson_name_practical = ''
         self.can_book_next_practical_lesson = True
         self.has_auto_reserved_practical = False
 
-        # vars (road revision)
-        self.available_days_rr = []
-        self.available_days_in_view_rr = []
-        self.available_times_rr = []
-        self.available_sessions_rr = {}
-        self.booked_sessions_rr = {}
-
         # vars (btt)
-        self.available_days_btt = []
-        self.available_days_in_view_btt = []
-        self.available_times_btt = []
-        self.available_sessions_btt = {}
-        self.booked_sessions_btt = {}
         self.lesson_name_btt = ''
 
         # vars (rtt)
-        self.available_days_rtt = []
-        self.available_days_in_view_rtt = []
-        self.available_times_rtt = []
-        self.available_sessions_rtt = {}
-        self.booked_sessions_rtt = {}
         self.lesson_name_rtt = ''
 
         # vars (pt)
-        self.available_days_pt = []
-        self.available_days_in_view_pt = []
-        self.available_times_pt = []
-        self.available_sessions_pt = {}
-        self.booked_sessions_pt = {}
         self.lesson_name_pt = ''
         self.can_book_pt = True
 
@@ -54,3 +31,19 @@ class Types:
     BTT = "btt"
     RTT = "rtt"
     PT = "pt"
+
+
+class ExtractionModes:
+    # one WebDriver round trip per row, cell and input (slow, kept for comparison)
+    ELEMENT = "element"
+    # the whole grid is read by a single execute_script call
+    SCRIPT = "script"
+    # the whole page is fetched once via page_source and parsed locally
+    PAGE_SOURCE = "page_source"
+
+
+class Engines:
+    # every page is loaded & parsed by chrome
+    BROWSER = "browser"
+    # after the login, pages are fetched by a keep-alive http client with the cookies of the browser
+    HTTP = "http"
@@ -0,0 +1,126 @@
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from cdc_snapshot import AvailabilitySnapshot
+
+# longest long-poll (?wait=seconds) of a request
+MAX_WAIT = 300
+
+
+def _to_json_slots(snapshot: AvailabilitySnapshot) -> list:
+    return [{'start': slot.start.isoformat(), 'end': slot.end.isoformat()} for slot in snapshot or ()]
+
+
+# latest availability of all monitored users, served as JSON from memory on http://host:port:
+# GET /availability (all users) & /availability/<username>, both with a weak ETag which only changes when the
+# available or booked sessions changed (If-None-Match -> 304) and ?wait=<seconds> to wait for the next change
+class AvailabilityApi:
+    def __init__(self):
+        # notified on every change
+        self._condition = threading.Condition()
+        self._version = 0
+        # user -> version of the last change
+        self._user_versions = {}
+        # user -> type -> (available & booked session times, time of the last change)
+        self._user_sessions = {}
+        # user -> document of the user
+        self._documents = {}
+        # encoded bodies of the current version: user (None = all users) -> bytes
+        self._payloads = {}
+        self._server: ThreadingHTTPServer = None
+
+    # takes over the latest snapshots of the user (at the end of each cycle)
+    def publish(self, user: str, available_sessions: dict, booked_sessions: dict):
+        now = datetime.datetime.now()
+        with self._condition:
+            sessions = self._user_sessions.setdefault(user, {})
+            changed = user not in self._documents
+            types = {}
+            for type, snapshot in available_sessions.items():
+                times = (tuple((slot.start, slot.end) for slot in snapshot),
+                         tuple((slot.start, slot.end) for slot in booked_sessions.get(type) or ()))
+                if type not in sessions or sessions[type][0] != times:
+                    sessions[type] = (times, now)
+                    changed = True
+                types[type] = {
+                    'available': _to_json_slots(snapshot),
+                    'booked': _to_json_slots(booked_sessions.get(type)),
+                    'checked_at': snapshot.taken_at.isoformat(),
+                    'updated_at': sessions[type][1].isoformat(),
+                }
+            if changed:
+                self._version += 1
+                self._user_versions[user] = self._version
+            self._documents[user] = {'user': user, 'version': self._user_versions[user], 'types': types}
+            self._payloads = {}
+            if changed:
+                self._condition.notify_all()
+
+    def _get_version(self, user: str = None) -> int:
+        return self._version if user is None else self._user_versions.get(user)
+
+    def _get_payload(self, user: str = None) -> bytes:
+        if user not in self._payloads:
+            document = self._documents[user] if user is not None else {
+                'version': self._version, 'users': list(self._documents.values())}
+            self._payloads[user] = json.dumps(document).encode('utf-8')
+        return self._payloads[user]
+
+    # (etag, body) of the user (None = all users), waits up to wait seconds for a change while the given etag is the
+    # current one (the body is None if it still is), returns None if the user is unknown
+    def get(self, user: str = None, etag: str = None, wait: float = 0):
+        with self._condition:
+            if user is not None and user not in self._documents:
+                return None
+            self._condition.wait_for(lambda: f'W/"{self._get_version(user)}"' != etag, timeout=wait)
+            current_etag = f'W/"{self._get_version(user)}"'
+            return current_etag, self._get_payload(user) if current_etag != etag else None
+
+    # serves the api on http://host:port
+    def start_server(self, port: int, host='127.0.0.1'):
+        api = self
+
+        class ApiRequestHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = url.path.strip('/').split('/')
+                if parts[0] != 'availability' or len(parts) > 2:
+                    self.send_error(404)
+                    return
+                try:
+                    wait = min(float(parse_qs(url.query).get('wait', ['0'])[0]), MAX_WAIT)
+                except ValueError:
+                    self.send_error(400, 'wait must be a number of seconds')
+                    return
+
+                result = api.get(parts[1] if len(parts) == 2 else None,
+                                 self.headers.get('If-None-Match'), max(wait, 0))
+                if result is None:
+                    self.send_error(404, 'Unknown user')
+                    return
+                etag, payload = result
+                self.send_response(304 if payload is None else 200)
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+                if payload is not None:
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                if payload is not None:
+                    self.wfile.write(payload)
+
+        self._server = ThreadingHTTPServer((host, port), ApiRequestHandler)
+        threading.Thread(target=self._server.serve_forever,
+                         name="api-server", daemon=True).start()
+
+    def stop_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
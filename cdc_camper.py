@@ -2,67 +2,105 @@
 
 import tempfile
 import argparse
+import contextlib
 import datetime
+import functools
 import os
-import platform
-import smtplib
-import socket
 import sys
-from time import sleep
+import time
 import traceback
-from email.message import EmailMessage
+from typing import TYPE_CHECKING
+
+import cdc_status
+from cdc_abstract import Engines, ExtractionModes, Types
+from cdc_config import ConfigWatcher, load_config
+from cdc_history import HistoryStore
+from cdc_snapshot import AvailabilitySnapshot, Slot
+from utils import metrics
+from utils.logger import Logger
+from utils.scheduler import PollScheduler
 
 
-from cdc_website import CDCWebsite, Types
-from utils.logger import Logger
+from utils.util import (ALL_SLOTS_FILTER, CONFIG_FILE_PATH, compile_slot_filter,
+                        reload_config_yml)
+
+# selenium (cdc_website, cdc_watchdog), the api & the smtp client are only imported when the monitor runs, so the
+# status subcommands start without them
+if TYPE_CHECKING:
+    from cdc_api import AvailabilityApi
+    from cdc_website import CDCWebsite, SharedDriver
+    from utils.mailer import MailOutbox
+
+
+logger = Logger.logger
+
+# types which can be checked, in the order of the checks
+CHECKED_TYPES = [Types.PRACTICAL, Types.BTT, Types.RTT, Types.PT]
+
+# set up by the entry point (the main block below or a cdc_supervisor worker)
+history: HistoryStore = None
+outbox: 'MailOutbox' = None
+# optional local availability api (api_port)
+api: 'AvailabilityApi' = None
+# (user, type) -> hash of the last logged availability, it is only logged again once it changed
+logged_availability = {}
+
 
+# compiles the date (e.g. 'mo;sa', 'na' = any day) & time (e.g. '8-14', 'na' = any time) filters of all types
+def get_slot_filters(account: dict) -> dict:
+    return {type: compile_slot_filter(account.get(f'date_filter_{type}', 'na'), account.get(f'time_filter_{type}', 'na'))
+            for type in CHECKED_TYPES}
 
-from utils.util import reload_config_yml
 
+# reserves the earliest of the (filtered) available sessions if it is earlier than the booked (or an already
+# reserved) session, returns the reserved slot (None if auto_reserve is not set or nothing has been reserved)
+def auto_reserve_earlier_session(cdc_website: 'CDCWebsite', account: dict, type: str,
+                                 available_sessions: AvailabilitySnapshot) -> Slot:
+    booked_session = cdc_website.booked_sessions.get(type, AvailabilitySnapshot(type)).earliest
+    earliest_session = available_sessions.earliest
+    if not account.get('auto_reserve', False) or booked_session is None or earliest_session is None:
+        return None
+    reserved_session = cdc_website.reserved_sessions.get(type)
+    if earliest_session.start >= booked_session.start or \
+            (reserved_session is not None and earliest_session.start >= reserved_session.start):
+        return None
+    return earliest_session if cdc_website.reserve_session(type, earliest_session) else None
 
-# converts custom format date (16/Jan/2021) and time (10:20 - 12:00) to datetime
-def convert_to_date_time(date_str: str, time_str: str) -> datetime:
-    # take only start time for date_time creation
-    time_str = time_str.split(' ')[0]
-    return datetime.datetime.strptime(f'{date_str} | {time_str}', '%d/%b/%Y | %H:%M')
+
+# logs the availability of the type unless it is the same as the one logged last time
+def log_availability(user: str, type: str, message: str):
+    if logged_availability.get((user, type)) == hash(message):
+        logger.debug(f"Availability of the {type} sessions of {user} unchanged")
+        return
+    logged_availability[(user, type)] = hash(message)
+    logger.info(message)
 
 
 # sends out an email to the user, if any of the following conditions is true:
 # a) there are available sessions AND user has not booked any yet
 # b) there are available sessions AND earliest available session is earlier than booked session of user
-def inform_user_if_earlier_session_available(user, type: str):
+# c) a session has been reserved for the user (see auto_reserve_earlier_session)
+# only the available sessions passing the slot filter of the type are considered
+def inform_user_if_earlier_session_available(cdc_website: 'CDCWebsite', account: dict, type: str,
+                                             slot_filter=ALL_SLOTS_FILTER):
     # define base vars
+    user = account['username']
     inform_user = False
     mail_body = ""
 
-    # define vars based on type (practical/rtt/btt)
-    if "Windows" in platform.system():
-        last_cdc_session_file_path = f'{tempfile.gettempdir()}\\last_cdc_session_{user}_{type}'
-    elif 'Linux' in platform.system():
-        last_cdc_session_file_path = f'{tempfile.gettempdir()}/last_cdc_session_{user}_{type}'
-
-    available_sessions = {}
-    booked_sessions = {}
-    if type == Types.PRACTICAL:
-        available_sessions = cdc_website.available_sessions_practical
-        booked_sessions = cdc_website.booked_sessions_practical
-    elif type == Types.BTT:
-        available_sessions = cdc_website.available_sessions_btt
-        booked_sessions = cdc_website.booked_sessions_btt
-    elif type == Types.RTT:
-        available_sessions = cdc_website.available_sessions_rtt
-        booked_sessions = cdc_website.booked_sessions_rtt
-    elif type == Types.PT:
-        available_sessions = cdc_website.available_sessions_pt
-        booked_sessions = cdc_website.booked_sessions_pt
+    available_sessions: AvailabilitySnapshot = cdc_website.available_sessions.get(
+        type, AvailabilitySnapshot(type)).filtered(slot_filter)
+    reserved_session = auto_reserve_earlier_session(cdc_website, account, type, available_sessions)
+    booked_sessions: AvailabilitySnapshot = cdc_website.booked_sessions.get(
+        type, AvailabilitySnapshot(type))
 
     if len(available_sessions) == 0:
-        # delete last cdc session file to ensure a clean state once
+        # forget the notified session to ensure a clean state once
         # there are sessions available yet
-        if os.path.exists(last_cdc_session_file_path):            
-            os.remove(last_cdc_session_file_path)
-        logger.info(
-            f"There are no {type} sessions available for booking yet, exit early")
+        history.reset_notified_slot(user, type)
+        log_availability(
+            user, type, f"There are no {type} sessions available for booking yet"
+            f"{' (within the date/time filters)' if slot_filter != ALL_SLOTS_FILTER else ''}, exit early")
         return
     else:
         if type == Types.PRACTICAL:
@@ -70,71 +108,48 @@ def inform_user_if_earlier_session_available(user, type: str):
         else:
             mail_body += f"There are the following availuserable {type.upper()} sessions for you ({user}):\n\n"
 
-        index = 1
-        for i, (available_session_date, available_session_times) in enumerate(available_sessions.items()):
-            for available_session_time in available_session_times:
-                mail_body += f"- Available session #{index}: {available_session_date} @ {available_session_time}\n"
-                index += 1
+        for index, available_session in enumerate(available_sessions, 1):
+            mail_body += f"- Available session #{index}: {available_session.date_str} @ {available_session.time_str}\n"
 
         if len(booked_sessions) > 0:
             mail_body += "\nYou have already booked the following session(s):\n\n"
-            for i, (booked_session_date, booked_session_time) in enumerate(booked_sessions.items(), 1):
-                mail_body += f"- Booked session #{i}: {booked_session_date} @ {booked_session_time}\n"
+            for i, booked_session in enumerate(booked_sessions, 1):
+                mail_body += f"- Booked session #{i}: {booked_session.date_str} @ {booked_session.time_str}\n"
 
             # Step 2: Find out if there is an earlier slot available
-            booked_session_date = list(booked_sessions.keys())[0]
-            booked_session_time = list(booked_sessions.values())[0]
-            booked_session_datetime = convert_to_date_time(
-                booked_session_date, booked_session_time)
-            earliest_available_session_date = None
-            earliest_available_session_time = None
-            # TODO: Make accessing of the first item of the dict easier
-            for i, (available_session_date, available_session_time) in enumerate(available_sessions.items()):
-                if i == 0:
-                    earliest_available_session_date = available_session_date
-                    # it's a list, so take first entry always
-                    earliest_available_session_time = available_session_time[0]
-                    break
-
-            # convert to real datetime for proper date comparison
-            earliest_available_session_datetime = convert_to_date_time(
-                earliest_available_session_date, earliest_available_session_time)
+            booked_session_datetime = booked_sessions.earliest.start
+            # a session reserved in an earlier cycle is held already, only the sessions earlier than it are worth a
+            # rebooking
+            held_session = cdc_website.reserved_sessions.get(type)
+            if held_session is not None and reserved_session is None:
+                mail_body += (f"\nThe session {held_session.date_str} @ {held_session.time_str} has been reserved for "
+                              f"you - Complete the booking on the CDC website!\n")
+                booked_session_datetime = min(booked_session_datetime, held_session.start)
+            earliest_available_session_datetime = available_sessions.earliest.start
 
             # only send email if earliest available session is before booked one
-            if earliest_available_session_datetime < booked_session_datetime:
+            if reserved_session is not None:
+                mail_body += (f"\n-> The earlier session {reserved_session.date_str} @ {reserved_session.time_str} has "
+                              f"been reserved for you - Complete the booking on the CDC website!")
+                inform_user = True
+                history.set_notified_slot(
+                    user, type, earliest_available_session_datetime)
+            elif earliest_available_session_datetime < booked_session_datetime:
                 mail_body += "\n-> There is an earlier session available - Consider rebooking!"
 
                 # check if email has been sent out already with that earliest available session
-                earliest_available_session_datetime_string = earliest_available_session_datetime.strftime(
-                    '%Y%m%d-%H%M')
-                if not os.path.isfile(last_cdc_session_file_path):
-                    inform_user = True
-                    # write datetime of earliest available session into file
-                    with open(last_cdc_session_file_path, 'w') as stream:
-                        stream.write(
-                            earliest_available_session_datetime_string)
+                if history.get_notified_slot(user, type) == earliest_available_session_datetime:
+                    logger.info(
+                        "No need to send out another email as there is no earlier session available")
                 else:
-                    try:
-                        with open(last_cdc_session_file_path, 'r+') as stream:
-                            last_cdc_session_datetime = datetime.datetime.strptime(
-                                stream.read().replace("\n", ""), '%Y%m%d-%H%M')
-                            if last_cdc_session_datetime == earliest_available_session_datetime:
-                                logger.info(
-                                    "No need to send out another email as there is no earlier session available")
-                            else:
-                                inform_user = True
-                                # write datetime of earliest available session into file
-                                stream.seek(0)
-                                stream.write(
-                                    earliest_available_session_datetime_string)
-                                stream.truncate()
-                    except Exception as e:
-                        inform_user = True
+                    inform_user = True
+                    history.set_notified_slot(
+                        user, type, earliest_available_session_datetime)
             else:
                 mail_body += "\n-> There is no earlier session available."
 
                 # Inform user always, if configured
-                if config['notify_always']:
+                if account['notify_always']:
                     inform_user = True
         else:
             mail_body += "\nYou have not booked any session yet!"
@@ -142,38 +157,290 @@ def inform_user_if_earlier_session_available(user, type: str):
 
             # Step 3: Send email about latest updates (if there is something worth notifying)
         if mail_body != "":
-            logger.info(mail_body)
+            log_availability(user, type, mail_body)
 
     if inform_user:
-        # send email
-        mailserver = None
+        # queue email (sent out by the outbox worker, together with the other types of this cycle)
+        earliest_available_session_datetime = available_sessions.earliest.start
+        to_email_address = account['to_email']
+        # the detection lag is measured from the first time the (still visible) session has been seen
+        first_seen = None
+        if metrics.REGISTRY.enabled:
+            first_seen = history.get_first_seen(
+                user, type, earliest_available_session_datetime) or available_sessions.taken_at
+
+        def on_sent():
+            history.record_notification(
+                user, type, earliest_available_session_datetime, to_email_address)
+            if first_seen is not None:
+                metrics.DETECTION_LAG.observe(
+                    (datetime.datetime.now() - first_seen).total_seconds(), type)
+        outbox.add(to_email_address, 'Practical Lesson' if type == Types.PRACTICAL else type.upper(), mail_body,
+                   on_sent=on_sent)
+
+
+# opens the booking page of the given type & reads its availability (nothing is clicked, so it can be run again after
+# a failure), returns (whether the type could be checked, whether the grid or the booked sessions of the type changed)
+# the type can't be checked if it is not bookable for the user
+def read_availability(cdc_website: 'CDCWebsite', type: str, booked_changed=True) -> tuple:
+    if type == Types.PRACTICAL:
+        cdc_website.open_practical_lessons_booking(type=Types.PRACTICAL)
+        if "REVISION" in cdc_website.lesson_name_practical:
+            logger.debug(
+                "No practical lesson available for user, seems user has completed practical lessons")
+            return False, False
+        changed = cdc_website.get_all_session_date_times(type=Types.PRACTICAL) or booked_changed
+        cdc_website.get_all_available_sessions(type=Types.PRACTICAL)
+        return True, changed
+
+    # TODO: enable road revision (Types.ROAD_REVISION) as well
+
+    if type in (Types.BTT, Types.RTT):
+        if not cdc_website.open_theory_test_booking_page(type=type):
+            logger.debug(f"{type.upper()} not bookable for user")
+            return False, False
+        changed = cdc_website.get_all_session_date_times(type=type) or booked_changed
+        cdc_website.get_all_available_sessions(type=type)
+        return True, changed
+
+    if type == Types.PT:
+        if not cdc_website.open_practical_test_booking_page():
+            logger.debug("PT not bookable for user")
+            return False, False
+        changed = cdc_website.get_all_session_date_times(type=Types.PT) or booked_changed
+        cdc_website.get_all_available_sessions(type=Types.PT)
+        return True, changed
+
+    raise ValueError(f"Unknown type '{type}'")
+
+
+# probes whether the user can book the type read last by read_availability & informs the user if needed (reserving a
+# session with auto_reserve); sessions are clicked here, so it is not run again after a failure
+# the user is only informed again if the grid or the booked sessions of the type changed (or notify_always is set)
+def inform_user(cdc_website: 'CDCWebsite', account: dict, type: str, changed: bool, slot_filter=ALL_SLOTS_FILTER):
+    cdc_website.check_eligibility(type)
+    if type == Types.PRACTICAL and not cdc_website.can_book_next_practical_lesson:
+        return
+    if type == Types.PT and not cdc_website.can_book_pt:
+        return
+    if changed or account['notify_always']:
+        inform_user_if_earlier_session_available(cdc_website, account, type=type, slot_filter=slot_filter)
+
+
+# config of every monitored user: the top level config with the overrides of the entry in accounts
+# (without accounts, the top level username & password are monitored)
+def get_accounts(config: dict) -> list:
+    accounts = config.get('accounts') or [
+        {'username': config['username'], 'password': config['password']}]
+    return [{**config, **account} for account in accounts]
+
+
+# state of one monitored user
+class UserMonitor:
+    def __init__(self, cdc_website: 'CDCWebsite', account: dict):
+        from cdc_watchdog import DriverWatchdog
+        self.cdc_website = cdc_website
+        self.account = account
+        self.scheduler = PollScheduler.from_config(
+            account, [type for type in CHECKED_TYPES if account[f'check_{type}']])
+        self.booked_soon_delta = datetime.timedelta(
+            hours=account.get('poll_booked_soon_hours', 48))
+        self.slot_filters = get_slot_filters(account)
+        # recovers from crashes/hangs of the (shared) chrome
+        self.watchdog = DriverWatchdog.from_config(
+            account, cdc_website.shared_driver) if cdc_website.shared_driver is not None else None
+
+    # applies the changed config of the user between two cycles, keeping the (logged in) website & its chrome
+    def reconfigure(self, account: dict):
+        previous_scheduler = self.scheduler
+        self.account = account
+        self.scheduler = PollScheduler.from_config(
+            account, [type for type in CHECKED_TYPES if account[f'check_{type}']])
+        self.scheduler.take_over(previous_scheduler)
+        self.booked_soon_delta = datetime.timedelta(
+            hours=account.get('poll_booked_soon_hours', 48))
+        self.slot_filters = get_slot_filters(account)
+        if self.watchdog is not None:
+            self.watchdog.operation_timeout = account.get('watchdog_operation_timeout', 180)
+            self.watchdog.max_attempts = account.get('watchdog_max_attempts', 3)
+            self.watchdog.retry_delay = account.get('watchdog_retry_delay', 5)
+
+        cdc_website = self.cdc_website
+        cdc_website.password = account['password']
+        cdc_website.extraction_mode = account.get('extraction_mode', ExtractionModes.SCRIPT)
+        cdc_website.page_load_timeout = account.get('page_load_timeout', 10)
+        cdc_website.alert_timeout = account.get('alert_timeout', 5)
+        cdc_website.captcha_timeout = account.get('captcha_timeout', 3600)
+        cdc_website.booked_sessions_ttl = account.get('booked_sessions_ttl', 3600)
+        cdc_website.eligibility_ttl = account.get('eligibility_ttl', 21600)
+        # the http engine is started by the next cycle
+        if account.get('engine', Engines.BROWSER) == Engines.BROWSER:
+            cdc_website.use_browser_engine()
+
+    # runs an operation on the website of the user (supervised by the watchdog)
+    def run(self, operation, *args, **kwargs):
+        if self.watchdog is None:
+            return operation(*args, **kwargs)
+        return self.watchdog.call(self.cdc_website, operation, *args, **kwargs)
+
+    # runs an operation which must not be repeated (e.g. it clicks sessions) on the website of the user
+    def run_once(self, operation, *args, **kwargs):
+        if self.watchdog is None:
+            return operation(*args, **kwargs)
+        return self.watchdog.call_once(self.cdc_website, operation, *args, **kwargs)
+
+
+# a chrome for several users (chromes running at the same time need their own profile_name)
+def create_shared_driver(config: dict, headless=False, profile_name: str = None) -> 'SharedDriver':
+    from cdc_website import SharedDriver, create_driver
+    profile_dir = config.get('chrome_profile_dir')
+    if profile_dir is not None and profile_name is not None:
+        profile_dir = f"{profile_dir}/{profile_name}"
+    lean = config.get('lean_mode', False)
+    create = functools.partial(create_driver, headless, profile_dir, lean)
+    return SharedDriver(create(), lean=lean, create=create)
+
+
+# the website of the account, using the given (shared) chrome
+def create_website(account: dict, shared_driver: 'SharedDriver', headless=False, account_count=1) -> 'CDCWebsite':
+    from cdc_website import CDCWebsite
+    cookie_jar = account.get('cookie_jar')
+    if cookie_jar is not None and account_count > 1 and '{username}' not in cookie_jar:
+        # one cookie jar per user
+        root, extension = os.path.splitext(cookie_jar)
+        cookie_jar = f"{root}_{{username}}{extension}"
+    return CDCWebsite(
+        account['username'], account['password'], headless=headless,
+        extraction_mode=account.get('extraction_mode', ExtractionModes.SCRIPT),
+        page_load_timeout=account.get('page_load_timeout', 10),
+        alert_timeout=account.get('alert_timeout', 5),
+        captcha_timeout=account.get('captcha_timeout', 3600),
+        cookie_jar=cookie_jar.format(
+            username=account['username']) if cookie_jar is not None else None,
+        lean=shared_driver.lean,
+        driver=shared_driver,
+        booked_sessions_ttl=account.get('booked_sessions_ttl', 3600),
+        eligibility_ttl=account.get('eligibility_ttl', 21600))
+
+
+# applies a changed config (see cdc_config.ConfigWatcher) to the monitors of the users who are still in it & to the
+# outbox, between two cycles
+def apply_config(monitors: list, config: dict):
+    accounts = {account['username']: account for account in get_accounts(config)}
+    for monitor in monitors:
+        if monitor.account['username'] in accounts:
+            monitor.reconfigure(accounts[monitor.account['username']])
+    outbox.reconfigure(config)
+
+
+# fair interleaving of the users: the user with the earliest due type goes next, on ties the user who has been
+# waiting the longest (the returned monitor is moved to the end of monitors)
+def next_monitor(monitors: list) -> UserMonitor:
+    monitor = min(monitors, key=lambda monitor: monitor.scheduler.time_until_next())
+    monitors.remove(monitor)
+    monitors.append(monitor)
+    return monitor
+
+
+def login(monitor: UserMonitor):
+    cdc_website = monitor.cdc_website
+    cdc_website.activate()
+    if not cdc_website.resume_session():
+        logger.info(f"Logging in user {monitor.account['username']}")
+        cdc_website.open_home_website()
+        cdc_website.login()
+        cdc_website.save_session()
+
+
+# checks all types of the user which are due & sends out the notifications, returns the number of checked types
+def run_cycle(monitor: UserMonitor) -> int:
+    from cdc_watchdog import OperationFailedError
+    cdc_website = monitor.cdc_website
+    account = monitor.account
+    user = account['username']
+    cycle_started_at = datetime.datetime.now()
+
+    # Step 1b: Poll via http once logged in (again, if the http engine fell back to the browser)
+    # (every operation activates the website of the user in its chrome first)
+    if account.get('engine', Engines.BROWSER) == Engines.HTTP and cdc_website.http_client is None:
+        try:
+            monitor.run(cdc_website.use_http_engine)
+        except OperationFailedError as e:
+            logger.warning(f"Could not switch {user} to the HTTP engine: {e}")
+
+    # Step 2: Get booking information (cached, see booked_sessions_ttl)
+    def read_booked_sessions():
+        cdc_website.open_booking_overview()
+        cdc_website.get_booked_lesson_date_time()
+
+    previous_booked_sessions = cdc_website.booked_sessions
+    if cdc_website.booked_sessions_expired():
+        try:
+            monitor.run(read_booked_sessions)
+        except OperationFailedError as e:
+            logger.error(f"Could not read the booked sessions of {user}: {e}")
+            return 0
+    # types whose booked sessions changed (e.g. a lesson was booked or cancelled), they are compared again
+    booked_changed_types = {type for type in set(previous_booked_sessions) | set(cdc_website.booked_sessions)
+                            if getattr(previous_booked_sessions.get(type), 'slots', None)
+                            != getattr(cdc_website.booked_sessions.get(type), 'slots', None)}
+
+    # Step 3: Check availability of all types which are due
+    due_types = monitor.scheduler.due_types()
+    if account.get('parallel_checks', False):
         try:
-            mailserver = smtplib.SMTP(
-                config['smtp_server'], config['smtp_port'])
-            mailserver.ehlo()
-            mailserver.starttls()
-            mailserver.login(config['smtp_user'], config['smtp_pw'])
-
-            from_email_address = config['from_email']
-            to_email_address = config['to_email']
-
-            msg = EmailMessage()
-            msg.set_content(mail_body)
-            msg['From'] = from_email_address
-            msg['To'] = to_email_address
-            msg['Subject'] = f"CDC {'Practical Lesson' if type == 'practical' else type.upper()} Sessions"
-
-            logger.info(f"Sending out email to {to_email_address}")
-            mailserver.sendmail(from_addr=from_email_address,
-                                to_addrs=to_email_address, msg=msg.as_string())
-        except socket.gaierror:
-            logger.warning(
-                "Socket issue while sending email - Are you in VPN/proxy?")
-        except Exception as e:
-            logger.error(f"Something went wrong while sending an email: {e}")
-        finally:
-            if mailserver != None:
-                mailserver.quit()
+            monitor.run(cdc_website.prefetch, due_types)
+        except OperationFailedError as e:
+            # the types are loaded one after another
+            logger.warning(f"Could not prefetch the pages of {user}: {e}")
+    for type in due_types:
+        previous_snapshot = cdc_website.available_sessions.get(type)
+        check_started_at = time.perf_counter()
+        try:
+            checked, grid_changed = monitor.run(read_availability, cdc_website, type,
+                                                booked_changed=type in booked_changed_types)
+        except OperationFailedError as e:
+            logger.error(f"Could not check the {type} sessions of {user}: {e}")
+            checked = False
+        if checked:
+            try:
+                monitor.run_once(inform_user, cdc_website, account, type, grid_changed,
+                                 slot_filter=monitor.slot_filters[type])
+            except OperationFailedError as e:
+                logger.error(f"Could not inform {user} about the {type} sessions: {e}")
+                # the grid counts as changed next time, so the user is informed then
+                cdc_website.invalidate_grid(type)
+        if checked:
+            snapshot = cdc_website.available_sessions[type]
+            # by the session times (the input ids of the grid shift when the day rolls over)
+            changed = previous_snapshot is not None and any(snapshot.delta(previous_snapshot))
+        else:
+            changed = False
+        metrics.CYCLE_DURATION.observe(
+            time.perf_counter() - check_started_at, type)
+        # the next booked session which is still ahead (past ones keep showing up in the statement)
+        now = datetime.datetime.now()
+        booked_session = next((slot for slot in cdc_website.booked_sessions.get(type, ()) if slot.start > now), None)
+        monitor.scheduler.record(type, changed, booked_soon=booked_session is not None and
+                                 booked_session.start - now < monitor.booked_soon_delta)
+
+    # Step 4: Send one digest for all types & store everything observed within this cycle at once
+    outbox.flush_cycle()
+    for snapshot in cdc_website.available_sessions.values():
+        if snapshot.taken_at >= cycle_started_at:
+            history.record_snapshot(user, snapshot)
+    history.commit_cycle()
+    if api is not None:
+        api.publish(user, cdc_website.available_sessions, cdc_website.booked_sessions)
+    try:
+        monitor.run(cdc_website.save_session)
+    except OperationFailedError as e:
+        logger.warning(f"Could not save the session of {user}: {e}")
+    if cdc_website.lean:
+        lean_stats = cdc_website.pop_lean_stats()
+        logger.info(f"Lean mode ({user}): loaded {lean_stats['bytes_loaded'] / 1024:.0f}KB, saved ~"
+                    f"{lean_stats['bytes_saved'] / 1024:.0f}KB ({lean_stats['blocked_requests']} requests blocked)")
+    return len(due_types)
 
 
 if __name__ == "__main__":
@@ -183,100 +450,103 @@ if __name__ == "__main__":
                         help='The log level (10-50)', default=20, required=False)
     PARSER.add_argument('--headless',
                         help='Headless mode', required=False, action='store_true')
+    # subcommands reading the history of the monitor (without a command, the monitor is run)
+    SUBPARSERS = PARSER.add_subparsers(dest='command')
+    for command, help in (('status', 'Available sessions of every type at its latest check'),
+                          ('history', 'Latest sessions which showed up'),
+                          ('last-notified', 'Latest notification of every type')):
+        COMMAND_PARSER = SUBPARSERS.add_parser(command, help=help)
+        COMMAND_PARSER.add_argument('--user', help='Only this user')
+        COMMAND_PARSER.add_argument('--history_db', help='History database (defaults to history_db of config.yml)')
+        if command != 'status':
+            COMMAND_PARSER.add_argument('--type', choices=CHECKED_TYPES, help='Only this type')
+        if command == 'history':
+            COMMAND_PARSER.add_argument('--limit', type=int, default=20, help='Number of sessions')
     ARGS = PARSER.parse_args()
 
-    logger = Logger.logger
+    if ARGS.command is not None:
+        history_db = ARGS.history_db or (reload_config_yml() if os.path.isfile(CONFIG_FILE_PATH) else {}).get(
+            'history_db', f'{tempfile.gettempdir()}/cdc_camper_history.db')
+        if not os.path.isfile(history_db):
+            print(f"There is no history yet ({history_db} does not exist)", file=sys.stderr)
+            sys.exit(1)
+        with HistoryStore(history_db, read_only=True) as history_store:
+            if ARGS.command == 'status':
+                cdc_status.print_status(history_store, ARGS.user)
+            elif ARGS.command == 'history':
+                cdc_status.print_history(history_store, ARGS.user, ARGS.type, ARGS.limit)
+            else:
+                cdc_status.print_last_notified(history_store, ARGS.user, ARGS.type)
+        sys.exit(0)
+
+    from cdc_api import AvailabilityApi
+    from utils.mailer import MailOutbox
+
     logger.setLevel(ARGS.log_level)
 
-    config = reload_config_yml()
+    config = load_config()
+    Logger.configure(config)
+    history = HistoryStore(config.get(
+        'history_db', f'{tempfile.gettempdir()}/cdc_camper_history.db'))
+    outbox = MailOutbox.from_config(config)
+    if config.get('metrics_port'):
+        metrics.REGISTRY.start_server(
+            config['metrics_port'], config.get('metrics_host', '127.0.0.1'))
+    if config.get('api_port'):
+        api = AvailabilityApi()
+        api.start_server(config['api_port'], config.get('api_host', '127.0.0.1'))
 
     try:
+        accounts = get_accounts(config)
         logger.info(f"------------------------------")
-        logger.info(f"Running for user {config['username']}")
+        logger.info(
+            f"Running for user(s) {', '.join(account['username'] for account in accounts)}")
         logger.info(f"------------------------------")
 
-        # Step 1: Open CDC website and login
-        with CDCWebsite(config['username'], config['password'], headless=ARGS.headless) as cdc_website:
-            cdc_website.open_home_website()
-            cdc_website.login()
-
-            while True:
-                # Step 2: Get booking information
-                cdc_website.open_booking_overview()
-                cdc_website.get_booked_lesson_date_time()
-
-                # Step 3: Check for practical lesson availability
-                if config['check_practical']:
-                    cdc_website.open_practical_lessons_booking(
-                        type=Types.PRACTICAL)
-                    if "REVISION" in cdc_website.lesson_name_practical:
-                        logger.debug(
-                            "No practical lesson available for user, seems user has completed practical lessons")
-                    else:
-                        cdc_website.get_all_session_date_times(
-                            type=Types.PRACTICAL)
-                        cdc_website.get_all_available_sessions(
-                            type=Types.PRACTICAL)
-                        if cdc_website.can_book_next_practical_lesson:
-                            inform_user_if_earlier_session_available(
-                                config['username'], type=Types.PRACTICAL)
-
-                # TODO: enable this
-                # # Step 4: Check for road revision availability
-                # if config['check_rr']:
-                #     cdc_website.open_practical_lessons_booking(type=Types.ROAD_REVISION)
-                #     if "REVISION" in cdc_website.lesson_name_practical:
-                #         logger.debug(
-                #             "No practical lesson available for user, seems user has completed practical lessons")
-                #     else:
-                #         cdc_website.get_all_session_date_times(
-                #             type=Types.PRACTICAL)
-                #         cdc_website.get_all_available_sessions(
-                #             type=Types.PRACTICAL)
-                #         if cdc_website.can_book_next_practical_lesson:
-                #             inform_user_if_earlier_session_available(
-                #                 config['username'], type=Types.PRACTICAL)
-
-                # Step 4: Check for btt availability as well
-                if config['check_btt']:
-                    if cdc_website.open_theory_test_booking_page(type=Types.BTT):
-                        cdc_website.get_all_session_date_times(type=Types.BTT)
-                        cdc_website.get_all_available_sessions(type=Types.BTT)
-                        inform_user_if_earlier_session_available(
-                            config['username'], type=Types.BTT)
-                    else:
-                        logger.debug("BTT not bookable for user")
-
-                # Step 4: Check for rtt availability as well
-                if config['check_rtt']:
-                    if cdc_website.open_theory_test_booking_page(type=Types.RTT):
-                        cdc_website.get_all_session_date_times(type=Types.RTT)
-                        cdc_website.get_all_available_sessions(type=Types.RTT)
-                        inform_user_if_earlier_session_available(
-                            config['username'], type=Types.RTT)
-                    else:
-                        logger.debug("RTT not bookable for user")
-
-                # Step 6: Check for pt (practical test) availability as well
-                if config['check_pt']:
-                    if cdc_website.open_practical_test_booking_page():
-                        cdc_website.get_all_session_date_times(type=Types.PT)
-                        cdc_website.get_all_available_sessions(type=Types.PT)
-                        if cdc_website.can_book_pt:
-                            inform_user_if_earlier_session_available(
-                                config['username'], type=Types.PT)
-                    else:
-                        logger.debug("PT not bookable for user")
-
-                # Step 7: Check if stay_alive is configured
-                if not config['stay_alive']:
-                    break
-                else:
-                    logger.debug(f"Sleeping for {config['refresh_rate']}s...")
-                    sleep(config['refresh_rate'])
-
-            cdc_website.logout()
+        with contextlib.ExitStack() as stack:
+            # Step 1: Start the (shared) chromes, open CDC website and login every user
+            pool_size = min(config.get('browser_pool_size', 1), len(accounts))
+            shared_drivers = []
+            for index in range(pool_size):
+                shared_driver = create_shared_driver(
+                    config, ARGS.headless, str(index) if pool_size > 1 else None)
+                stack.callback(shared_driver.close)
+                shared_drivers.append(shared_driver)
+
+            monitors = []
+            for index, account in enumerate(accounts):
+                cdc_website = stack.enter_context(create_website(
+                    account, shared_drivers[index % pool_size], ARGS.headless, len(accounts)))
+                monitor = UserMonitor(cdc_website, account)
+                login(monitor)
+                monitors.append(monitor)
+
+            if not config['stay_alive']:
+                for monitor in monitors:
+                    run_cycle(monitor)
+            else:
+                config_watcher = ConfigWatcher(config)
+                while True:
+                    # Step 5: Apply the changes of config.yml & wait for the next user which is due
+                    changed_config = config_watcher.poll()
+                    if changed_config is not None:
+                        apply_config(monitors, changed_config)
+                    monitor = next_monitor(monitors)
+                    monitor.scheduler.sleep_until_next()
+                    run_cycle(monitor)
+
+            for monitor in monitors:
+                # keep the session for the next run if it is stored in a cookie jar
+                if monitor.cdc_website.cookie_jar is None:
+                    monitor.cdc_website.activate()
+                    monitor.cdc_website.logout()
     except Exception as e:
         logger.error(e)
         logger.error(traceback.format_exc())
         sys.exit(1)
+    finally:
+        outbox.close()
+        history.close()
+        metrics.REGISTRY.stop_server()
+        if api is not None:
+            api.stop_server()
@@ -0,0 +1,162 @@
+import os
+import re
+import sys
+
+import yaml
+
+from cdc_abstract import Engines, ExtractionModes, Types
+from utils.logger import Logger
+from utils.util import CONFIG_FILE_PATH, reload_config_yml
+
+logger = Logger.logger
+
+NUMBER = (int, float)
+TEXT = (str, int)
+FILTERED_TYPES = (Types.PRACTICAL, Types.BTT, Types.RTT, Types.PT)
+
+# type(s) of the value of every known key (None = the key may be empty)
+CONFIG_SCHEMA = {
+    'smtp_server': str, 'smtp_port': int, 'smtp_user': (str, type(None)), 'smtp_pw': (str, int, type(None)),
+    'from_email': (str, type(None)), 'smtp_starttls': bool,
+    'username': TEXT, 'password': TEXT, 'to_email': str, 'accounts': (list, type(None)), 'browser_pool_size': int,
+    'check_practical': bool, 'check_btt': bool, 'check_rtt': bool, 'check_pt': bool, 'check_rr': bool,
+    'notify_always': bool, 'auto_reserve': bool, 'stay_alive': bool, 'refresh_rate': NUMBER,
+    'poll_min_interval': NUMBER, 'poll_max_interval': NUMBER, 'poll_quiet_period': NUMBER,
+    'poll_booked_soon_hours': NUMBER, 'poll_backoff_factor': NUMBER, 'poll_jitter': NUMBER,
+    'extraction_mode': str, 'engine': str, 'parallel_checks': bool, 'booked_sessions_ttl': NUMBER,
+    'eligibility_ttl': NUMBER, 'page_load_timeout': NUMBER, 'alert_timeout': NUMBER, 'captcha_timeout': NUMBER,
+    'history_db': str, 'chrome_profile_dir': str, 'cookie_jar': (str, type(None)), 'lean_mode': bool,
+    'watchdog_operation_timeout': NUMBER, 'watchdog_max_attempts': int, 'watchdog_retry_delay': NUMBER,
+    'api_port': (int, type(None)), 'api_host': str, 'metrics_port': (int, type(None)), 'metrics_host': str,
+    'log_dir': str, 'log_max_bytes': int, 'log_rotate_when': (str, type(None)), 'log_backup_count': int,
+    'log_format': str, 'lease_db': str, 'supervisor_lease_duration': NUMBER, 'supervisor_workers': int,
+    'supervisor_memory_budget_mb': NUMBER, 'android_emulator_names': list,
+    **{f'date_filter_{type}': str for type in FILTERED_TYPES},
+    **{f'time_filter_{type}': str for type in FILTERED_TYPES},
+}
+CONFIG_CHOICES = {
+    'engine': (Engines.BROWSER, Engines.HTTP),
+    'extraction_mode': (ExtractionModes.SCRIPT, ExtractionModes.PAGE_SOURCE, ExtractionModes.ELEMENT),
+    'log_format': ('text', 'json'),
+}
+DATE_FILTER_PATTERN = re.compile(r'(na|(mo|tu|we|th|fr|sa|su)(;(mo|tu|we|th|fr|sa|su))*)$')
+TIME_FILTER_PATTERN = re.compile(r'(na|\d{1,2}-\d{1,2})$')
+# keys every monitored user needs (top level or in its accounts entry)
+REQUIRED_KEYS = ('smtp_server', 'smtp_port', 'to_email', 'refresh_rate', 'stay_alive', 'notify_always',
+                 'check_practical', 'check_btt', 'check_rtt', 'check_pt')
+# keys which are only read at the start (chrome, databases, servers, log files), a change of them is ignored until
+# the next start
+RESTART_KEYS = ('browser_pool_size', 'chrome_profile_dir', 'cookie_jar', 'lean_mode', 'history_db', 'stay_alive',
+                'api_port', 'api_host', 'metrics_port', 'metrics_host', 'log_dir', 'log_max_bytes',
+                'log_rotate_when', 'log_backup_count', 'log_format', 'lease_db', 'supervisor_lease_duration',
+                'supervisor_workers', 'supervisor_memory_budget_mb')
+
+
+def _validate_entry(entry: dict, name: str) -> list:
+    errors = []
+    for key, value in entry.items():
+        if key not in CONFIG_SCHEMA:
+            # e.g. a key of a newer version, not an error
+            logger.debug(f"Unknown config key '{key}' ({name})")
+            continue
+        expected = CONFIG_SCHEMA[key]
+        # bools are ints, but no int key is a flag
+        if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+            errors.append(f"{key} ({name}) has the wrong type: {value!r}")
+        elif key in CONFIG_CHOICES and value not in CONFIG_CHOICES[key]:
+            errors.append(f"{key} ({name}) must be one of {', '.join(CONFIG_CHOICES[key])}: {value!r}")
+        elif key.startswith('date_filter_') and not DATE_FILTER_PATTERN.match(value):
+            errors.append(f"{key} ({name}) is not a valid date filter (e.g. 'sa;su' or 'na'): {value!r}")
+        elif key.startswith('time_filter_') and not TIME_FILTER_PATTERN.match(value):
+            errors.append(f"{key} ({name}) is not a valid time filter (e.g. '8-14' or 'na'): {value!r}")
+    return errors
+
+
+# the errors of the config (empty if it is valid)
+def validate_config(config) -> list:
+    if not isinstance(config, dict):
+        return ["config.yml must contain a mapping of keys to values"]
+    errors = _validate_entry(config, 'top level')
+    if errors:
+        return errors
+
+    accounts = config.get('accounts') or [{}]
+    for index, account in enumerate(accounts, 1):
+        if not isinstance(account, dict):
+            errors.append(f"account #{index} must be a mapping of keys to values")
+            continue
+        name = f"account #{index}"
+        errors += _validate_entry(account, name)
+        merged = {**config, **account} if config.get('accounts') else config
+        errors += [f"{key} is missing ({name})" for key in ('username', 'password') + REQUIRED_KEYS
+                   if merged.get(key) is None]
+    return errors
+
+
+# reads config.yml at the start & exits with its errors if it is not valid (the same checks as for a changed config,
+# e.g. a filter which is not valid would match all sessions otherwise)
+def load_config() -> dict:
+    config = reload_config_yml()
+    errors = validate_config(config)
+    if errors:
+        sys.exit(f"{CONFIG_FILE_PATH} is not valid: {'; '.join(errors)}")
+    return config
+
+
+def _get_usernames(config: dict) -> list:
+    return [str(account.get('username')) for account in config.get('accounts') or [config]]
+
+
+# watches config.yml (mtime & size, checked at every cycle boundary) for changes of the running monitor: a valid
+# change is returned as a whole, an invalid one is logged & ignored (the running config stays in place)
+class ConfigWatcher:
+    def __init__(self, config: dict, path=CONFIG_FILE_PATH):
+        self.path = path
+        self.config = config
+        self._stat = self._get_stat()
+
+    def _get_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    # the new config if config.yml has been changed since the last call and is valid, else None
+    # (the keys of RESTART_KEYS keep their running values)
+    def poll(self) -> dict:
+        stat = self._get_stat()
+        if stat is None or stat == self._stat:
+            return None
+        self._stat = stat
+        try:
+            with open(self.path, 'r') as stream:
+                config = yaml.safe_load(stream)
+        except (OSError, yaml.YAMLError) as e:
+            logger.error(f"Ignoring the changed config, {self.path} could not be read: {e}")
+            return None
+        errors = validate_config(config)
+        if errors:
+            logger.error(f"Ignoring the changed config, {'; '.join(errors)}")
+            return None
+
+        for key in RESTART_KEYS:
+            if config.get(key) != self.config.get(key):
+                logger.warning(f"{key} has been changed, the change takes effect after a restart")
+                if key in self.config:
+                    config[key] = self.config[key]
+                else:
+                    config.pop(key, None)
+        added = set(_get_usernames(config)) - set(_get_usernames(self.config))
+        removed = set(_get_usernames(self.config)) - set(_get_usernames(config))
+        if added or removed:
+            logger.warning(f"The users have been changed (added: {', '.join(sorted(added)) or '-'}, removed: "
+                           f"{', '.join(sorted(removed)) or '-'}), the change takes effect after a restart")
+        if config == self.config:
+            return None
+
+        changed_keys = sorted(key for key in config.keys() | self.config.keys()
+                              if config.get(key) != self.config.get(key))
+        logger.info(f"Config changed ({', '.join(changed_keys)}), applying it")
+        self.config = config
+        return config
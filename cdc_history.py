@@ -0,0 +1,249 @@
+import datetime
+import functools
+import sqlite3
+import threading
+
+from cdc_snapshot import AvailabilitySnapshot
+
+DATE_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCHEMA = '''
+-- one row per continuous period in which a slot was visible
+CREATE TABLE IF NOT EXISTS slot_appearances (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    type TEXT NOT NULL,
+    slot_start TEXT NOT NULL,
+    slot_end TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_slot_appearances_user_type_slot ON slot_appearances (user, type, slot_start);
+CREATE INDEX IF NOT EXISTS idx_slot_appearances_user_type_last_seen ON slot_appearances (user, type, last_seen);
+
+-- every notification sent out
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    type TEXT NOT NULL,
+    slot_start TEXT,
+    recipient TEXT,
+    sent_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_type_slot ON notifications (user, type, slot_start);
+
+-- latest check of every type (its visible slots are the appearances last seen at checked_at)
+CREATE TABLE IF NOT EXISTS type_checks (
+    user TEXT NOT NULL,
+    type TEXT NOT NULL,
+    checked_at TEXT NOT NULL,
+    available INTEGER NOT NULL,
+    PRIMARY KEY (user, type)
+);
+
+-- earliest slot the user has been informed about (used to not send the same information twice)
+CREATE TABLE IF NOT EXISTS notification_state (
+    user TEXT NOT NULL,
+    type TEXT NOT NULL,
+    slot_start TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (user, type)
+);
+'''
+
+
+# the slot times recur every cycle (the slots are recorded & looked up by their start), so they are converted once
+@functools.lru_cache(maxsize=4096)
+def _to_db(date_time: datetime.datetime) -> str:
+    return date_time.strftime(DATE_TIME_FORMAT)
+
+
+@functools.lru_cache(maxsize=4096)
+def _from_db(value: str) -> datetime.datetime:
+    return datetime.datetime.strptime(value, DATE_TIME_FORMAT) if value is not None else None
+
+
+# local availability history & notification state
+# reads are answered directly, writes are buffered and written once per cycle by commit_cycle()
+class HistoryStore:
+    # read_only: for the status subcommands (nothing is created, the database has to exist)
+    def __init__(self, db_path: str, read_only=False):
+        self.db_path = db_path
+        if read_only:
+            self.connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        else:
+            self.connection = sqlite3.connect(db_path)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.executescript(SCHEMA)
+
+        self._pending_snapshots = []
+        # notifications are recorded by the mail outbox worker, hence the lock
+        self._pending_notifications = []
+        self._pending_notifications_lock = threading.Lock()
+        # (user, type) -> slot_start of the notification state (None = no state), written on commit
+        self._pending_notification_states = {}
+        # (user, type) -> {slot_start: appearance id} of the slots visible in the last committed cycle
+        self._open_appearances = {}
+
+    def close(self):
+        self.commit_cycle()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record_snapshot(self, user: str, snapshot: AvailabilitySnapshot):
+        self._pending_snapshots.append((user, snapshot))
+
+    def record_notification(self, user: str, type: str, slot_start: datetime.datetime, recipient: str,
+                            sent_at: datetime.datetime = None):
+        with self._pending_notifications_lock:
+            self._pending_notifications.append((user, type, _to_db(slot_start) if slot_start else None, recipient,
+                                                _to_db(sent_at or datetime.datetime.now())))
+
+    # returns the slot start the user has been informed about last (or None)
+    def get_notified_slot(self, user: str, type: str) -> datetime.datetime:
+        if (user, type) in self._pending_notification_states:
+            return _from_db(self._pending_notification_states[(user, type)])
+        row = self.connection.execute(
+            'SELECT slot_start FROM notification_state WHERE user = ? AND type = ?', (user, type)).fetchone()
+        return _from_db(row[0]) if row else None
+
+    def set_notified_slot(self, user: str, type: str, slot_start: datetime.datetime):
+        self._pending_notification_states[(user, type)] = _to_db(slot_start)
+
+    # forgets the notified slot (e.g. once there are no sessions available anymore)
+    def reset_notified_slot(self, user: str, type: str):
+        self._pending_notification_states[(user, type)] = None
+
+    def _get_open_appearances(self, user: str, type: str) -> dict:
+        if (user, type) not in self._open_appearances:
+            rows = self.connection.execute(
+                '''SELECT id, slot_start FROM slot_appearances WHERE user = ? AND type = ? AND last_seen = (
+                       SELECT MAX(last_seen) FROM slot_appearances WHERE user = ? AND type = ?)''',
+                (user, type, user, type)).fetchall()
+            self._open_appearances[(user, type)] = {
+                slot_start: appearance_id for appearance_id, slot_start in rows}
+        return self._open_appearances[(user, type)]
+
+    # returns when the slot has been seen first within its current appearance (None if it was not visible in the
+    # last committed cycle, i.e. it is new)
+    def get_first_seen(self, user: str, type: str, slot_start: datetime.datetime) -> datetime.datetime:
+        appearance_id = self._get_open_appearances(user, type).get(_to_db(slot_start))
+        if appearance_id is None:
+            return None
+        row = self.connection.execute(
+            'SELECT first_seen FROM slot_appearances WHERE id = ?', (appearance_id,)).fetchone()
+        return _from_db(row[0]) if row else None
+
+    # writes everything recorded during the cycle within one transaction
+    def commit_cycle(self):
+        with self._pending_notifications_lock:
+            pending_notifications, self._pending_notifications = self._pending_notifications, []
+        if not (self._pending_snapshots or pending_notifications or self._pending_notification_states):
+            return
+
+        with self.connection:
+            for user, snapshot in self._pending_snapshots:
+                seen_at = _to_db(snapshot.taken_at)
+                open_appearances = self._get_open_appearances(
+                    user, snapshot.type)
+                current_appearances = {}
+                updates = []
+                for slot in snapshot:
+                    slot_start = _to_db(slot.start)
+                    appearance_id = open_appearances.get(slot_start)
+                    if appearance_id is None:
+                        # slot (re)appeared
+                        appearance_id = self.connection.execute(
+                            '''INSERT INTO slot_appearances (user, type, slot_start, slot_end, first_seen, last_seen)
+                               VALUES (?, ?, ?, ?, ?, ?)''',
+                            (user, snapshot.type, slot_start, _to_db(slot.end), seen_at, seen_at)).lastrowid
+                    else:
+                        updates.append((seen_at, appearance_id))
+                    current_appearances[slot_start] = appearance_id
+                self.connection.executemany(
+                    'UPDATE slot_appearances SET last_seen = ? WHERE id = ?', updates)
+                self._open_appearances[(user, snapshot.type)] = current_appearances
+                self.connection.execute(
+                    '''INSERT INTO type_checks (user, type, checked_at, available) VALUES (?, ?, ?, ?)
+                       ON CONFLICT (user, type) DO UPDATE SET checked_at = excluded.checked_at,
+                       available = excluded.available''',
+                    (user, snapshot.type, seen_at, len(snapshot)))
+
+            self.connection.executemany(
+                'INSERT INTO notifications (user, type, slot_start, recipient, sent_at) VALUES (?, ?, ?, ?, ?)',
+                pending_notifications)
+
+            now = _to_db(datetime.datetime.now())
+            for (user, type), slot_start in self._pending_notification_states.items():
+                if slot_start is None:
+                    self.connection.execute(
+                        'DELETE FROM notification_state WHERE user = ? AND type = ?', (user, type))
+                else:
+                    self.connection.execute(
+                        '''INSERT INTO notification_state (user, type, slot_start, updated_at) VALUES (?, ?, ?, ?)
+                           ON CONFLICT (user, type) DO UPDATE SET slot_start = excluded.slot_start,
+                           updated_at = excluded.updated_at''',
+                        (user, type, slot_start, now))
+
+        self._pending_snapshots = []
+        self._pending_notification_states = {}
+
+    # number of new slot appearances per hour of the day (0-23) within the last days,
+    # answers e.g. "when do new PT slots usually appear"
+    def get_appearance_hours(self, user: str, type: str, days=30) -> dict:
+        since = _to_db(datetime.datetime.now() - datetime.timedelta(days=days))
+        rows = self.connection.execute(
+            '''SELECT CAST(strftime('%H', first_seen) AS INTEGER) AS hour, COUNT(*) FROM slot_appearances
+               WHERE user = ? AND type = ? AND first_seen >= ? GROUP BY hour ORDER BY hour''',
+            (user, type, since)).fetchall()
+        return dict(rows)
+
+    # latest notifications as (type, slot_start, recipient, sent_at) tuples, newest first
+    def get_notifications(self, user: str, type: str = None, limit=10) -> list:
+        rows = self.connection.execute(
+            '''SELECT type, slot_start, recipient, sent_at FROM notifications
+               WHERE user = ? AND (? IS NULL OR type = ?) ORDER BY id DESC LIMIT ?''',
+            (user, type, type, limit)).fetchall()
+        return [(type, _from_db(slot_start), recipient, _from_db(sent_at))
+                for type, slot_start, recipient, sent_at in rows]
+
+    def _has_table(self, table: str) -> bool:
+        return self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+    # latest check of every type as (user, type, checked_at, [(slot_start, slot_end), ...] visible then) tuples
+    def get_latest_checks(self, user: str = None) -> list:
+        # a database of an older version (opened read-only, so the table is not created) has no checks yet
+        if not self._has_table('type_checks'):
+            return []
+        checks = self.connection.execute(
+            '''SELECT user, type, checked_at FROM type_checks WHERE ? IS NULL OR user = ? ORDER BY user, type''',
+            (user, user)).fetchall()
+        return [(check_user, type, _from_db(checked_at), [
+            (_from_db(slot_start), _from_db(slot_end)) for slot_start, slot_end in self.connection.execute(
+                '''SELECT slot_start, slot_end FROM slot_appearances
+                   WHERE user = ? AND type = ? AND last_seen = ? ORDER BY slot_start''',
+                (check_user, type, checked_at))]) for check_user, type, checked_at in checks]
+
+    # latest slot appearances as (user, type, slot_start, slot_end, first_seen, last_seen) tuples, newest first
+    def get_appearances(self, user: str = None, type: str = None, limit=20) -> list:
+        rows = self.connection.execute(
+            '''SELECT user, type, slot_start, slot_end, first_seen, last_seen FROM slot_appearances
+               WHERE (? IS NULL OR user = ?) AND (? IS NULL OR type = ?) ORDER BY id DESC LIMIT ?''',
+            (user, user, type, type, limit)).fetchall()
+        return [(row[0], row[1]) + tuple(_from_db(value) for value in row[2:]) for row in rows]
+
+    # latest notification of every user & type as (user, type, slot_start, recipient, sent_at) tuples
+    def get_last_notifications(self, user: str = None, type: str = None) -> list:
+        rows = self.connection.execute(
+            '''SELECT user, type, slot_start, recipient, MAX(sent_at) FROM notifications
+               WHERE (? IS NULL OR user = ?) AND (? IS NULL OR type = ?) GROUP BY user, type ORDER BY user, type''',
+            (user, user, type, type)).fetchall()
+        return [(row_user, row_type, _from_db(slot_start), recipient, _from_db(sent_at))
+                for row_user, row_type, slot_start, recipient, sent_at in rows]
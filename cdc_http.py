@@ -0,0 +1,148 @@
+import copy
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cdc_abstract import Engines
+from utils import metrics
+from utils.grid_parser import FormParser, parse_form
+from utils.logger import Logger
+
+logger = Logger.logger
+
+
+class HttpEngineError(Exception):
+    pass
+
+
+# raised if the portal redirects away from the booking pages (e.g. to the login page)
+class SessionExpiredError(HttpEngineError):
+    pass
+
+
+# browserless client for the booking pages, re-using the cookies of an authenticated selenium session
+# (all requests go through one pooled keep-alive session)
+class CDCHttpClient:
+    def __init__(self, booking_url: str, cookies: list, user_agent: str = None, is_test=False, timeout=30, pool_size=4):
+        self.booking_url = booking_url
+        self.is_test = is_test
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if user_agent is not None:
+            self.session.headers.update({'User-Agent': user_agent})
+        for cookie in cookies:
+            self.session.cookies.set(cookie['name'], cookie['value'],
+                                     domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+
+        # the last loaded page (equivalent to driver.current_url / driver.page_source)
+        self.current_url = None
+        self.page_source = None
+        self._current_path = None
+        self._form: FormParser = None
+
+    def close(self):
+        self.session.close()
+
+    # a client with its own current page, sharing the session (cookies & connection pool) of this client
+    # (e.g. to load several pages at the same time; only the original client needs to be closed)
+    def fork(self) -> 'CDCHttpClient':
+        client = copy.copy(self)
+        client.current_url = None
+        client.page_source = None
+        client._current_path = None
+        client._form = None
+        return client
+
+    # continues with the current page of the given (forked) client, as if it had been loaded by this client
+    def take_page(self, client: 'CDCHttpClient'):
+        self.current_url = client.current_url
+        self.page_source = client.page_source
+        self._current_path = client._current_path
+        self._form = client._form
+
+    def _url(self, path: str) -> str:
+        return f"{self.booking_url}/{path}{'.html' if self.is_test else ''}"
+
+    def _handle_response(self, response: requests.Response, path: str) -> str:
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            # e.g. a portal error (500), the browser may still be able to load the page
+            raise HttpEngineError(f"Could not load {path}: {e}")
+        # the path must still be part of the final url, unless the portal shows an alert
+        # (e.g. "You do not have access to this facility.")
+        page_name = path.split('?')[0].split('/')[-1]
+        if page_name not in response.url and "Alert.aspx" not in response.url:
+            raise SessionExpiredError(
+                f"Requested {path}, but ended up at {response.url}")
+
+        self.current_url = response.url
+        self.page_source = response.text
+        self._current_path = path
+        self._form = None
+        return self.page_source
+
+    # parsed form of the current page (lazy, as most pages are only read)
+    @property
+    def form(self) -> FormParser:
+        if self._form is None:
+            self._form = parse_form(self.page_source)
+        return self._form
+
+    def get(self, path: str) -> str:
+        start = time.perf_counter()
+        try:
+            response = self.session.get(self._url(path), timeout=self.timeout)
+        except requests.RequestException as e:
+            raise HttpEngineError(f"Could not load {path}: {e}")
+        page_source = self._handle_response(response, path)
+        metrics.PAGE_LOAD_DURATION.observe(
+            time.perf_counter() - start, path, Engines.HTTP)
+        return page_source
+
+    # replays an ASP.NET postback of the current page (e.g. a dropdown change or a button click)
+    # fields are keyed by element id and are translated into the form names
+    def postback(self, event_target_id: str = None, fields: dict = None, extra_data: dict = None) -> str:
+        if self.page_source is None:
+            raise HttpEngineError("No page loaded to post back from")
+
+        form = self.form
+        if "__VIEWSTATE" not in form.hidden_fields:
+            raise HttpEngineError(
+                f"{self._current_path} has no __VIEWSTATE to post back")
+
+        data = dict(form.hidden_fields)
+        data['__EVENTTARGET'] = form.names.get(
+            event_target_id, '') if event_target_id is not None else ''
+        data['__EVENTARGUMENT'] = ''
+        for element_id, value in (fields or {}).items():
+            if element_id not in form.names:
+                raise HttpEngineError(
+                    f"{self._current_path} has no element {element_id}")
+            data[form.names[element_id]] = value
+        data.update(extra_data or {})
+
+        try:
+            response = self.session.post(
+                self.current_url, data=data, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise HttpEngineError(
+                f"Could not post back {self._current_path}: {e}")
+        return self._handle_response(response, self._current_path)
+
+    # replays the click on an image input of the current page (e.g. a session of the availability grid)
+    def click_image(self, element_id: str) -> str:
+        name = self.form.names.get(element_id)
+        if name is None:
+            raise HttpEngineError(
+                f"{self._current_path} has no element {element_id}")
+        return self.postback(extra_data={f'{name}.x': '1', f'{name}.y': '1'})
+
+    # returns true if the current page contains an element with the given id
+    def has_element(self, element_id: str) -> bool:
+        return f'id="{element_id}"' in self.page_source
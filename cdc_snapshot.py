@@ -0,0 +1,76 @@
+import datetime
+from operator import attrgetter
+from typing import NamedTuple
+
+from utils.util import (ALL_SLOTS_FILTER, from_epoch_minutes, is_in_slot_filter,
+                        to_epoch_minutes)
+
+
+# a single session of a given type (tuple backed, so it is small & immutable)
+class Slot(NamedTuple):
+    type: str
+    start: datetime.datetime
+    end: datetime.datetime
+    # id of the session input of the grid (e.g. ctl00_ContentPlaceHolder1_gvLatestav_ctl02_btnSession4),
+    # None for booked sessions
+    column_id: str = None
+
+    # creates a slot from the portal format date (16/Jan/2021) and time (10:20 - 12:00)
+    @classmethod
+    def from_portal(cls, type: str, date_str: str, time_str: str, column_id: str = None):
+        start, end = to_epoch_minutes(date_str, time_str)
+        return cls(type, from_epoch_minutes(start), from_epoch_minutes(end), column_id)
+
+    # date in the portal format (16/Jan/2021)
+    @property
+    def date_str(self) -> str:
+        return self.start.strftime('%d/%b/%Y')
+
+    # time in the portal format (10:20 - 12:00)
+    @property
+    def time_str(self) -> str:
+        return f"{self.start.strftime('%H:%M')} - {self.end.strftime('%H:%M')}"
+
+
+# immutable, time sorted view of all sessions of a type at one point in time
+# (a new snapshot replaces the previous one every cycle, so nothing accumulates over a long run)
+class AvailabilitySnapshot:
+    __slots__ = ('type', 'taken_at', 'slots')
+
+    def __init__(self, type: str, slots=(), taken_at: datetime.datetime = None):
+        self.type = type
+        self.taken_at = taken_at or datetime.datetime.now()
+        self.slots = tuple(sorted(slots, key=attrgetter('start')))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __iter__(self):
+        return iter(self.slots)
+
+    def __repr__(self):
+        return f"AvailabilitySnapshot(type={self.type!r}, taken_at={self.taken_at!r}, slots={len(self.slots)})"
+
+    # marks the (unchanged) slots as seen again now
+    def touch(self):
+        self.taken_at = datetime.datetime.now()
+
+    # slots added & removed compared to the previous snapshot (by start & end, the input ids move with the grid rows)
+    def delta(self, previous: 'AvailabilitySnapshot') -> tuple:
+        previous_times = {(slot.start, slot.end) for slot in previous} if previous is not None else set()
+        times = {(slot.start, slot.end) for slot in self.slots}
+        added = [slot for slot in self.slots if (slot.start, slot.end) not in previous_times]
+        removed = [slot for slot in previous or () if (slot.start, slot.end) not in times]
+        return added, removed
+
+    # snapshot of the slots passing the compiled slot filter (see utils.util.compile_slot_filter)
+    def filtered(self, slot_filter: int) -> 'AvailabilitySnapshot':
+        if slot_filter == ALL_SLOTS_FILTER:
+            return self
+        return AvailabilitySnapshot(self.type, [slot for slot in self.slots if is_in_slot_filter(slot.start, slot_filter)],
+                                    self.taken_at)
+
+    # earliest slot (or None if there is none)
+    @property
+    def earliest(self) -> Slot:
+        return self.slots[0] if self.slots else None
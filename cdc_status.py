@@ -0,0 +1,51 @@
+import datetime
+
+from cdc_history import HistoryStore
+
+# subcommands of cdc_camper.py answering "what did the monitor see last?" from the history database, without chrome
+# (only the standard library & the history are imported, so they start within tens of milliseconds)
+
+DATE_TIME_FORMAT = '%d/%b/%Y %H:%M'
+
+
+def _format(date_time: datetime.datetime) -> str:
+    return date_time.strftime(DATE_TIME_FORMAT) if date_time is not None else '-'
+
+
+def _format_age(date_time: datetime.datetime) -> str:
+    minutes = int((datetime.datetime.now() - date_time).total_seconds() // 60)
+    if minutes < 60:
+        return f"{minutes}min ago"
+    return f"{minutes // 60}h {minutes % 60}min ago" if minutes < 1440 else f"{minutes // 1440}d ago"
+
+
+# available sessions of every type at its latest check
+def print_status(history: HistoryStore, user: str = None):
+    checks = history.get_latest_checks(user)
+    if len(checks) == 0:
+        print("Nothing has been checked yet")
+    for check_user, type, checked_at, slots in checks:
+        print(f"{check_user} {type.upper()}: {len(slots)} available, checked {_format(checked_at)} "
+              f"({_format_age(checked_at)})")
+        for slot_start, slot_end in slots:
+            print(f"  - {_format(slot_start)} - {slot_end.strftime('%H:%M')}")
+
+
+# latest slot appearances (when a slot showed up & until when it was visible)
+def print_history(history: HistoryStore, user: str = None, type: str = None, limit=20):
+    appearances = history.get_appearances(user, type, limit)
+    if len(appearances) == 0:
+        print("No sessions have been seen yet")
+    for appearance_user, appearance_type, slot_start, slot_end, first_seen, last_seen in appearances:
+        print(f"{appearance_user} {appearance_type.upper()} {_format(slot_start)} - {slot_end.strftime('%H:%M')}: "
+              f"seen {_format(first_seen)} - {_format(last_seen)}")
+
+
+# latest notification of every user & type
+def print_last_notified(history: HistoryStore, user: str = None, type: str = None):
+    notifications = history.get_last_notifications(user, type)
+    if len(notifications) == 0:
+        print("No notifications have been sent yet")
+    for notification_user, notification_type, slot_start, recipient, sent_at in notifications:
+        print(f"{notification_user} {notification_type.upper()}: {_format(slot_start)} sent to {recipient} "
+              f"{_format(sent_at)} ({_format_age(sent_at)})")
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+# runs the accounts of config.yml in several worker processes (one chrome each): the accounts are handed out through
+# leases (utils.leases), so the accounts of a crashed worker are taken over by another worker
+#
+# usage: python3 cdc_supervisor.py [--workers N] [--memory_budget_mb MB] [--headless]
+
+import argparse
+import contextlib
+import math
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+import cdc_camper
+from cdc_config import ConfigWatcher, load_config
+from cdc_history import HistoryStore
+from utils.leases import LeaseCoordinator
+from utils.logger import Logger
+from utils.mailer import MailOutbox
+
+logger = Logger.logger
+
+# memory of one worker: chrome (incl. its renderer processes) & the python process
+DEFAULT_MEMORY_PER_WORKER_MB = 600
+# seconds between the checks whether all workers are alive
+LIVENESS_INTERVAL = 5
+
+
+def get_total_memory_mb():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 1024 / 1024
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+# one worker per core, limited by the memory budget & the number of accounts
+def get_pool_size(account_count: int, memory_budget_mb: float, memory_per_worker_mb: float) -> int:
+    pool_size = min(os.cpu_count() or 1, account_count)
+    if memory_budget_mb is not None:
+        pool_size = min(pool_size, int(memory_budget_mb // memory_per_worker_mb))
+    return max(pool_size, 1)
+
+
+# renews the leases of the worker in the background while it is blocked (e.g. by a login waiting up to captcha_timeout
+# for the captcha to be solved), the leases would expire & be taken over by another worker otherwise
+@contextlib.contextmanager
+def renewing_leases(lease_db: str, worker: str, lease_duration: float, renew_interval: float):
+    stopped = threading.Event()
+
+    def renew():
+        # (a sqlite connection can't be shared between threads)
+        with LeaseCoordinator(lease_db, lease_duration=lease_duration) as coordinator:
+            while not stopped.wait(renew_interval):
+                coordinator.renew(worker)
+
+    thread = threading.Thread(target=renew, name=f"{worker}-lease-renewal", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_worker(worker: str, lease_db: str, max_accounts: int, headless: bool, log_level: int):
+    # terminate() of the supervisor: release the leases before exiting
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logger.setLevel(log_level)
+
+    config = load_config()
+    # one log file per worker, the workers would rotate the same file otherwise
+    Logger.configure(config, f"cdc_lesson_tracker_{worker}")
+    accounts = {account['username']: account for account in cdc_camper.get_accounts(config)}
+    cdc_camper.history = HistoryStore(config.get(
+        'history_db', f'{tempfile.gettempdir()}/cdc_camper_history.db'))
+    cdc_camper.outbox = MailOutbox.from_config(config)
+    coordinator = LeaseCoordinator(
+        lease_db, lease_duration=config.get('supervisor_lease_duration', 600))
+    renew_interval = coordinator.lease_duration / 3
+
+    monitors = []
+    shared_driver = None
+    clean_exit = False
+    try:
+        shared_driver = cdc_camper.create_shared_driver(config, headless, worker)
+        config_watcher = ConfigWatcher(config)
+        while True:
+            # apply the changes of config.yml (the users themselves are only changed by a restart)
+            changed_config = config_watcher.poll()
+            if changed_config is not None:
+                cdc_camper.apply_config(monitors, changed_config)
+                accounts.update({account['username']: account for account in cdc_camper.get_accounts(changed_config)
+                                 if account['username'] in accounts})
+
+            # drop the accounts whose lease has been lost (e.g. the worker was stuck for longer than a lease)
+            held_accounts = set(coordinator.renew(worker))
+            for monitor in list(monitors):
+                if monitor.account['username'] not in held_accounts:
+                    logger.warning(
+                        f"{worker} lost the lease of {monitor.account['username']}")
+                    monitor.cdc_website.close()
+                    monitors.remove(monitor)
+
+            # accounts held already (e.g. by the previous process of this worker) & one more free account
+            monitored_accounts = {monitor.account['username'] for monitor in monitors}
+            new_accounts = [account for account in held_accounts if account not in monitored_accounts]
+            if len(held_accounts) < max_accounts:
+                new_accounts += coordinator.acquire(worker)
+            for username in new_accounts:
+                if username not in accounts:
+                    coordinator.release(worker, username)
+                    continue
+                logger.info(f"{worker} takes over {username}")
+                monitor = cdc_camper.UserMonitor(cdc_camper.create_website(
+                    accounts[username], shared_driver, headless, len(accounts)), accounts[username])
+                monitors.append(monitor)
+                with renewing_leases(lease_db, worker, coordinator.lease_duration, renew_interval):
+                    cdc_camper.login(monitor)
+
+            if len(monitors) == 0:
+                time.sleep(renew_interval)
+                continue
+            monitor = cdc_camper.next_monitor(monitors)
+            # wake up in time to renew the leases
+            delay = min(monitor.scheduler.time_until_next(), renew_interval)
+            if delay > 0:
+                time.sleep(delay)
+                continue
+            checks = cdc_camper.run_cycle(monitor)
+            coordinator.record_checks(worker, os.getpid(), checks)
+    except (SystemExit, KeyboardInterrupt):
+        clean_exit = True
+    except Exception as e:
+        logger.error(f"{worker} crashed: {e}")
+        logger.error(traceback.format_exc())
+        sys.exit(1)
+    finally:
+        for monitor in monitors:
+            monitor.cdc_website.close()
+        if shared_driver is not None:
+            shared_driver.close()
+        # the leases of a crashed worker are kept (the restarted worker resumes them or they expire)
+        if clean_exit:
+            coordinator.release(worker)
+        coordinator.close()
+        cdc_camper.outbox.close()
+        cdc_camper.history.close()
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser()
+    PARSER.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (defaults to one per core within the memory budget)')
+    PARSER.add_argument('--memory_budget_mb', type=float, default=None,
+                        help='Memory for all workers (defaults to 75%% of the physical memory)')
+    PARSER.add_argument('--memory_per_worker_mb', type=float, default=DEFAULT_MEMORY_PER_WORKER_MB,
+                        help='Expected memory of one worker (chrome & python)')
+    PARSER.add_argument('--report_interval', type=float, default=60,
+                        help='Seconds between the throughput reports')
+    PARSER.add_argument('--log_level', type=int,
+                        help='The log level (10-50)', default=20, required=False)
+    PARSER.add_argument('--headless',
+                        help='Headless mode', required=False, action='store_true')
+    ARGS = PARSER.parse_args()
+
+    logger.setLevel(ARGS.log_level)
+
+    config = load_config()
+    Logger.configure(config, "cdc_supervisor")
+    usernames = [account['username'] for account in cdc_camper.get_accounts(config)]
+    lease_db = config.get(
+        'lease_db', f'{tempfile.gettempdir()}/cdc_supervisor_leases.db')
+
+    memory_budget_mb = ARGS.memory_budget_mb or config.get('supervisor_memory_budget_mb')
+    if memory_budget_mb is None and get_total_memory_mb() is not None:
+        memory_budget_mb = get_total_memory_mb() * 0.75
+    pool_size = ARGS.workers or config.get('supervisor_workers') or get_pool_size(
+        len(usernames), memory_budget_mb, ARGS.memory_per_worker_mb)
+    # the remaining workers can take over the accounts of a crashed worker
+    max_accounts = math.ceil(len(usernames) / max(pool_size - 1, 1))
+    logger.info(f"Starting {pool_size} worker(s) for {len(usernames)} account(s) "
+                f"(up to {max_accounts} per worker, memory budget {memory_budget_mb or 0:.0f}MB)")
+
+    coordinator = LeaseCoordinator(
+        lease_db, lease_duration=config.get('supervisor_lease_duration', 600))
+    coordinator.register_accounts(usernames)
+
+    # spawn: the workers do not inherit the state (threads, connections) of the supervisor
+    context = multiprocessing.get_context('spawn')
+    processes = {}
+
+    def start_worker(worker: str):
+        process = context.Process(target=run_worker, name=worker,
+                                  args=(worker, lease_db, max_accounts, ARGS.headless, ARGS.log_level))
+        process.start()
+        processes[worker] = process
+
+    for index in range(pool_size):
+        start_worker(f"worker-{index}")
+
+    previous_checks = {worker: checks for worker, (_, checks, _) in coordinator.get_worker_stats().items()}
+    reported_at = time.monotonic()
+    try:
+        while True:
+            time.sleep(LIVENESS_INTERVAL)
+            for worker, process in list(processes.items()):
+                if not process.is_alive():
+                    logger.warning(
+                        f"{worker} exited with code {process.exitcode}, restarting it")
+                    start_worker(worker)
+
+            if time.monotonic() - reported_at < ARGS.report_interval:
+                continue
+            elapsed_minutes = (time.monotonic() - reported_at) / 60
+            reported_at = time.monotonic()
+            for worker, (pid, checks, leased) in coordinator.get_worker_stats().items():
+                if worker not in processes:
+                    continue
+                checks_per_minute = (checks - previous_checks.get(worker, 0)) / elapsed_minutes
+                previous_checks[worker] = checks
+                logger.info(f"{worker} (pid {pid}): {leased} account(s), {checks_per_minute:.1f} checks/min")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
+        coordinator.close()
@@ -0,0 +1,163 @@
+import contextlib
+import http.client
+import socket
+import threading
+import time
+
+import requests
+from selenium.common.exceptions import (ElementClickInterceptedException,
+                                        ElementNotInteractableException,
+                                        NoSuchElementException,
+                                        StaleElementReferenceException,
+                                        TimeoutException,
+                                        UnexpectedAlertPresentException,
+                                        WebDriverException)
+from urllib3.exceptions import HTTPError as Urllib3Error
+
+from cdc_http import HttpEngineError, SessionExpiredError
+from cdc_website import CDCWebsite, SharedDriver
+from utils import metrics
+from utils.logger import Logger
+
+logger = Logger.logger
+
+# the operation failed because of the page (e.g. it changed while it was read, a portal error), it is run again
+RETRYABLE = 'retryable'
+# chrome or chromedriver crashed or hangs: it is restarted before the operation is run again
+RESTART = 'restart'
+# anything else (e.g. a bug or an expired login), the error is raised
+FATAL = 'fatal'
+
+RETRYABLE_ERRORS = (StaleElementReferenceException, NoSuchElementException, TimeoutException,
+                    UnexpectedAlertPresentException, ElementClickInterceptedException, ElementNotInteractableException)
+# (lowercase) messages of the WebDriverExceptions of a dead chrome/chromedriver
+DRIVER_GONE_MESSAGES = ('chrome not reachable', 'session deleted', 'invalid session id', 'tab crashed',
+                        'disconnected', 'no such window', 'target window already closed', 'session not created')
+# errors of the connection to chromedriver
+DRIVER_CONNECTION_ERRORS = (ConnectionError, socket.timeout, http.client.HTTPException, Urllib3Error)
+
+
+class OperationFailedError(Exception):
+    pass
+
+
+def classify_error(error: Exception) -> str:
+    if isinstance(error, SessionExpiredError):
+        return FATAL
+    if isinstance(error, (HttpEngineError,) + RETRYABLE_ERRORS):
+        return RETRYABLE
+    # errors of the http engine's requests to the portal (e.g. a 500, a refused connection or a timeout) which are not
+    # wrapped into an HttpEngineError, chrome is fine
+    if isinstance(error, requests.RequestException):
+        return RETRYABLE
+    if isinstance(error, DRIVER_CONNECTION_ERRORS):
+        return RESTART
+    if isinstance(error, WebDriverException) and any(
+            message in str(error.msg or '').lower() for message in DRIVER_GONE_MESSAGES):
+        return RESTART
+    return FATAL
+
+
+# runs the operations of a user with a deadline & recovers from failures: the operation is run again (after a restart
+# of the shared chrome if it crashed or hung, the user's cookies are restored then, so no new login is needed)
+class DriverWatchdog:
+    def __init__(self, shared_driver: SharedDriver, operation_timeout=180, max_attempts=3, retry_delay=5):
+        self.shared_driver = shared_driver
+        # seconds an operation may take before chrome is considered hung (and killed)
+        self.operation_timeout = operation_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self.restarts = 0
+        self.recoveries = 0
+        self.recovery_seconds = 0.0
+        self._deadline_exceeded = False
+
+    @classmethod
+    def from_config(cls, config: dict, shared_driver: SharedDriver) -> 'DriverWatchdog':
+        return cls(shared_driver, operation_timeout=config.get('watchdog_operation_timeout', 180),
+                   max_attempts=config.get('watchdog_max_attempts', 3),
+                   retry_delay=config.get('watchdog_retry_delay', 5))
+
+    # mean time to recovery in seconds, from the start of the first failed attempt until the operation succeeded
+    # (None if nothing had to be recovered yet)
+    @property
+    def mean_time_to_recovery(self) -> float:
+        return self.recovery_seconds / self.recoveries if self.recoveries > 0 else None
+
+    # runs the operation on the website (activated first), raises OperationFailedError if it still fails after
+    # max_attempts (and the error itself if it is fatal)
+    def call(self, cdc_website: CDCWebsite, operation, *args, **kwargs):
+        return self._call(self.max_attempts, cdc_website, operation, *args, **kwargs)
+
+    # runs an operation which must not be repeated (e.g. it clicks sessions), raises OperationFailedError if it failed
+    # (chrome is restarted by the next operation if it crashed)
+    def call_once(self, cdc_website: CDCWebsite, operation, *args, **kwargs):
+        return self._call(1, cdc_website, operation, *args, **kwargs)
+
+    def _call(self, max_attempts: int, cdc_website: CDCWebsite, operation, *args, **kwargs):
+        failed_at = None
+        for attempt in range(1, max_attempts + 1):
+            attempt_started_at = time.monotonic()
+            try:
+                with self._deadline(cdc_website):
+                    cdc_website.activate()
+                    result = operation(*args, **kwargs)
+            except Exception as e:
+                kind = RESTART if self._deadline_exceeded else classify_error(e)
+                metrics.OPERATION_FAILURES.inc(kind)
+                if kind == FATAL:
+                    raise
+                if attempt == max_attempts:
+                    raise OperationFailedError(
+                        f"{operation.__name__} failed {attempt} times, last error: {e!r}") from e
+                logger.warning(
+                    f"{operation.__name__} failed ({kind}, attempt {attempt}/{max_attempts}): {e!r}")
+                if failed_at is None:
+                    failed_at = attempt_started_at
+                time.sleep(self.retry_delay)
+                if kind == RESTART:
+                    self._restart()
+                continue
+
+            if failed_at is not None:
+                self._record_recovery(operation, time.monotonic() - failed_at)
+            return result
+
+    def _restart(self):
+        logger.warning("Restarting chrome")
+        self.shared_driver.restart()
+        self.restarts += 1
+        metrics.DRIVER_RESTARTS.inc()
+
+    def _record_recovery(self, operation, duration: float):
+        self.recoveries += 1
+        self.recovery_seconds += duration
+        metrics.RECOVERY_DURATION.observe(duration)
+        logger.info(f"{operation.__name__} recovered after {duration:.1f}s ({self.restarts} chrome restart(s), "
+                    f"mean time to recovery {self.mean_time_to_recovery:.1f}s)")
+
+    # kills chrome if the operation does not finish in time, the pending WebDriver command fails then
+    # (only while the website uses chrome: the requests of the http engine time out by themselves, the deadline is
+    # extended while it is active, e.g. until it falls back to the browser)
+    @contextlib.contextmanager
+    def _deadline(self, cdc_website: CDCWebsite):
+        self._deadline_exceeded = False
+        finished = threading.Event()
+
+        def watch():
+            while not finished.wait(self.operation_timeout):
+                if cdc_website.http_client is not None:
+                    continue
+                logger.error(
+                    f"Operation did not finish within {self.operation_timeout}s, killing chrome")
+                self._deadline_exceeded = True
+                self.shared_driver.kill()
+                return
+
+        thread = threading.Thread(target=watch, name='watchdog-deadline', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            finished.set()
@@ -1,33 +1,244 @@
+import contextlib
+import json
+import os
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import (NoAlertPresentException,
+                                        StaleElementReferenceException,
+                                        TimeoutException,
+                                        UnexpectedAlertPresentException,
+                                        WebDriverException)
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.remote_connection import RemoteConnection
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select, WebDriverWait
 
-from cdc_abstract import CDCAbstract, Types
+from cdc_abstract import CDCAbstract, Engines, ExtractionModes, Types
+from cdc_http import CDCHttpClient, HttpEngineError
+from cdc_snapshot import AvailabilitySnapshot, Slot
+from utils.grid_parser import (AVAILABLE_SESSIONS_TABLE_ID,
+                               BOOKED_SESSIONS_TABLE_ID, grid_fingerprint,
+                               parse_booked_rows, parse_grid)
+from utils import metrics
 from utils.logger import Logger
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 logger = Logger.logger
 
+COURSE_SELECT_ID = "ctl00_ContentPlaceHolder1_ddlCourse"
+SESSION_NO_LABEL_ID = "ctl00_ContentPlaceHolder1_lblSessionNo"
+TEST_NAME_LABEL_ID = "ctl00_ContentPlaceHolder1_lblResAsmBlyDesc"
+TERMS_CHECKBOX_ID = "ctl00_ContentPlaceHolder1_chkTermsAndCond"
+AGREE_TERMS_BUTTON_ID = "ctl00_ContentPlaceHolder1_btnAgreeTerms"
+NO_BUTTON_ID = "ctl00_ContentPlaceHolder1_btnNo"
+
+# seconds until a page load (driver.get) fails, and until any WebDriver command fails if chromedriver does not answer
+# (hung chromedriver or chrome), so no single command blocks forever
+PAGE_LOAD_DEADLINE = 60
+WEBDRIVER_COMMAND_DEADLINE = 90
+
+# reads the whole availability grid within a single WebDriver round trip
+# (returns the same structure as utils.grid_parser.parse_grid plus the fingerprint of the grid, a FNV-1a hash of the
+# table markup; if the fingerprint equals arguments[1], only {fingerprint, unchanged: true} is returned)
+GRID_EXTRACTION_SCRIPT = """
+var table = document.getElementById(arguments[0]);
+var markup = table ? table.outerHTML : '';
+var hash = 0x811c9dc5;
+for (var c = 0; c < markup.length; c++) {
+    hash = Math.imul(hash ^ markup.charCodeAt(c), 0x01000193) >>> 0;
+}
+var fingerprint = markup.length + ':' + hash.toString(16);
+if (fingerprint === arguments[1]) {
+    return {fingerprint: fingerprint, unchanged: true};
+}
+var grid = {times: [], days: [], sessions: [], fingerprint: fingerprint};
+if (table) {
+    var rows = table.rows;
+    for (var i = 0; i < rows.length; i++) {
+        var th_cells = rows[i].getElementsByTagName('th');
+        for (var j = 2; j < th_cells.length; j++) {
+            grid.times.push(th_cells[j].innerText);
+        }
+        var td_cells = rows[i].getElementsByTagName('td');
+        if (td_cells.length > 0) {
+            grid.days.push(td_cells[0].innerText);
+        }
+    }
+}
+var inputs = document.getElementsByTagName('input');
+for (var k = 0; k < inputs.length; k++) {
+    var src = inputs[k].getAttribute('src') || '';
+    if (src.indexOf('Images1.gif') !== -1 || src.indexOf('Images3.gif') !== -1) {
+        grid.sessions.push([inputs[k].id, src]);
+    }
+}
+return grid;
+"""
+
+
+# td texts of all rows of the booked sessions table (gvBooked) within a single round trip
+BOOKED_ROWS_SCRIPT = """
+var rows = [];
+var table = document.getElementById(arguments[0]);
+if (table) {
+    for (var i = 0; i < table.rows.length; i++) {
+        var row = [];
+        var td_cells = table.rows[i].getElementsByTagName('td');
+        for (var j = 0; j < td_cells.length; j++) {
+            row.push(td_cells[j].innerText.trim());
+        }
+        rows.push(row);
+    }
+}
+return rows;
+"""
+
+
+# true once the document has been loaded and no ASP.NET async (update panel) postback is running
+PAGE_READY_SCRIPT = """
+return document.readyState === 'complete' && !(window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager
+    && Sys.WebForms.PageRequestManager.getInstance().get_isInAsyncPostBack());
+"""
+
+# resources which are not needed to read the booking pages (the session state is read from the src attribute of the
+# session inputs, the images themselves are never needed), blocked in lean mode
+LEAN_BLOCKED_URLS = ["*.gif", "*.png", "*.jpg", "*.jpeg", "*.svg", "*.ico", "*.css", "*.woff", "*.woff2", "*.ttf",
+                     "*.otf", "*.eot", "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+                     "*facebook.net*", "*hotjar.com*"]
+
+
+# starts a chrome (lean: see CDCWebsite)
+def create_driver(headless=False, profile_dir=None, lean=False) -> webdriver.Chrome:
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")  # for sudo linux usage
+    chrome_options.add_argument('--no-proxy-server')
+    if profile_dir is not None:
+        # persistent chrome profile (cache, local storage) which survives restarts of the process
+        chrome_options.add_argument(f"--user-data-dir={os.path.abspath(os.path.expanduser(profile_dir))}")
+    if lean:
+        # driver.get returns once the DOM is ready, the readiness checks do the rest
+        chrome_options.set_capability('pageLoadStrategy', 'eager')
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    # taken over by the connection to chromedriver when the driver is created
+    RemoteConnection.set_timeout(WEBDRIVER_COMMAND_DEADLINE)
+    driver = webdriver.Chrome(options=chrome_options)
+    driver.set_page_load_timeout(PAGE_LOAD_DEADLINE)
+    if metrics.REGISTRY.enabled:
+        _count_webdriver_commands(driver)
+    if lean:
+        driver.execute_cdp_cmd('Network.enable', {})
+    driver.set_window_size(1600, 768)
+    return driver
+
+
+# counts every WebDriver command (only hooked in when the metrics are enabled)
+def _count_webdriver_commands(driver: webdriver.Chrome):
+    execute = driver.execute
+
+    def counting_execute(driver_command, params=None):
+        metrics.WEBDRIVER_COMMANDS.inc(driver_command)
+        return execute(driver_command, params)
+    driver.execute = counting_execute
+
+
+# one chrome used by the CDCWebsite instances of several users, one user at a time (owner)
+class SharedDriver:
+    def __init__(self, driver: webdriver.Chrome, lean=False, create=None):
+        self.driver = driver
+        # whether the chrome has been created in lean mode
+        self.lean = lean
+        self.owner = None
+        # creates a new chrome with the same options (see restart)
+        self.create = create
+
+    def close(self):
+        self.driver.close()
+
+    # kills chromedriver & chrome right away (e.g. if a command hangs), the pending command fails then
+    def kill(self):
+        process = self.driver.service.process
+        if process is None:
+            return
+        if psutil is not None:
+            with contextlib.suppress(psutil.Error):
+                for child in psutil.Process(process.pid).children(recursive=True):
+                    child.kill()
+        with contextlib.suppress(OSError):
+            process.kill()
+
+    # replaces a crashed or hung chrome by a new one, the users restore their cookies once they activate it again
+    def restart(self):
+        with contextlib.suppress(Exception):
+            self.driver.quit()
+        self.driver = self.create()
+        self.owner = None
+
 
 class CDCWebsite(CDCAbstract):
-    def __init__(self, username, password, headless=False, home_url="https://www.cdc.com.sg", booking_url="https://www.cdc.com.sg:8080", is_test=False):
+    def __init__(self, username, password, headless=False, home_url="https://www.cdc.com.sg", booking_url="https://www.cdc.com.sg:8080", is_test=False, extraction_mode=ExtractionModes.SCRIPT,
+                 page_load_timeout=10, alert_timeout=5, captcha_timeout=3600, profile_dir=None, cookie_jar=None,
+                 lean=False, driver: SharedDriver = None, booked_sessions_ttl=3600, eligibility_ttl=21600):
         self.home_url = home_url
         self.booking_url = booking_url
         self.is_test = is_test
+        self.extraction_mode = extraction_mode
+        # seconds to wait for a page/postback to become ready, for an alert after a click and for the user to solve the recaptcha
+        self.page_load_timeout = page_load_timeout
+        self.alert_timeout = alert_timeout
+        self.captcha_timeout = captcha_timeout
+        # grid of the currently opened booking page (only used for the single round trip extraction modes)
+        self._grid = None
+        # perf_counter() time the grid has been read at (the detection time of the auto reservations)
+        self._grid_read_at = None
+        # type -> slot reserved by reserve_session (to not reserve a later slot than that)
+        self.reserved_sessions = {}
+        # per type fingerprint of the grid the available sessions have been read from (see get_all_session_date_times)
+        self._grid_fingerprints = {}
+        # the booked sessions change rarely, they are read again once their ttl (seconds) has expired or they have
+        # been invalidated (see booked_sessions_expired)
+        self.booked_sessions_ttl = booked_sessions_ttl
+        self._booked_sessions_read_at = None
+        # type -> (can book, alert text, time of the probe) of the reservation probes (see _check_eligibility), probed
+        # again once eligibility_ttl (seconds) has expired or the booked sessions changed
+        self.eligibility_ttl = eligibility_ttl
+        self._eligibility = {}
+        self.eligibility_probes = 0
+        # type -> id of the session input to probe with, found by get_all_available_sessions (see check_eligibility)
+        self._probe_element_ids = {}
+        # browserless client, only set once use_http_engine() has been called after the login
+        self.http_client: CDCHttpClient = None
+        # type -> (forked http client with the loaded booking page, result of opening the page), see prefetch
+        self._prefetched = {}
+        # file the cookies of the authenticated session are kept in (see save_session/resume_session)
+        self.cookie_jar = os.path.expanduser(cookie_jar) if cookie_jar is not None else None
+        self.logged_in = False
+        # lean mode: eager page loads & no images/fonts/stylesheets/analytics once logged in (see _open_website),
+        # the home page, the login & the recaptcha are always loaded in full
+        self.lean = lean
+        self._resources_blocked = False
+        # paths which have been loaded once with all resources (to learn the size of the blocked resources)
+        self._calibrated_paths = set()
+        self._resource_sizes = {}
+        self._request_urls = {}
+        self.lean_stats = {'bytes_loaded': 0, 'bytes_saved': 0, 'blocked_requests': 0}
 
-        chrome_options = Options()
-        if headless:
-            chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")  # for sudo linux usage
-        chrome_options.add_argument('--no-proxy-server')
-
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver.set_window_size(1600, 768)
+        # chrome shared with the CDCWebsite instances of other users (see activate), else an own chrome is started
+        self.shared_driver = driver
+        # cookies of the logged in session while another user is using the shared chrome
+        self._session_cookies = None
+        self.driver = driver.driver if driver is not None else create_driver(headless, profile_dir, lean)
 
         super().__init__(username, password, headless)
 
@@ -36,305 +247,800 @@ class CDCWebsite(CDCAbstract):
 
     def __exit__(self, exc_type, exc_value, traceback):
         # time.sleep(5)
-        self.driver.close()
+        self.close()
+
+    # closes the http client & the own chrome (a shared chrome is closed by whoever created it)
+    def close(self):
+        if self.http_client is not None:
+            self.http_client.close()
+            self.http_client = None
+        if self.shared_driver is None:
+            self.driver.close()
+        elif self.shared_driver.owner is self:
+            self.shared_driver.owner = None
 
-    def _open_website(self, path: str):
-        self.driver.get(
-            f"{self.booking_url}/{path}{'.html' if self.is_test else ''}")
+    # makes the shared chrome act for this user: the cookies of the previous user are put aside and the ones of this
+    # user are restored (no-op if the chrome is not shared or this user is using it already)
+    # (a restarted chrome is picked up the same way, see SharedDriver.restart)
+    def activate(self):
+        if self.shared_driver is None or self.shared_driver.owner is self:
+            return
+        self.driver = self.shared_driver.driver
+        previous_owner = self.shared_driver.owner
+        if previous_owner is not None:
+            previous_owner._suspend()
+        self.shared_driver.owner = self
+        # the blocked urls have been set by the previous user
+        self._resources_blocked = None
+        self.driver.delete_all_cookies()
+        if self._session_cookies is not None:
+            self._restore_cookies(self._session_cookies)
+
+    def _suspend(self):
+        if self.lean:
+            self._collect_network_stats()
+        if self.logged_in:
+            self._session_cookies = self.driver.get_cookies()
+
+    def _restore_cookies(self, cookies: list):
+        # cookies can only be set for the domain of the current page
+        self.driver.get(f"{self.booking_url}/favicon.ico")
+        for cookie in cookies:
+            # chrome rejects cookies with an unknown sameSite value
+            if cookie.get('sameSite') not in (None, 'Strict', 'Lax', 'None'):
+                del cookie['sameSite']
+            self.driver.add_cookie(cookie)
+
+    def _is_page_ready(self, ready_ids=()) -> bool:
+        if "Alert.aspx" in self.driver.current_url:
+            return True
+        if not self.driver.execute_script(PAGE_READY_SCRIPT):
+            return False
+        return len(ready_ids) == 0 or any(len(self.driver.find_elements_by_id(ready_id)) > 0 for ready_id in ready_ids)
+
+    # waits until the page is ready (see _is_page_ready) and one of the given elements is present (if any)
+    def _wait_for_page(self, ready_ids=()):
+        WebDriverWait(self.driver, self.page_load_timeout).until(
+            lambda driver: self._is_page_ready(ready_ids))
+
+    # waits until the postback triggered by the given element has finished: a full postback replaces the document
+    # (the element goes stale), an async postback is tracked by the PageRequestManager
+    def _wait_for_postback(self, trigger: WebElement, ready_ids=()):
+        def is_postback_complete(driver):
+            if not ready_ids:
+                try:
+                    trigger.is_enabled()
+                    return False
+                except StaleElementReferenceException:
+                    pass
+            return self._is_page_ready(ready_ids)
+        WebDriverWait(self.driver, self.page_load_timeout).until(
+            is_postback_complete)
+
+    def _set_resources_blocked(self, blocked: bool):
+        if blocked != self._resources_blocked:
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {
+                'urls': LEAN_BLOCKED_URLS if blocked else []})
+            self._resources_blocked = blocked
+
+    # reads the network events of the performance log: bytes loaded, requests blocked & the sizes of the
+    # resources (to estimate the bytes saved by blocking them)
+    def _collect_network_stats(self):
+        for entry in self.driver.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            params = message.get('params', {})
+            if message['method'] == 'Network.requestWillBeSent':
+                self._request_urls[params['requestId']] = params['request']['url']
+            elif message['method'] == 'Network.loadingFinished':
+                url = self._request_urls.pop(params['requestId'], None)
+                size = int(params.get('encodedDataLength', 0))
+                self.lean_stats['bytes_loaded'] += size
+                # cached resources are loaded with 0 bytes
+                if url is not None and size > 0:
+                    self._resource_sizes[url] = size
+            elif message['method'] == 'Network.loadingFailed':
+                url = self._request_urls.pop(params['requestId'], None)
+                if params.get('blockedReason'):
+                    self.lean_stats['blocked_requests'] += 1
+                    self.lean_stats['bytes_saved'] += self._resource_sizes.get(url, 0)
+
+    # returns the lean mode stats since the last call (e.g. per cycle)
+    def pop_lean_stats(self) -> dict:
+        if self.lean:
+            self._collect_network_stats()
+        lean_stats = self.lean_stats
+        self.lean_stats = {'bytes_loaded': 0, 'bytes_saved': 0, 'blocked_requests': 0}
+        metrics.LEAN_BYTES.inc('loaded', amount=lean_stats['bytes_loaded'])
+        metrics.LEAN_BYTES.inc('saved', amount=lean_stats['bytes_saved'])
+        return lean_stats
+
+    # loads the page once and waits for it to be ready (the page is reloaded once if it does not become ready)
+    def _open_website(self, path: str, ready_ids=()):
+        url = f"{self.booking_url}/{path}{'.html' if self.is_test else ''}"
+        if self.lean and self.logged_in:
+            # the first load of a page is done with all resources to learn what blocking them saves
+            self._set_resources_blocked(path in self._calibrated_paths)
+            self._calibrated_paths.add(path)
+        start = time.perf_counter()
+        self.driver.get(url)
+        try:
+            self._wait_for_page(ready_ids)
+            metrics.PAGE_LOAD_DURATION.observe(
+                time.perf_counter() - start, path, Engines.BROWSER)
+            return
+        except TimeoutException:
+            logger.debug(f"{path} did not become ready, reloading it")
+        self.driver.get(url)
+        try:
+            self._wait_for_page(ready_ids)
+        except TimeoutException:
+            # let the caller deal with the page as it is
+            logger.warning(
+                f"{path} did not become ready within {self.page_load_timeout}s")
+        metrics.PAGE_LOAD_DURATION.observe(
+            time.perf_counter() - start, path, Engines.BROWSER)
 
     def open_home_website(self):
         self.driver.get(self.home_url)
         assert "ComfortDelGro" in self.driver.title
 
     def login(self):
-        time.sleep(3)
-        login_btn = self.driver.find_element_by_xpath(
-            '//*[@id="top-menu"]/ul/li[10]/a')
+        login_btn = WebDriverWait(self.driver, self.page_load_timeout).until(EC.element_to_be_clickable(
+            (By.XPATH, '//*[@id="top-menu"]/ul/li[10]/a')))
         login_btn.click()
 
-        learner_id_input: WebElement = self.driver.find_element_by_name('userId')
+        learner_id_input: WebElement = WebDriverWait(self.driver, self.page_load_timeout).until(
+            EC.visibility_of_element_located((By.NAME, 'userId')))
         password_input = self.driver.find_element_by_name('password')
 
         learner_id_input.send_keys(self.username)
         password_input.send_keys(self.password)
 
-        # wait for user to solve recaptcha
-        try:
-            while self.driver.find_element_by_name('userId'):
-                time.sleep(2)
-                print("Waiting for recaptcha")
-        except NoSuchElementException:
-            print("Recaptcha solved! Continuing")
-            time.sleep(5)
+        # wait for user to solve recaptcha (the login form disappears once logged in)
+        print("Waiting for recaptcha")
+        WebDriverWait(self.driver, self.captcha_timeout, poll_frequency=0.5).until(
+            lambda driver: len(driver.find_elements_by_name('userId')) == 0)
+        print("Recaptcha solved! Continuing")
+        self._wait_for_page()
+        self.logged_in = True
 
     def logout(self):
         self._open_website("NewPortal/logOut.aspx?PageName=Logout")
+        self.logged_in = False
+        self._session_cookies = None
+        self.invalidate_booked_sessions()
+        if self.cookie_jar is not None and os.path.isfile(self.cookie_jar):
+            os.remove(self.cookie_jar)
+
+    # keeps the cookies of the authenticated session (to restore them in a restarted chrome) and stores them in the
+    # cookie jar (readable by the owner only)
+    def save_session(self):
+        if not self.logged_in:
+            return
+        cookies = self.driver.get_cookies()
+        if self.shared_driver is not None:
+            self._session_cookies = cookies
+        if self.cookie_jar is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cookie_jar)), exist_ok=True)
+        tmp_path = f"{self.cookie_jar}.tmp"
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as stream:
+            json.dump(cookies, stream)
+        os.replace(tmp_path, self.cookie_jar)
+
+    # restores the session of the cookie jar if it is still valid (checked with one http request to the booking
+    # overview, whose booked sessions are kept), returns false if there is no valid session and login() is needed
+    def resume_session(self) -> bool:
+        if self.cookie_jar is None or not os.path.isfile(self.cookie_jar):
+            return False
+        try:
+            with open(self.cookie_jar, 'r') as stream:
+                cookies = json.load(stream)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read the cookie jar {self.cookie_jar}: {e}")
+            return False
+
+        http_client = CDCHttpClient(self.booking_url, cookies, is_test=self.is_test)
+        try:
+            http_client.get("NewPortal/Booking/StatementBooking.aspx")
+            self._set_booked_sessions(parse_booked_rows(http_client.page_source))
+        except HttpEngineError as e:
+            logger.info(f"Stored session is not valid anymore ({e}), logging in")
+            return False
+        finally:
+            http_client.close()
+
+        self._restore_cookies(cookies)
+        # restored when the shared chrome switches back to this user (or is restarted) before the next save_session
+        if self.shared_driver is not None:
+            self._session_cookies = cookies
+        self.logged_in = True
+        logger.info("Resumed the stored session, skipping the login")
+        return True
+
+    # switches polling to the browserless http client, re-using the cookies of the (logged in) browser
+    def use_http_engine(self):
+        if self.http_client is not None:
+            self.http_client.close()
+        self.http_client = CDCHttpClient(self.booking_url, self.driver.get_cookies(),
+                                         user_agent=self.driver.execute_script(
+                                             "return navigator.userAgent"),
+                                         is_test=self.is_test)
+        logger.info("Switched to the HTTP engine")
+
+    # polls with the browser again (the engine has been changed in the config)
+    def use_browser_engine(self):
+        if self.http_client is not None:
+            self.http_client.close()
+            self.http_client = None
+            self._prefetched = {}
+            logger.info("Switched to the browser engine")
+
+    # runs the http variant of an operation if the http engine is active and
+    # falls back to the browser if the http session has expired or the page could not be handled
+    def _run_engine(self, http_operation, browser_operation, *args, **kwargs):
+        if self.http_client is not None:
+            try:
+                return http_operation(*args, **kwargs)
+            except HttpEngineError as e:
+                logger.warning(
+                    f"HTTP engine failed ({e}), falling back to the browser")
+                self.http_client.close()
+                self.http_client = None
+                self._prefetched = {}
+        return browser_operation(*args, **kwargs)
 
     def open_booking_overview(self):
-        self._open_website("NewPortal/Booking/StatementBooking.aspx")
+        return self._run_engine(self._open_booking_overview_http, self._open_booking_overview_browser)
+
+    def _open_booking_overview_http(self):
+        self.http_client.get("NewPortal/Booking/StatementBooking.aspx")
+
+    def _open_booking_overview_browser(self):
         self._open_website("NewPortal/Booking/StatementBooking.aspx")
 
+    # returns the td texts of all rows of the booked sessions table of the current page
+    def _get_booked_rows(self) -> list:
+        start = time.perf_counter()
+        if self.http_client is not None:
+            rows = parse_booked_rows(self.http_client.page_source)
+            mode = Engines.HTTP
+        elif self.extraction_mode == ExtractionModes.SCRIPT:
+            rows = self.driver.execute_script(BOOKED_ROWS_SCRIPT, BOOKED_SESSIONS_TABLE_ID)
+            mode = ExtractionModes.SCRIPT
+        elif self.extraction_mode == ExtractionModes.PAGE_SOURCE:
+            rows = parse_booked_rows(self.driver.page_source)
+            mode = ExtractionModes.PAGE_SOURCE
+        else:
+            rows = [[td_cell.text for td_cell in row.find_elements_by_tag_name("td")]
+                    for row in self.driver.find_elements_by_css_selector(f"table#{BOOKED_SESSIONS_TABLE_ID} tr")]
+            mode = ExtractionModes.ELEMENT
+        metrics.PARSE_DURATION.observe(
+            time.perf_counter() - start, 'booked', mode)
+        return rows
+
     def get_booked_lesson_date_time(self):
-        rows = self.driver.find_elements_by_css_selector(
-            "table#ctl00_ContentPlaceHolder1_gvBooked tr")
+        self._set_booked_sessions(self._get_booked_rows())
 
-        # Check which practical lesson is the latest (in case there are e.g. lesson 5 and 6 bookings)
-        latest_booked_practical_lesson_number = 0
-        for row in rows:
-            td_cells = row.find_elements_by_tag_name("td")
-            if len(td_cells) > 0:
-                lesson_name: str = td_cells[4].text
-                if "2BL" in lesson_name:
-                    lesson_number: int = int(lesson_name[len(lesson_name) - 1])
-                    if lesson_number > latest_booked_practical_lesson_number:
-                        latest_booked_practical_lesson_number = lesson_number
+    # true if the booked sessions have not been read yet, their ttl has expired or they have been invalidated
+    def booked_sessions_expired(self) -> bool:
+        return self._booked_sessions_read_at is None or \
+            time.monotonic() - self._booked_sessions_read_at >= self.booked_sessions_ttl
 
-        for row in rows:
-            td_cells = row.find_elements_by_tag_name("td")
-            if len(td_cells) > 0:
-                lesson_name = td_cells[4].text
-                if "2BL" in lesson_name:
-                    # do not consider old (to be cancelled) lessons because they could influence the earlier notification detection
-                    if lesson_name[len(lesson_name) - 1] != str(latest_booked_practical_lesson_number):
-                        logger.debug(
-                            f"Not considering {lesson_name} lesson as there are more recent lessons available (2BL{latest_booked_practical_lesson_number})")
-                        continue
-                    self.lesson_name_practical = lesson_name
-                    self.booked_sessions_practical.update({
-                        td_cells[0].text: f'{td_cells[2].text} - {td_cells[3].text}'})
-                if "RTT" in lesson_name:
-                    self.lesson_name_rtt = lesson_name
-                    self.booked_sessions_rtt.update({
-                        td_cells[0].text: f'{td_cells[2].text} - {td_cells[3].text}'})
-                if "BTT" in lesson_name:
-                    self.lesson_name_btt = lesson_name
-                    self.booked_sessions_btt.update({
-                        td_cells[0].text: f'{td_cells[2].text} - {td_cells[3].text}'})
-                if "PT" in lesson_name:
-                    self.lesson_name_pt = lesson_name
-                    self.booked_sessions_pt.update({
-                        td_cells[0].text: f'{td_cells[2].text} - {td_cells[3].text}'})
+    # makes the next cycle read the booked sessions again (e.g. after a reservation)
+    def invalidate_booked_sessions(self):
+        self._booked_sessions_read_at = None
+
+    # makes the next read of the grid of the type parse it again (and report it as changed)
+    def invalidate_grid(self, type: str):
+        self._grid_fingerprints.pop(type, None)
+
+    # reads the booked sessions from the rows of the booked sessions table in a single pass
+    def _set_booked_sessions(self, rows: list):
+        booked_slots = {Types.PRACTICAL: [], Types.RTT: [],
+                        Types.BTT: [], Types.PT: []}
+        # practical lesson number -> (lesson name, booked slots)
+        practical_lessons = {}
+        for td_cells in rows:
+            if len(td_cells) == 0:
+                continue
+            lesson_name: str = td_cells[4]
+            booked_time = f'{td_cells[2]} - {td_cells[3]}'
+            if "2BL" in lesson_name:
+                lesson_number = int(lesson_name[len(lesson_name) - 1])
+                practical_lessons.setdefault(lesson_number, (lesson_name, []))[1].append(
+                    Slot.from_portal(Types.PRACTICAL, td_cells[0], booked_time))
+            if "RTT" in lesson_name:
+                self.lesson_name_rtt = lesson_name
+                booked_slots[Types.RTT].append(Slot.from_portal(
+                    Types.RTT, td_cells[0], booked_time))
+            if "BTT" in lesson_name:
+                self.lesson_name_btt = lesson_name
+                booked_slots[Types.BTT].append(Slot.from_portal(
+                    Types.BTT, td_cells[0], booked_time))
+            if "PT" in lesson_name:
+                self.lesson_name_pt = lesson_name
+                booked_slots[Types.PT].append(Slot.from_portal(
+                    Types.PT, td_cells[0], booked_time))
+
+        # only the latest practical lesson is considered (in case there are e.g. lesson 5 and 6 bookings), the old
+        # (to be cancelled) lessons could influence the earlier notification detection
+        if len(practical_lessons) > 0:
+            latest_lesson_number = max(practical_lessons)
+            for lesson_number, (lesson_name, _) in practical_lessons.items():
+                if lesson_number != latest_lesson_number:
+                    logger.debug(
+                        f"Not considering {lesson_name} lesson as there are more recent lessons available (2BL{latest_lesson_number})")
+            self.lesson_name_practical, booked_slots[Types.PRACTICAL] = practical_lessons[latest_lesson_number]
+
+        booked_sessions = {type: AvailabilitySnapshot(type, slots)
+                           for type, slots in booked_slots.items()}
+        if any(snapshot.slots != getattr(self.booked_sessions.get(type), 'slots', None)
+               for type, snapshot in booked_sessions.items()):
+            self._eligibility = {}
+        # a reservation whose booking has been completed is a booked session now
+        for type, slot in list(self.reserved_sessions.items()):
+            if any(booked_slot.start == slot.start for booked_slot in booked_sessions.get(type, ())):
+                del self.reserved_sessions[type]
+        self.booked_sessions = booked_sessions
+        self._booked_sessions_read_at = time.monotonic()
+
+    # returns true if the test name label of the theory test booking page matches the given type
+    @staticmethod
+    def _is_theory_test_type(type: str, test_name: str) -> bool:
+        if type == Types.BTT and "Basic Theory Test" in test_name:
+            return True
+        elif type == Types.RTT and "Riding Theory Test" in test_name:
+            return True
+        else:
+            return False
 
     def open_theory_test_booking_page(self, type: str):
-        self._open_website("NewPortal/Booking/BookingTT.aspx")
-        self._open_website("NewPortal/Booking/BookingTT.aspx")
+        if type in self._prefetched:
+            return self._use_prefetched(type)
+        return self._run_engine(self._open_theory_test_booking_page_http, self._open_theory_test_booking_page_browser, type)
+
+    def _open_theory_test_booking_page_http(self, type: str, client: CDCHttpClient = None):
+        client = client or self.http_client
+        client.get("NewPortal/Booking/BookingTT.aspx")
+
+        if "Alert.aspx" in client.current_url:
+            # "You do not have access to this facility."
+            return False
+
+        # now agree to terms and conditions (sometimes check terms not necessary to be done)
+        if client.has_element(TERMS_CHECKBOX_ID):
+            client.postback(fields={
+                TERMS_CHECKBOX_ID: 'on',
+                AGREE_TERMS_BUTTON_ID: client.form.values.get(AGREE_TERMS_BUTTON_ID, '')})
+
+        test_name = client.form.texts.get(TEST_NAME_LABEL_ID)
+        if test_name is None:
+            raise HttpEngineError(
+                f"{TEST_NAME_LABEL_ID} not found on theory test booking page")
+        return self._is_theory_test_type(type, test_name)
+
+    def _open_theory_test_booking_page_browser(self, type: str):
+        self._open_website("NewPortal/Booking/BookingTT.aspx",
+                           ready_ids=(TERMS_CHECKBOX_ID, TEST_NAME_LABEL_ID))
 
         if "Alert.aspx" in self.driver.current_url:
             # "You do not have access to this facility."
             return False
 
-        # now agree to terms and conditions
-        try:
-            terms_checkbox = self.driver.find_element_by_id(
-                "ctl00_ContentPlaceHolder1_chkTermsAndCond")
-            terms_checkbox.click()
+        # now agree to terms and conditions (sometimes check terms not necessary to be done)
+        if len(self.driver.find_elements_by_id(TERMS_CHECKBOX_ID)) > 0:
+            self.driver.find_element_by_id(TERMS_CHECKBOX_ID).click()
             agree_btn: WebElement = self.driver.find_element_by_id(
-                "ctl00_ContentPlaceHolder1_btnAgreeTerms")
+                AGREE_TERMS_BUTTON_ID)
             agree_btn.click()
-        except Exception:
-            # ignore (sometimes check terms not necessary to be done)
-            pass
+            self._wait_for_postback(agree_btn, ready_ids=(TEST_NAME_LABEL_ID,))
 
-        test_name_element = self.driver.find_element_by_id(
-            "ctl00_ContentPlaceHolder1_lblResAsmBlyDesc")
-        if type == Types.BTT and "Basic Theory Test" in test_name_element.text:
-            return True
-        elif type == Types.RTT and "Riding Theory Test" in test_name_element.text:
-            return True
-        else:
-            return False
+        test_name_element = self.driver.find_element_by_id(TEST_NAME_LABEL_ID)
+        return self._is_theory_test_type(type, test_name_element.text)
 
     def open_practical_test_booking_page(self):
-        self._open_website("NewPortal/Booking/BookingPT.aspx")
-        self._open_website("NewPortal/Booking/BookingPT.aspx")
+        if Types.PT in self._prefetched:
+            return self._use_prefetched(Types.PT)
+        return self._run_engine(self._open_practical_test_booking_page_http, self._open_practical_test_booking_page_browser)
+
+    def _open_practical_test_booking_page_http(self, client: CDCHttpClient = None):
+        client = client or self.http_client
+        client.get("NewPortal/Booking/BookingPT.aspx")
+
+        if "Alert.aspx" in client.current_url:
+            # "You do not have access to this facility."
+            return False
+
+        # now say "No" to the "Do you currently hold other classes of Qualified Driving Licence?" question
+        if client.has_element(NO_BUTTON_ID):
+            client.postback(fields={
+                NO_BUTTON_ID: client.form.values.get(NO_BUTTON_ID, '')})
+
+        # now agree to terms and conditions
+        if client.has_element(TERMS_CHECKBOX_ID):
+            client.postback(fields={
+                TERMS_CHECKBOX_ID: 'on',
+                AGREE_TERMS_BUTTON_ID: client.form.values.get(AGREE_TERMS_BUTTON_ID, '')})
+        return True
+
+    def _open_practical_test_booking_page_browser(self):
+        self._open_website("NewPortal/Booking/BookingPT.aspx",
+                           ready_ids=(NO_BUTTON_ID, TERMS_CHECKBOX_ID, AVAILABLE_SESSIONS_TABLE_ID))
 
         if "Alert.aspx" in self.driver.current_url:
             # "You do not have access to this facility."
             return False
 
-        try:
-            # now say "No" to the "Do you currently hold other classes of Qualified Driving Licence?" question
-            no_btn: WebElement = self.driver.find_element_by_id(
-                "ctl00_ContentPlaceHolder1_btnNo")
+        # now say "No" to the "Do you currently hold other classes of Qualified Driving Licence?" question
+        # (sometimes not necessary to be done)
+        if len(self.driver.find_elements_by_id(NO_BUTTON_ID)) > 0:
+            no_btn: WebElement = self.driver.find_element_by_id(NO_BUTTON_ID)
             no_btn.click()
+            self._wait_for_postback(no_btn, ready_ids=(TERMS_CHECKBOX_ID,))
 
-            # now agree to terms and conditions
-            WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable(
-                (By.ID, 'ctl00_ContentPlaceHolder1_chkTermsAndCond')))
-            terms_checkbox = self.driver.find_element_by_id(
-                "ctl00_ContentPlaceHolder1_chkTermsAndCond")
-            terms_checkbox.click()
+        # now agree to terms and conditions (sometimes check terms not necessary to be done)
+        if len(self.driver.find_elements_by_id(TERMS_CHECKBOX_ID)) > 0:
+            WebDriverWait(self.driver, self.page_load_timeout).until(EC.element_to_be_clickable(
+                (By.ID, TERMS_CHECKBOX_ID))).click()
             agree_btn: WebElement = self.driver.find_element_by_id(
-                "ctl00_ContentPlaceHolder1_btnAgreeTerms")
+                AGREE_TERMS_BUTTON_ID)
             agree_btn.click()
-        except Exception:
-            # ignore (sometimes check terms not necessary to be done)
-            pass
+            self._wait_for_postback(agree_btn)
         return True
 
-    def open_practical_lessons_booking(self, type=Types.PRACTICAL):
-        # pl_btn = driver.find_element_by_xpath('//*[@id="ctl00_Menu1_TreeView1t6"]')
-        # pl_btn.click()
-        self._open_website("NewPortal/Booking/BookingPL.aspx")
-        self._open_website("NewPortal/Booking/BookingPL.aspx")
+    # loads the booking pages of the given types at the same time (http engine only, the browser can only load one
+    # page at a time): every type gets its own forked client, opening the page of a type then continues with the
+    # prefetched page instead of loading it (types which could not be prefetched are loaded as usual)
+    def prefetch(self, types):
+        self._prefetched = {}
+        if self.http_client is None or len(types) < 2:
+            return
+        operations = {
+            Types.PRACTICAL: lambda client: self._open_practical_lessons_booking_http(Types.PRACTICAL, client),
+            Types.BTT: lambda client: self._open_theory_test_booking_page_http(Types.BTT, client),
+            Types.RTT: lambda client: self._open_theory_test_booking_page_http(Types.RTT, client),
+            Types.PT: lambda client: self._open_practical_test_booking_page_http(client),
+        }
+
+        def load(type: str):
+            client = self.http_client.fork()
+            return client, operations[type](client)
 
-        select = Select(self.driver.find_element_by_id(
-            'ctl00_ContentPlaceHolder1_ddlCourse'))
+        types = [type for type in types if type in operations]
+        with ThreadPoolExecutor(max_workers=len(types)) as executor:
+            futures = {type: executor.submit(load, type) for type in types}
+        for type, future in futures.items():
+            try:
+                self._prefetched[type] = future.result()
+            except HttpEngineError as e:
+                logger.debug(f"Could not prefetch the {type} page ({e}), loading it on its own")
+            except Exception as e:
+                # e.g. a bug or a parse error of an unexpected page, the sequential load handles (or reports) it
+                logger.warning(f"Prefetching the {type} page failed ({e!r}), loading it on its own")
 
+    def _use_prefetched(self, type: str):
+        client, result = self._prefetched.pop(type)
+        self.http_client.take_page(client)
+        return result
+
+    # returns the index of the course to select & the names of all courses (without the "Select" option)
+    @staticmethod
+    def _choose_course(option_texts: list):
         # sometimes there are multiple options (like "CLASS 2B CIRCUIT REVISION" and "Class 2B Lesson 5")
         # in that case, choose the "Class 2B Lesson *" as this is much more relevant to be notified for
         select_indx = 1
         avail_options = []
-        if len(select.options) > 1:
-            for i, option in enumerate(select.options):
+        if len(option_texts) > 1:
+            for i, option_text in enumerate(option_texts):
                 # skip first option ("Select")
                 if i == 0:
                     continue
-                avail_options.append(option.text.strip())
-                if "Class 2B Lesson" in option.text:
+                avail_options.append(option_text.strip())
+                if "Class 2B Lesson" in option_text:
                     select_indx = i
-        if len(select.options) > 2:
+        if len(option_texts) > 2:
             logger.info(
-                f"There are two options ({avail_options}) available. Choosing the practical lesson ({select.options[select_indx].text.strip()}).")
+                f"There are two options ({avail_options}) available. Choosing the practical lesson ({option_texts[select_indx].strip()}).")
+        return select_indx, avail_options
+
+    def open_practical_lessons_booking(self, type=Types.PRACTICAL):
+        if type in self._prefetched:
+            return self._use_prefetched(type)
+        return self._run_engine(self._open_practical_lessons_booking_http, self._open_practical_lessons_booking_browser, type)
+
+    def _open_practical_lessons_booking_http(self, type=Types.PRACTICAL, client: CDCHttpClient = None):
+        client = client or self.http_client
+        client.get("NewPortal/Booking/BookingPL.aspx")
+
+        options = client.form.options.get(COURSE_SELECT_ID)
+        if options is None:
+            raise HttpEngineError(
+                f"{COURSE_SELECT_ID} not found on practical lessons booking page")
+        select_indx, avail_options = self._choose_course(
+            [text for value, text in options])
+        self.lesson_name_practical = avail_options[select_indx - 1]
+        # the course dropdown posts back on change
+        client.postback(event_target_id=COURSE_SELECT_ID, fields={
+            COURSE_SELECT_ID: options[select_indx][0]})
+
+        if not client.has_element(SESSION_NO_LABEL_ID):
+            raise HttpEngineError(
+                f"{SESSION_NO_LABEL_ID} not found after selecting the course")
+        return True
+
+    def _open_practical_lessons_booking_browser(self, type=Types.PRACTICAL):
+        # pl_btn = driver.find_element_by_xpath('//*[@id="ctl00_Menu1_TreeView1t6"]')
+        # pl_btn.click()
+        self._open_website("NewPortal/Booking/BookingPL.aspx",
+                           ready_ids=(COURSE_SELECT_ID,))
+
+        course_select = self.driver.find_element_by_id(COURSE_SELECT_ID)
+        select = Select(course_select)
+        select_indx, avail_options = self._choose_course(
+            [option.text for option in select.options])
         self.lesson_name_practical = avail_options[select_indx - 1]
         select.select_by_index(select_indx)
 
-        WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable(
-            (By.ID, 'ctl00_ContentPlaceHolder1_lblSessionNo')))
+        # the course dropdown posts back on change
+        self._wait_for_postback(course_select, ready_ids=(SESSION_NO_LABEL_ID,))
+        WebDriverWait(self.driver, self.page_load_timeout).until(EC.element_to_be_clickable(
+            (By.ID, SESSION_NO_LABEL_ID)))
+        return True
+
+    # reads the whole availability grid of the current page within one round trip,
+    # returns None if the grid has the given fingerprint (= nothing changed, the grid is not parsed then)
+    def _extract_grid(self, fingerprint: str = None) -> dict:
+        start = time.perf_counter()
+        if self.http_client is not None or self.extraction_mode == ExtractionModes.PAGE_SOURCE:
+            page_source = self.http_client.page_source if self.http_client is not None else self.driver.page_source
+            mode = Engines.HTTP if self.http_client is not None else ExtractionModes.PAGE_SOURCE
+            current_fingerprint = grid_fingerprint(page_source)
+            grid = parse_grid(page_source) if current_fingerprint != fingerprint else None
+        else:
+            mode = ExtractionModes.SCRIPT
+            grid = self.driver.execute_script(
+                GRID_EXTRACTION_SCRIPT, AVAILABLE_SESSIONS_TABLE_ID, fingerprint)
+            current_fingerprint = grid['fingerprint']
+            if grid.get('unchanged'):
+                grid = None
+            else:
+                grid['sessions'] = [tuple(session) for session in grid['sessions']]
+        metrics.PARSE_DURATION.observe(
+            time.perf_counter() - start, 'grid', mode)
+        if grid is not None:
+            grid['fingerprint'] = current_fingerprint
+        return grid
+
+    # finds all available days and time slots (without knowing which slots are free or not),
+    # returns false if the grid has not changed since the available sessions of the type have been read the last time
+    # (nothing is read then & the available sessions of the type stay as they are)
+    def get_all_session_date_times(self, type: str) -> bool:
+        fingerprint = self._grid_fingerprints.get(type) if type in self.available_sessions else None
+        if self.extraction_mode != ExtractionModes.ELEMENT or self.http_client is not None:
+            self._grid = self._extract_grid(fingerprint)
+        else:
+            self._grid = self._read_grid_elements(fingerprint)
+        # (also for an unchanged grid, the reservation latency is measured from the latest read)
+        self._grid_read_at = time.perf_counter()
+        if self._grid is None:
+            self.available_sessions[type].touch()
+            logger.debug(f"{type} grid has not changed")
+            return False
         return True
 
-    # finds all available days and time slots (without knowing which slots are free or not)
-    def get_all_session_date_times(self, type: str):
-        for row in self.driver.find_elements_by_css_selector("table#ctl00_ContentPlaceHolder1_gvLatestav tr"):
+    # element by element variant of _extract_grid (sessions are read one by one in get_all_available_sessions)
+    def _read_grid_elements(self, fingerprint: str = None) -> dict:
+        tables = self.driver.find_elements_by_id(AVAILABLE_SESSIONS_TABLE_ID)
+        current_fingerprint = grid_fingerprint(
+            tables[0].get_attribute('outerHTML') if len(tables) > 0 else '')
+        if current_fingerprint == fingerprint:
+            return None
+
+        grid = {'times': [], 'days': [], 'sessions': None, 'fingerprint': current_fingerprint}
+        for row in self.driver.find_elements_by_css_selector(f"table#{AVAILABLE_SESSIONS_TABLE_ID} tr"):
             th_cells = row.find_elements_by_tag_name("th")
             for i, th_cell in enumerate(th_cells):
                 if i < 2:
                     continue
-                if type == Types.PRACTICAL:
-                    self.available_times_practical.append(
-                        str(th_cell.text).split("\n")[1])
-                elif type == Types.BTT:
-                    self.available_times_btt.append(
-                        str(th_cell.text).split("\n")[1])
-                elif type == Types.RTT:
-                    self.available_times_rtt.append(
-                        str(th_cell.text).split("\n")[1])
-                elif type == Types.PT:
-                    self.available_times_pt.append(
-                        str(th_cell.text).split("\n")[1])
+                grid['times'].append(th_cell.text)
 
             td_cells = row.find_elements_by_tag_name("td")
             if len(td_cells) > 0:
-                if type == Types.PRACTICAL:
-                    self.available_days_practical.append(td_cells[0].text)
-                elif type == Types.BTT:
-                    self.available_days_btt.append(td_cells[0].text)
-                elif type == Types.RTT:
-                    self.available_days_rtt.append(td_cells[0].text)
-                elif type == Types.PT:
-                    self.available_days_pt.append(td_cells[0].text)
-                continue
+                grid['days'].append(td_cells[0].text)
+        return grid
+
+    # creates the slot of the given input id of the current grid
+    def _get_grid_slot(self, type: str, element_id: str) -> Slot:
+        # e.g. ctl00_ContentPlaceHolder1_gvLatestav_ctl02_btnSession4 (02 is row, 4 is column)
+        match = re.search(r'_ctl(\d+)_btnSession(\d+)$', element_id)
+        # remove 2 to remove th row (for mapping to the days)
+        row = int(match.group(1)) - 2
+        # remove 1 to remove first column (for mapping to the times)
+        column = int(match.group(2)) - 1
+        # th text is e.g. "Session 4\n14:35 - 16:15"
+        return Slot.from_portal(type, self._grid['days'][row],
+                                str(self._grid['times'][column]).split("\n")[1], element_id)
 
+    # (keeps the available sessions of the type if get_all_session_date_times found the grid unchanged; nothing is
+    # clicked, the session to probe the eligibility with is kept for check_eligibility)
     def get_all_available_sessions(self, type: str):
+        self._probe_element_ids.pop(type, None)
+        if self._grid is None:
+            return
+
         # iterate over all "available motorcycle" images to get column and row
         # to later on get the date & time of that session
-        input_elements = self.driver.find_elements_by_tag_name('input')
-        last_practical_input_element: WebElement = None
+        # the element itself is only looked up if it is needed for a reservation probe below
+        last_practical_input_element_id: str = None
         has_booked_lessons = False
         has_booked_lessons_in_view = False
-        for input_element in input_elements:
+        booked_element_ids = []
+
+        available_slots = []
+        if self._grid['sessions'] is not None:
+            sessions = self._grid['sessions']
+        else:
+            sessions = [(str(input_element.get_attribute('id')), str(input_element.get_attribute('src')))
+                        for input_element in self.driver.find_elements_by_tag_name('input')]
+
+        for element_id, input_element_src in sessions:
             # Images1.gif -> available slot
-            input_element_src = input_element.get_attribute('src')
-            if "Images1.gif" in input_element_src or "Images3.gif" in input_element_src:
-                # e.g. ctl00_ContentPlaceHolder1_gvLatestav_ctl02_btnSession4 (02 is row, 4 is column)
-                element_id = str(input_element.get_attribute('id'))
-                # remove 2 to remove th row (for mapping to available_days)
-                row = int(element_id.split('_')[3][-1:]) - 2
-                # remove 1 to remove first column (for mapping to available_times)
-                column = int(element_id[-1]) - 1
-                if "Images1.gif" in input_element_src:
-                    available_sessions = {}
-                    available_days = {}
-                    available_times = {}
-
-                    # get the input values depending on the type to avoid redundant code
-                    if type == Types.PRACTICAL:
-                        available_sessions = self.available_sessions_practical
-                        available_days = self.available_days_practical
-                        available_times = self.available_times_practical
-                        last_practical_input_element = input_element
-                    elif type == Types.BTT:
-                        available_sessions = self.available_sessions_btt
-                        available_days = self.available_days_btt
-                        available_times = self.available_times_btt
-                    elif type == Types.RTT:
-                        available_sessions = self.available_sessions_rtt
-                        available_days = self.available_days_rtt
-                        available_times = self.available_times_rtt
-                    elif type == Types.PT:
-                        available_sessions = self.available_sessions_pt
-                        available_days = self.available_days_pt
-                        available_times = self.available_times_pt
-
-                    # create or append to list of times (in case there are multiple sessions per day)
-                    # row is date, column is time
-                    if row not in available_sessions.keys():
-                        available_sessions.update(
-                            {available_days[row]: [available_times[column]]})
-                    else:
-                        available_sessions.update(
-                            {available_days[row]: available_sessions[row].append(available_times[column])})
-
-                if "Images3.gif" in input_element_src:
-                    has_booked_lessons_in_view = True
+            if "Images1.gif" in input_element_src:
+                available_slots.append(self._get_grid_slot(type, element_id))
+                if type == Types.PRACTICAL:
+                    last_practical_input_element_id = element_id
+            if "Images3.gif" in input_element_src:
+                has_booked_lessons_in_view = True
+                booked_element_ids.append(element_id)
+
+        previous_snapshot = self.available_sessions.get(type)
+        self.available_sessions[type] = AvailabilitySnapshot(
+            type, available_slots)
+        self._grid_fingerprints[type] = self._grid['fingerprint']
+        booked_grid_starts = {self._get_grid_slot(type, element_id).start for element_id in booked_element_ids}
+        # the session reserved by reserve_session is not held anymore once the grid stops marking it (e.g. the
+        # reservation lapsed or has been released), it must not keep blocking earlier reservations
+        reserved_session = self.reserved_sessions.get(type)
+        if reserved_session is not None and reserved_session.start not in booked_grid_starts:
+            logger.info(f"Reserved {type} session {reserved_session.date_str} {reserved_session.time_str} is not "
+                        f"reserved anymore")
+            del self.reserved_sessions[type]
+        # a booked session in the grid which is neither among the (cached) booked sessions nor reserved by
+        # reserve_session: booked since they were read
+        if type in self.booked_sessions:
+            booked_starts = {slot.start for slot in self.booked_sessions[type]}
+            if type in self.reserved_sessions:
+                booked_starts.add(self.reserved_sessions[type].start)
+            if any(start not in booked_starts for start in booked_grid_starts):
+                logger.info(f"New booked {type} session in the grid, reading the booked sessions again")
+                self.invalidate_booked_sessions()
+
+        added, removed = self.available_sessions[type].delta(previous_snapshot)
+        if previous_snapshot is not None and (added or removed):
+            # the slots themselves only at debug level, a changed grid can add/remove dozens of them
+            logger.info(f"{type} sessions changed: {len(added)} added, {len(removed)} removed")
+            logger.debug(f"{type} sessions added {[f'{slot.date_str} {slot.time_str}' for slot in added]}, "
+                         f"removed {[f'{slot.date_str} {slot.time_str}' for slot in removed]}")
+
+        # the reservation probes rely on browser alerts, keep the last probe result for the http engine
+        if self.http_client is not None:
+            return
 
         if type == Types.PRACTICAL:
-            if has_booked_lessons_in_view or len(self.booked_sessions_practical) > 0:
+            if has_booked_lessons_in_view or len(self.booked_sessions.get(Types.PRACTICAL, ())) > 0:
                 has_booked_lessons = True
 
             # check if next session can be booked, else skip (e.g. in case BTT not done or PDL for lesson 6)
-            if "Lesson 6" in self.lesson_name_practical and last_practical_input_element is not None and not has_booked_lessons:
-                last_practical_input_element_id = last_practical_input_element.get_attribute(
-                    "id")
-                try:
-                    logger.info(
-                        "Attempting to reserve a session to check if user can book next lesson")
-                    last_practical_input_element.click()
-                    WebDriverWait(self.driver, 5).until(EC.alert_is_present())
-                    alert = self.driver.switch_to.alert
-                    if "PDL" in alert.text or "BTT" in alert.text:
-                        logger.warning(
-                            f"User can't book lesson 6 because '{alert.text}'")
-                        self.can_book_next_practical_lesson = False
-                    alert.accept()
-                except Exception:
-                    # if no alert, means user could book lesson. Now we have to unreserve it again.
-                    self.driver.find_element_by_id(
-                        last_practical_input_element_id).click()
-                    logger.info("Reverted reservation of session successfully")
-                    time.sleep(2)
+            if "Lesson 6" in self.lesson_name_practical and last_practical_input_element_id is not None and not has_booked_lessons:
+                self._probe_element_ids[type] = last_practical_input_element_id
 
         if type == Types.PT:
-            if has_booked_lessons_in_view or len(self.booked_sessions_pt) > 0:
+            if has_booked_lessons_in_view or len(self.booked_sessions.get(Types.PT, ())) > 0:
                 has_booked_lessons = True
 
             # check if practical test can be booked, else skip (e.g. in case simulator modules not done)
-            if last_practical_input_element is not None and not has_booked_lessons_in_view:
-                last_practical_input_element_id = last_practical_input_element.get_attribute(
-                    "id")
-                try:
-                    logger.info(
-                        "Attempting to reserve a session to check if user can book practical test")
-                    last_practical_input_element.click()
-                    WebDriverWait(self.driver, 5).until(EC.alert_is_present())
-                    alert = self.driver.switch_to.alert
-                    logger.warning(
-                        f"User can't book practical test because '{alert.text}'")
-                    self.can_book_pt = False
-                    alert.accept()
-                except Exception:
-                    # if no alert, means user could book lesson. Now we have to unreserve it again.
-                    self.driver.find_element_by_id(
-                        last_practical_input_element_id).click()
-                    logger.info("Reverted reservation of session successfully")
-                    time.sleep(2)
+            if last_practical_input_element_id is not None and not has_booked_lessons_in_view:
+                self._probe_element_ids[type] = last_practical_input_element_id
+
+    # probes whether the user can book the type at all (see _check_eligibility) with a session of the grid read last by
+    # get_all_available_sessions (if it needs to be probed); the probe clicks the session, so it is kept apart from
+    # reading the grid (which is run again if it fails)
+    def check_eligibility(self, type: str):
+        element_id = self._probe_element_ids.pop(type, None)
+        if element_id is None:
+            return
+        if type == Types.PRACTICAL:
+            self.can_book_next_practical_lesson = self._check_eligibility(
+                Types.PRACTICAL, element_id, reasons=("PDL", "BTT"))
+        elif type == Types.PT:
+            self.can_book_pt = self._check_eligibility(Types.PT, element_id)
+
+    # reserves the session of the grid which has been read last, clicking it in the loaded page (browser) or replaying
+    # the click on it (http engine), returns false if the portal refused the reservation
+    def reserve_session(self, type: str, slot: Slot) -> bool:
+        engine = Engines.HTTP if self.http_client is not None else Engines.BROWSER
+        try:
+            if self.http_client is not None:
+                reserved = self._reserve_session_http(slot.column_id)
+            else:
+                reserved = self._reserve_session_browser(slot.column_id)
+        except (HttpEngineError, WebDriverException) as e:
+            logger.warning(f"Could not reserve {type} session {slot.date_str} {slot.time_str}: {e}")
+            return False
+        if not reserved:
+            return False
+
+        latency = time.perf_counter() - self._grid_read_at
+        metrics.RESERVATION_LATENCY.observe(latency, type, engine)
+        logger.info(f"Reserved {type} session {slot.date_str} {slot.time_str} {latency * 1000:.0f}ms after "
+                    f"reading the grid")
+        self.reserved_sessions[type] = slot
+        self.invalidate_booked_sessions()
+        return True
+
+    def _reserve_session_http(self, element_id: str) -> bool:
+        sessions = parse_grid(self.http_client.click_image(element_id))['sessions']
+        reserved = any(session_id == element_id and "Images3.gif" in src for session_id, src in sessions)
+        if not reserved:
+            logger.warning(f"Reservation of {element_id} has been refused")
+        return reserved
+
+    def _reserve_session_browser(self, element_id: str) -> bool:
+        input_element = self.driver.find_element_by_id(element_id)
+        input_element.click()
+        try:
+            self._wait_for_postback(input_element)
+            return "Images3.gif" in str(self.driver.find_element_by_id(element_id).get_attribute('src'))
+        except UnexpectedAlertPresentException as e:
+            logger.warning(f"Reservation of {element_id} has been refused because '{e.alert_text}'")
+            try:
+                self.driver.switch_to.alert.accept()
+            except NoAlertPresentException:
+                pass
+            return False
+
+    # returns whether the user can book sessions of the type, probed by reserving the given session of the grid unless
+    # the last probe is younger than eligibility_ttl: the portal refuses the reservation with an alert containing one
+    # of the reasons (any alert if no reasons are given)
+    def _check_eligibility(self, type: str, element_id: str, reasons=None) -> bool:
+        cached = self._eligibility.get(type)
+        if cached is not None and time.monotonic() - cached[2] < self.eligibility_ttl:
+            return cached[0]
+
+        logger.info(
+            f"Attempting to reserve a session to check if user can book {type}")
+        alert_text = self._probe_reservation(element_id)
+        can_book = alert_text is None or (
+            reasons is not None and not any(reason in alert_text for reason in reasons))
+        if not can_book:
+            logger.warning(f"User can't book {type} because '{alert_text}'")
+        self._eligibility[type] = (can_book, None if can_book else alert_text, time.monotonic())
+        self.eligibility_probes += 1
+        metrics.ELIGIBILITY_PROBES.inc(type, 'eligible' if can_book else 'not_eligible')
+        return can_book
+
+    # (can book, reason) of the last reservation probe of the type, None if it has not been probed (yet)
+    def get_eligibility(self, type: str) -> tuple:
+        cached = self._eligibility.get(type)
+        return cached[:2] if cached is not None else None
+
+    # clicks the session: returns the text of the alert if the portal refuses the reservation, else the reservation
+    # is reverted right away & None is returned
+    def _probe_reservation(self, element_id: str) -> str:
+        self.driver.find_element_by_id(element_id).click()
+        try:
+            WebDriverWait(self.driver, self.alert_timeout).until(
+                EC.alert_is_present())
+        except TimeoutException:
+            # if no alert, means user could book lesson. Now we have to unreserve it again.
+            self.invalidate_booked_sessions()
+            input_element = self.driver.find_element_by_id(element_id)
+            input_element.click()
+            self._wait_for_postback(input_element)
+            logger.info("Reverted reservation of session successfully")
+            return None
+        alert = self.driver.switch_to.alert
+        alert_text = alert.text
+        alert.accept()
+        return alert_text
@@ -0,0 +1,177 @@
+import hashlib
+from html.parser import HTMLParser
+
+AVAILABLE_SESSIONS_TABLE_ID = "ctl00_ContentPlaceHolder1_gvLatestav"
+BOOKED_SESSIONS_TABLE_ID = "ctl00_ContentPlaceHolder1_gvBooked"
+
+
+# normalises cell text the same way selenium's WebElement.text does it
+# (collapsed whitespace, one line per <br>, no empty lines)
+def _normalise_text(text: str) -> str:
+    lines = [' '.join(line.split()) for line in text.split('\n')]
+    return '\n'.join(line for line in lines if line)
+
+
+# collects the cells of a single table (by id) as well as all session <input> elements of the page
+class TableParser(HTMLParser):
+    def __init__(self, table_id: str):
+        super().__init__(convert_charrefs=True)
+        self.table_id = table_id
+        # list of rows, each row is a list of (tag, text) tuples
+        self.rows = []
+        # list of (id, src) tuples of all inputs having a src attribute
+        self.inputs = []
+
+        self._table_depth = 0
+        self._cell_tag = None
+        self._cell_text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'input' and attrs.get('src') is not None:
+            self.inputs.append((attrs.get('id') or '', attrs['src']))
+
+        if tag == 'table':
+            if self._table_depth > 0 or attrs.get('id') == self.table_id:
+                self._table_depth += 1
+            return
+        # ignore anything outside of the table or within nested tables
+        if self._table_depth != 1:
+            return
+        if tag == 'tr':
+            self.rows.append([])
+        elif tag in ('th', 'td') and len(self.rows) > 0:
+            self._cell_tag = tag
+            self._cell_text = []
+        elif tag == 'br' and self._cell_tag is not None:
+            self._cell_text.append('\n')
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == 'table' and self._table_depth > 0:
+            self._table_depth -= 1
+            return
+        if self._table_depth != 1:
+            return
+        if tag in ('th', 'td') and self._cell_tag == tag:
+            self.rows[-1].append(
+                (self._cell_tag, _normalise_text(''.join(self._cell_text))))
+            self._cell_tag = None
+
+    def handle_data(self, data):
+        if self._cell_tag is not None:
+            self._cell_text.append(data)
+
+
+# parses the availability grid (gvLatestav) of a booking page into the same structure
+# which the single execute_script extraction returns:
+# {'times': [th texts of session columns], 'days': [first td of each row], 'sessions': [(input id, input src)]}
+def parse_grid(html: str) -> dict:
+    parser = TableParser(AVAILABLE_SESSIONS_TABLE_ID)
+    parser.feed(html)
+    parser.close()
+
+    grid = {'times': [], 'days': [], 'sessions': []}
+    for row in parser.rows:
+        th_cells = [text for tag, text in row if tag == 'th']
+        # skip first two columns (date & day name)
+        grid['times'].extend(th_cells[2:])
+        td_cells = [text for tag, text in row if tag == 'td']
+        if len(td_cells) > 0:
+            grid['days'].append(td_cells[0])
+    grid['sessions'] = [(input_id, src) for input_id, src in parser.inputs
+                        if "Images1.gif" in src or "Images3.gif" in src]
+    return grid
+
+
+# content hash of the markup of the availability grid (gvLatestav), without parsing the page
+# (the grid has no nested tables, so it ends with the first </table> after its start)
+def grid_fingerprint(html: str) -> str:
+    id_index = html.find(f'id="{AVAILABLE_SESSIONS_TABLE_ID}"')
+    markup = ''
+    if id_index != -1:
+        start = html.rfind('<table', 0, id_index)
+        end = html.find('</table>', id_index)
+        if start != -1 and end != -1:
+            markup = html[start:end]
+    return hashlib.blake2b(markup.encode('utf-8'), digest_size=16).hexdigest()
+
+
+# parses the booked sessions table (gvBooked) of the booking statement page into a list of rows of td texts
+def parse_booked_rows(html: str) -> list:
+    parser = TableParser(BOOKED_SESSIONS_TABLE_ID)
+    parser.feed(html)
+    parser.close()
+    return [[text for tag, text in row if tag == 'td'] for row in parser.rows]
+
+
+# collects everything needed to replay an ASP.NET postback of a page
+class FormParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # name -> value of all hidden inputs (__VIEWSTATE, __EVENTVALIDATION, ...)
+        self.hidden_fields = {}
+        # id -> name of all inputs & selects
+        self.names = {}
+        # id -> value of all (non hidden) inputs
+        self.values = {}
+        # select id -> list of (value, text) tuples
+        self.options = {}
+        # id -> text of all span elements (ASP.NET labels)
+        self.texts = {}
+
+        self._select_id = None
+        self._option_value = None
+        self._option_text = []
+        self._span_id = None
+        self._span_text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        element_id = attrs.get('id')
+        if tag == 'input':
+            if attrs.get('type', '').lower() == 'hidden':
+                self.hidden_fields[attrs.get('name', '')] = attrs.get('value') or ''
+            elif element_id is not None:
+                self.values[element_id] = attrs.get('value') or ''
+            if element_id is not None and attrs.get('name') is not None:
+                self.names[element_id] = attrs['name']
+        elif tag == 'select' and element_id is not None:
+            self.names[element_id] = attrs.get('name', '')
+            self.options[element_id] = []
+            self._select_id = element_id
+        elif tag == 'option' and self._select_id is not None:
+            self._option_value = attrs.get('value') or ''
+            self._option_text = []
+        elif tag == 'span' and element_id is not None:
+            self._span_id = element_id
+            self._span_text = []
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == 'option' and self._option_value is not None:
+            self.options[self._select_id].append(
+                (self._option_value, _normalise_text(''.join(self._option_text))))
+            self._option_value = None
+        elif tag == 'select':
+            self._select_id = None
+        elif tag == 'span' and self._span_id is not None:
+            self.texts[self._span_id] = _normalise_text(''.join(self._span_text))
+            self._span_id = None
+
+    def handle_data(self, data):
+        if self._option_value is not None:
+            self._option_text.append(data)
+        if self._span_id is not None:
+            self._span_text.append(data)
+
+
+def parse_form(html: str) -> FormParser:
+    parser = FormParser()
+    parser.feed(html)
+    parser.close()
+    return parser
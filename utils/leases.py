@@ -0,0 +1,106 @@
+import contextlib
+import sqlite3
+import time
+
+SCHEMA = '''
+-- which worker monitors which account (until expires_at, unix time)
+CREATE TABLE IF NOT EXISTS leases (
+    account TEXT PRIMARY KEY,
+    worker TEXT,
+    expires_at REAL NOT NULL DEFAULT 0
+);
+
+-- number of checks per worker (for the throughput report of the supervisor)
+CREATE TABLE IF NOT EXISTS worker_stats (
+    worker TEXT PRIMARY KEY,
+    pid INTEGER,
+    checks INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+'''
+
+
+# hands out the accounts to the worker processes: a worker holds an account as long as it renews its lease, the
+# accounts of a crashed (or stuck) worker are handed out again once their leases have expired
+class LeaseCoordinator:
+    def __init__(self, db_path: str, lease_duration=600):
+        self.db_path = db_path
+        self.lease_duration = lease_duration
+        # waits for the locks of the other processes instead of failing right away
+        self.connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # makes the accounts available for leasing (accounts which are not given anymore are removed)
+    def register_accounts(self, accounts: list):
+        with self._transaction():
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO leases (account) VALUES (?)', [(account,) for account in accounts])
+            self.connection.execute(
+                f"DELETE FROM leases WHERE account NOT IN ({','.join('?' * len(accounts))})", accounts)
+
+    # leases up to count accounts which are not leased (or whose lease has expired) to the worker
+    def acquire(self, worker: str, count=1) -> list:
+        now = time.time()
+        with self._transaction():
+            accounts = [row[0] for row in self.connection.execute(
+                'SELECT account FROM leases WHERE worker IS NULL OR expires_at < ? ORDER BY expires_at LIMIT ?',
+                (now, count))]
+            self.connection.executemany('UPDATE leases SET worker = ?, expires_at = ? WHERE account = ?',
+                                        [(worker, now + self.lease_duration, account) for account in accounts])
+        return accounts
+
+    # extends all leases the worker still holds & returns their accounts
+    def renew(self, worker: str) -> list:
+        now = time.time()
+        with self._transaction():
+            self.connection.execute('UPDATE leases SET expires_at = ? WHERE worker = ? AND expires_at >= ?',
+                                    (now + self.lease_duration, worker, now))
+            return [row[0] for row in self.connection.execute(
+                'SELECT account FROM leases WHERE worker = ? AND expires_at >= ?', (worker, now))]
+
+    def release(self, worker: str, account: str = None):
+        with self._transaction():
+            if account is None:
+                self.connection.execute(
+                    'UPDATE leases SET worker = NULL, expires_at = 0 WHERE worker = ?', (worker,))
+            else:
+                self.connection.execute('UPDATE leases SET worker = NULL, expires_at = 0 WHERE worker = ? AND account = ?',
+                                        (worker, account))
+
+    def record_checks(self, worker: str, pid: int, checks: int):
+        with self._transaction():
+            self.connection.execute(
+                '''INSERT INTO worker_stats (worker, pid, checks, updated_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (worker) DO UPDATE SET pid = excluded.pid, checks = checks + excluded.checks,
+                   updated_at = excluded.updated_at''',
+                (worker, pid, checks, time.time()))
+
+    # worker -> (pid, total checks, number of accounts currently leased)
+    def get_worker_stats(self) -> dict:
+        now = time.time()
+        leased = dict(self.connection.execute(
+            'SELECT worker, COUNT(*) FROM leases WHERE worker IS NOT NULL AND expires_at >= ? GROUP BY worker',
+            (now,)).fetchall())
+        return {worker: (pid, checks, leased.get(worker, 0)) for worker, pid, checks in self.connection.execute(
+            'SELECT worker, pid, checks FROM worker_stats ORDER BY worker')}
+
+    # BEGIN IMMEDIATE takes the write lock right away, so two workers can't lease the same account
+    @contextlib.contextmanager
+    def _transaction(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
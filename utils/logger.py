@@ -1,20 +1,79 @@
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
-from datetime import datetime
-from logging import FileHandler
+from logging.handlers import (QueueHandler, QueueListener, RotatingFileHandler,
+                              TimedRotatingFileHandler)
+
+DEFAULT_LOG_DIR = "/var/log/cdc_lesson_tracker"
 
 logFormatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
 
 
+# one compact json object per line (log_format: 'json')
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps({'time': self.formatTime(record), 'level': record.levelname,
+                           'process': record.processName, 'message': record.getMessage()})
+
+
+# file handler rotating by size (log_max_bytes) or time (log_rotate_when, e.g. 'midnight'), None if the log directory
+# can't be created
+def _create_file_handler(config: dict, name: str) -> logging.Handler:
+    log_dir = os.path.expanduser(config.get('log_dir', DEFAULT_LOG_DIR))
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+    except OSError as e:
+        print(f"Not logging to a file, could not create {log_dir}: {e}", file=sys.stderr)
+        return None
+    path = os.path.join(log_dir, f"{name}.log")
+    backup_count = config.get('log_backup_count', 5)
+    # delay: the file is opened with the first record
+    if config.get('log_rotate_when'):
+        return TimedRotatingFileHandler(path, when=config['log_rotate_when'], backupCount=backup_count, delay=True)
+    return RotatingFileHandler(path, maxBytes=config.get('log_max_bytes', 10 * 1024 * 1024),
+                               backupCount=backup_count, delay=True)
+
+
 class Logger:
     logger = logging.getLogger("cdc-logger")
     logger.setLevel(logging.INFO)
 
-    ch = logging.StreamHandler(sys.stdout)
-    ch.setFormatter(logFormatter)
-    logger.addHandler(ch)
+    # the records are only queued by the logging thread, the listener thread formats & writes them
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    listener: QueueListener = None
+
+    # (re)creates the handlers: stdout & a rotating file <log_dir>/<name>.log (one per process writing at the same time)
+    # if log_file is set
+    @classmethod
+    def configure(cls, config: dict = None, name="cdc_lesson_tracker", log_file=True):
+        config = config or {}
+        formatter = JsonLinesFormatter() if config.get('log_format') == 'json' else logFormatter
+        handlers = [logging.StreamHandler(sys.stdout)]
+        file_handler = _create_file_handler(config, name) if log_file else None
+        if file_handler is not None:
+            handlers.append(file_handler)
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        if cls.listener is not None:
+            cls.listener.stop()
+            for handler in cls.listener.handlers:
+                handler.close()
+        cls.listener = QueueListener(cls.log_queue, *handlers)
+        cls.listener.start()
+
+    # writes the queued records (at exit)
+    @classmethod
+    def flush(cls):
+        if cls.listener is not None:
+            cls.listener.stop()
+            cls.listener = None
+
 
-    fh = FileHandler(
-        f"/var/log/cdc_lesson_tracker/cdc_lesson_tracker_{datetime.today().strftime('%Y-%m-%d_%H-%M')}.log")
-    fh.setFormatter(logFormatter)
-    logger.addHandler(fh)
+# stdout only until an entry point configures the log file (importing the logger creates no directories or files)
+Logger.configure(log_file=False)
+atexit.register(Logger.flush)
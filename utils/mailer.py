@@ -0,0 +1,183 @@
+import queue
+import smtplib
+import socket
+import threading
+import time
+from email.message import EmailMessage
+
+from utils import metrics
+from utils.logger import Logger
+
+logger = Logger.logger
+
+
+# a single (digest) email, on_sent callbacks are called by the worker once it has been sent
+class OutgoingMail:
+    def __init__(self, to_email: str, subject: str, body: str, on_sent=()):
+        self.to_email = to_email
+        self.subject = subject
+        self.body = body
+        self.on_sent = list(on_sent)
+        self.attempts = 0
+
+
+# queues notifications and sends them from a background worker over one re-used, authenticated SMTP connection
+# (the polling loop only ever appends to a queue and never waits for mail I/O)
+class MailOutbox:
+    def __init__(self, smtp_server: str, smtp_port: int, smtp_user: str = None, smtp_pw: str = None,
+                 from_email: str = None, starttls=True, timeout=30, max_retries=5, retry_delay=2,
+                 max_retry_delay=300, idle_timeout=240, subject_template="CDC {} Sessions"):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.smtp_user = smtp_user
+        self.smtp_pw = smtp_pw
+        self.from_email = from_email or smtp_user
+        self.starttls = starttls
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        # close the connection after this many seconds without mails (servers drop idle connections anyway)
+        self.idle_timeout = idle_timeout
+        # subject of a mail, filled with the (comma separated) topics of the notifications it contains
+        self.subject_template = subject_template
+
+        # notifications of the current cycle, per recipient: list of (topic, body, on_sent)
+        self._cycle_notifications = {}
+        self._queue = queue.Queue()
+        self._connection: smtplib.SMTP = None
+        self._worker = threading.Thread(
+            target=self._run, name="mail-outbox", daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def from_config(cls, config: dict):
+        return cls(config['smtp_server'], config['smtp_port'], config.get('smtp_user'), config.get('smtp_pw'),
+                   config.get('from_email'), starttls=config.get('smtp_starttls', True))
+
+    # takes over the smtp settings of a changed config, the mails queued before are still sent with the old settings
+    def reconfigure(self, config: dict):
+        settings = (config['smtp_server'], config['smtp_port'], config.get('smtp_user'), config.get('smtp_pw'),
+                    config.get('from_email') or config.get('smtp_user'), config.get('smtp_starttls', True))
+        if settings != (self.smtp_server, self.smtp_port, self.smtp_user, self.smtp_pw, self.from_email,
+                        self.starttls):
+            self._queue.put(settings)
+
+    # adds a notification to the digest of the current cycle
+    def add(self, to_email: str, topic: str, body: str, on_sent=None):
+        self._cycle_notifications.setdefault(to_email, []).append(
+            (topic, body, on_sent))
+
+    # merges all notifications of the cycle into one mail per recipient and hands them over to the worker
+    def flush_cycle(self):
+        for to_email, notifications in self._cycle_notifications.items():
+            subject = self.subject_template.format(
+                ', '.join(topic for topic, _, _ in notifications))
+            body = '\n\n----------------------------------------\n\n'.join(
+                body for _, body, _ in notifications)
+            self._queue.put(OutgoingMail(to_email, subject, body, [
+                on_sent for _, _, on_sent in notifications if on_sent is not None]))
+        self._cycle_notifications = {}
+
+    # sends everything which is still queued & stops the worker
+    def close(self, timeout=60):
+        self.flush_cycle()
+        self._queue.put(None)
+        self._worker.join(timeout)
+
+    def _connect(self):
+        connection = smtplib.SMTP(
+            self.smtp_server, self.smtp_port, timeout=self.timeout)
+        connection.ehlo()
+        if self.starttls:
+            connection.starttls()
+            connection.ehlo()
+        if self.smtp_user:
+            connection.login(self.smtp_user, self.smtp_pw)
+        self._connection = connection
+
+    def _disconnect(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.quit()
+        except Exception:
+            # connection is broken anyway
+            self._connection.close()
+        self._connection = None
+
+    # re-uses the open connection if it is still alive, else (re)connects
+    def _ensure_connection(self):
+        if self._connection is not None:
+            try:
+                if self._connection.noop()[0] == 250:
+                    return
+            except (smtplib.SMTPException, OSError):
+                pass
+            logger.debug("SMTP connection lost, reconnecting")
+            self._disconnect()
+        self._connect()
+
+    def _send(self, mail: OutgoingMail):
+        start = time.perf_counter()
+        self._ensure_connection()
+        msg = EmailMessage()
+        msg.set_content(mail.body)
+        msg['From'] = self.from_email
+        msg['To'] = mail.to_email
+        msg['Subject'] = mail.subject
+
+        logger.info(f"Sending out email to {mail.to_email}")
+        self._connection.sendmail(from_addr=self.from_email,
+                                  to_addrs=mail.to_email, msg=msg.as_string())
+        metrics.SMTP_SEND_DURATION.observe(time.perf_counter() - start)
+
+    def _run(self):
+        while True:
+            try:
+                mail = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._disconnect()
+                continue
+            if mail is None:
+                break
+            if isinstance(mail, tuple):
+                # new smtp settings (see reconfigure)
+                self._disconnect()
+                (self.smtp_server, self.smtp_port, self.smtp_user, self.smtp_pw, self.from_email,
+                 self.starttls) = mail
+                logger.info("SMTP settings changed")
+                continue
+
+            while True:
+                mail.attempts += 1
+                try:
+                    self._send(mail)
+                except (smtplib.SMTPException, OSError) as e:
+                    self._disconnect()
+                    if isinstance(e, socket.gaierror):
+                        logger.warning(
+                            "Socket issue while sending email - Are you in VPN/proxy?")
+                    if mail.attempts > self.max_retries:
+                        logger.error(
+                            f"Giving up sending an email to {mail.to_email} after {mail.attempts} attempts: {e}")
+                        break
+                    delay = min(self.retry_delay * 2 ** (mail.attempts - 1),
+                                self.max_retry_delay)
+                    logger.warning(
+                        f"Something went wrong while sending an email ({e}), retrying in {delay}s")
+                    time.sleep(delay)
+                    continue
+                except Exception as e:
+                    logger.error(
+                        f"Something went wrong while sending an email: {e}")
+                    break
+
+                for on_sent in mail.on_sent:
+                    try:
+                        on_sent()
+                    except Exception as e:
+                        logger.error(f"Error after sending an email: {e}")
+                break
+
+        self._disconnect()
@@ -0,0 +1,173 @@
+import threading
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_names, label_values, le: str = None) -> str:
+    labels = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    if le is not None:
+        labels.append(f'le="{le}"')
+    return f"{{{','.join(labels)}}}" if labels else ''
+
+
+class Counter:
+    def __init__(self, registry, name: str, help: str, label_names=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(
+                label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(
+                    f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, registry, name: str, help: str, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            values = self._values.get(label_values)
+            if values is None:
+                values = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            bucket_index = bisect_left(self.buckets, value)
+            if bucket_index < len(self.buckets):
+                values[bucket_index] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, values in sorted(self._values.items()):
+                cumulative = 0
+                for bucket, bucket_count in zip(self.buckets, values):
+                    cumulative += bucket_count
+                    lines.append(
+                        f"{self.name}_bucket{_format_labels(self.label_names, label_values, bucket)} {cumulative}")
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.label_names, label_values, '+Inf')} {values[-1]}")
+                lines.append(
+                    f"{self.name}_sum{_format_labels(self.label_names, label_values)} {values[-2]}")
+                lines.append(
+                    f"{self.name}_count{_format_labels(self.label_names, label_values)} {values[-1]}")
+        return lines
+
+
+# all metrics of the process, nothing is recorded until enabled is set (e.g. by start_server)
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = False
+        self.metrics = []
+        self._server = None
+
+    def counter(self, name: str, help: str, label_names=()) -> Counter:
+        counter = Counter(self, name, help, label_names)
+        self.metrics.append(counter)
+        return counter
+
+    def histogram(self, name: str, help: str, label_names=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        histogram = Histogram(self, name, help, label_names, buckets)
+        self.metrics.append(histogram)
+        return histogram
+
+    # all metrics in the prometheus text exposition format
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    # enables the metrics & serves them on http://host:port/metrics
+    def start_server(self, port: int, host='127.0.0.1'):
+        # only needed with a metrics_port (http.server is slow to import)
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                payload = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header(
+                    'Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.enabled = True
+        self._server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+        threading.Thread(target=self._server.serve_forever,
+                         name="metrics-server", daemon=True).start()
+
+    def stop_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+REGISTRY = MetricsRegistry()
+
+CYCLE_DURATION = REGISTRY.histogram(
+    'cdc_cycle_duration_seconds', 'Duration of checking the availability of one type', ['type'])
+PAGE_LOAD_DURATION = REGISTRY.histogram(
+    'cdc_page_load_duration_seconds', 'Duration of loading a page until it is ready', ['path', 'engine'])
+WEBDRIVER_COMMANDS = REGISTRY.counter(
+    'cdc_webdriver_commands_total', 'Number of WebDriver commands (round trips to chromedriver)', ['command'])
+PARSE_DURATION = REGISTRY.histogram(
+    'cdc_parse_duration_seconds', 'Duration of reading a grid or the booked sessions of a page', ['what', 'mode'])
+SMTP_SEND_DURATION = REGISTRY.histogram(
+    'cdc_smtp_send_duration_seconds', 'Duration of sending an email (incl. connecting if needed)')
+DETECTION_LAG = REGISTRY.histogram(
+    'cdc_detection_lag_seconds', 'Time from a session being first seen until the notification about it was sent',
+    ['type'], buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600, 86400))
+LEAN_BYTES = REGISTRY.counter(
+    'cdc_lean_bytes_total', 'Bytes loaded by the browser and (estimated) bytes saved by blocking resources in lean mode',
+    ['kind'])
+RESERVATION_LATENCY = REGISTRY.histogram(
+    'cdc_reservation_latency_seconds', 'Time from reading a grid with an earlier session until it has been reserved',
+    ['type', 'engine'], buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1, 2, 5, 10))
+DRIVER_RESTARTS = REGISTRY.counter(
+    'cdc_driver_restarts_total', 'Number of chrome/chromedriver restarts after a crash or hang')
+RECOVERY_DURATION = REGISTRY.histogram(
+    'cdc_recovery_duration_seconds', 'Time from the first failure of an operation until it succeeded again',
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600))
+OPERATION_FAILURES = REGISTRY.counter(
+    'cdc_operation_failures_total', 'Number of failed operations by classification', ['kind'])
+ELIGIBILITY_PROBES = REGISTRY.counter(
+    'cdc_eligibility_probes_total', 'Number of reservation probes checking whether a user can book the next lesson/test',
+    ['type', 'result'])
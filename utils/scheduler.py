@@ -0,0 +1,89 @@
+import random
+import time
+
+from utils.logger import Logger
+
+logger = Logger.logger
+
+
+# gives every type its own polling interval (within min_interval & max_interval):
+# - availability of the type changed -> poll as often as allowed
+# - a booked session of the type is near -> halve the interval
+# - nothing moved for quiet_period seconds -> back off by backoff_factor
+# every delay gets a random jitter of +/- jitter (share of the interval)
+class PollScheduler:
+    def __init__(self, types, base_interval: float, min_interval: float, max_interval: float,
+                 backoff_factor=1.5, jitter=0.1, quiet_period=3600):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.base_interval = min(max(base_interval, self.min_interval), self.max_interval)
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.quiet_period = quiet_period
+
+        now = time.monotonic()
+        self.intervals = {type: self.base_interval for type in types}
+        # all types are due right away
+        self.due_at = {type: now for type in types}
+        self.last_changed_at = {type: now for type in types}
+
+    @classmethod
+    def from_config(cls, config: dict, types):
+        refresh_rate = config['refresh_rate']
+        return cls(types, refresh_rate,
+                   config.get('poll_min_interval', refresh_rate),
+                   config.get('poll_max_interval', refresh_rate),
+                   backoff_factor=config.get('poll_backoff_factor', 1.5),
+                   jitter=config.get('poll_jitter', 0.1),
+                   quiet_period=config.get('poll_quiet_period', 3600))
+
+    # takes over the state of the types the previous scheduler polled already (e.g. after a config change), the next
+    # poll is brought forward if the interval became shorter; new types are due right away
+    def take_over(self, previous: 'PollScheduler'):
+        for type in self.due_at.keys() & previous.due_at.keys():
+            interval = min(max(previous.intervals[type], self.min_interval), self.max_interval)
+            self.intervals[type] = interval
+            self.last_changed_at[type] = previous.last_changed_at[type]
+            self.due_at[type] = min(previous.due_at[type], previous.due_at[type] - previous.intervals[type] + interval)
+
+    # types which are due now (earliest due first)
+    def due_types(self) -> list:
+        now = time.monotonic()
+        return sorted((type for type, due_at in self.due_at.items() if due_at <= now), key=self.due_at.get)
+
+    # seconds until the next type is due
+    def time_until_next(self) -> float:
+        if len(self.due_at) == 0:
+            return self.base_interval
+        return max(min(self.due_at.values()) - time.monotonic(), 0)
+
+    def sleep_until_next(self):
+        delay = self.time_until_next()
+        logger.debug(f"Sleeping for {delay:.0f}s...")
+        time.sleep(delay)
+
+    # updates the interval of the type after it has been checked
+    def record(self, type: str, changed: bool, booked_soon=False):
+        now = time.monotonic()
+        interval = self.intervals[type]
+        if changed:
+            self.last_changed_at[type] = now
+            interval = self.min_interval
+            reason = "availability changed"
+        elif now - self.last_changed_at[type] >= self.quiet_period:
+            interval = interval * self.backoff_factor
+            reason = f"no change for {(now - self.last_changed_at[type]) / 60:.0f}min"
+        else:
+            # recently changed, slowly relax towards the base interval
+            interval = min(interval * self.backoff_factor, self.base_interval)
+            reason = "recently changed" if interval < self.base_interval else "no recent change"
+        if booked_soon:
+            interval = interval / 2
+            reason += ", booked session is near"
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        self.intervals[type] = interval
+
+        delay = interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.due_at[type] = now + delay
+        logger.debug(
+            f"Next {type} check in {delay:.0f}s (interval {interval:.0f}s: {reason})")
@@ -1,15 +1,26 @@
 import datetime
+import functools
 import os
+import re
 import yaml
 
+EPOCH = datetime.datetime(1970, 1, 1)
+MONTHS = {month: index for index, month in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+# portal date (16/Jan/2021 or 16/01/2021) & time (range) (10:20 - 12:00 or 10:20)
+PORTAL_DATE_PATTERN = re.compile(r'(\d{1,2})/([A-Za-z]{3}|\d{1,2})/(\d{4})$')
+PORTAL_TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{2})(?:\s*-\s*(\d{1,2}):(\d{2}))?')
+# distinct date & time strings kept by the caches below (the portal shows a few weeks of sessions at a time)
+PORTAL_CACHE_SIZE = 4096
+CONFIG_FILE_PATH = os.path.realpath(f'{os.path.dirname(os.path.realpath(__file__))}/../config.yml')
+
 
 def reload_config_yml() -> dict:
     global config
     config = {}
-    config_file_path = f'{os.path.dirname(os.path.realpath(__file__))}/../config.yml'
-    if not os.path.isfile(config_file_path):
+    if not os.path.isfile(CONFIG_FILE_PATH):
         raise Exception("Please create config.yml first")
-    with open(config_file_path, 'r') as stream:
+    with open(CONFIG_FILE_PATH, 'r') as stream:
         try:
             config = yaml.safe_load(stream)
         except yaml.YAMLError as exc:
@@ -31,8 +42,32 @@ def clean_appium_avd_env():
             f"rm -f ~/.android/avd/{emulator}.avd/*.lock")
 
 
-# converts custom format date (16/Jan/2021) and time (10:20 - 12:00) to datetime
-def convert_to_date_time(date_str: str, time_str: str) -> datetime:
+# converts custom format date (16/Jan/2021) and time range (10:20 - 12:00) to the minutes since the epoch of the start
+# and the end (the end is the start if there is no range, an end before the start is on the next day)
+# the same strings recur every cycle, so they are parsed once (regex, strptime only for unexpected formats)
+@functools.lru_cache(maxsize=PORTAL_CACHE_SIZE)
+def to_epoch_minutes(date_str: str, time_str: str) -> tuple:
+    date_match = PORTAL_DATE_PATTERN.match(date_str.strip())
+    time_match = PORTAL_TIME_PATTERN.match(time_str.strip())
+    month = MONTHS.get(date_match.group(2).lower()) if date_match is not None else None
+    if date_match is not None and month is None and date_match.group(2).isdigit():
+        month = int(date_match.group(2))
+    if month is None or time_match is None:
+        start = _parse_date_time(date_str, time_str)
+        return _epoch_minutes(start), _epoch_minutes(start)
+
+    days = datetime.date(int(date_match.group(3)), month, int(date_match.group(1))).toordinal() - EPOCH.toordinal()
+    start = days * 1440 + int(time_match.group(1)) * 60 + int(time_match.group(2))
+    if time_match.group(3) is None:
+        return start, start
+    end = days * 1440 + int(time_match.group(3)) * 60 + int(time_match.group(4))
+    # e.g. 22:30 - 00:10
+    if end < start:
+        end += 1440
+    return start, end
+
+
+def _parse_date_time(date_str: str, time_str: str) -> datetime.datetime:
     # take only start time for date_time creation
     time_str = time_str.split(' ')[0]
     try:
@@ -41,6 +76,20 @@ def convert_to_date_time(date_str: str, time_str: str) -> datetime:
         return datetime.datetime.strptime(f'{date_str} | {time_str}', '%d/%m/%Y | %H:%M')
 
 
+def _epoch_minutes(date_time: datetime.datetime) -> int:
+    return (date_time - EPOCH) // datetime.timedelta(minutes=1)
+
+
+@functools.lru_cache(maxsize=PORTAL_CACHE_SIZE)
+def from_epoch_minutes(minutes: int) -> datetime.datetime:
+    return EPOCH + datetime.timedelta(minutes=minutes)
+
+
+# converts custom format date (16/Jan/2021) and time (10:20 - 12:00) to datetime
+def convert_to_date_time(date_str: str, time_str: str) -> datetime:
+    return from_epoch_minutes(to_epoch_minutes(date_str, time_str)[0])
+
+
 # Returns true if date is not excluded by filter
 def is_date_in_range(date_time: datetime.datetime, date_filter: str) -> bool:
     if date_filter == 'na':
@@ -75,3 +124,26 @@ def is_time_in_range(date_time: datetime.datetime, time_filter: str) -> bool:
         print(
             f"An error occured parsing '{time_filter}': {e}")
         return True
+
+
+# bitmask of all weekday (monday = 0) x hour combinations, bit weekday * 24 + hour
+ALL_SLOTS_FILTER = (1 << 7 * 24) - 1
+
+
+# compiles a date (e.g. 'mo;sa') & time filter (e.g. '8-14') into a weekday x hour bitmask, so the filter strings are
+# parsed once instead of for every slot
+def compile_slot_filter(date_filter='na', time_filter='na') -> int:
+    slot_filter = 0
+    # 01/Jan/2024 is a monday
+    monday = datetime.datetime(2024, 1, 1)
+    for weekday in range(7):
+        for hour in range(24):
+            date_time = monday + datetime.timedelta(days=weekday, hours=hour)
+            if is_date_in_range(date_time, date_filter) and is_time_in_range(date_time, time_filter):
+                slot_filter |= 1 << (weekday * 24 + hour)
+    return slot_filter
+
+
+# Returns true if date & time are not excluded by the compiled filter
+def is_in_slot_filter(date_time: datetime.datetime, slot_filter: int) -> bool:
+    return (slot_filter >> (date_time.weekday() * 24 + date_time.hour)) & 1 == 1